@@ -0,0 +1,200 @@
+"""
+Génération reproductible de jeux de données (opérateurs, abonnés, historiques, ventes)
+"""
+
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+from consts import MIN_INDEX_LENGTH, PHONE_NUMBER_LENGTH, POOL_SIZE
+from Models.Backend import StorageBackend
+from Models.Functions import FRENCH_MONTHS
+from Models.NumberPool import NumberPool
+from Models.Sales import new_sale
+
+
+# Tailles prédéfinies ; "large" correspond à une installation nationale
+PROFILES = {
+    "small": {"operators": 10, "indexes_per_operator": 3, "subscribers": 10_000, "max_calls": 50, "managers": 5},
+    "medium": {"operators": 50, "indexes_per_operator": 3, "subscribers": 100_000, "max_calls": 100, "managers": 10},
+    "large": {"operators": 50, "indexes_per_operator": 3, "subscribers": 1_000_000, "max_calls": 500, "managers": 20},
+}
+
+_MONTH_NAMES = {number: name for name, number in FRENCH_MONTHS.items()}
+
+# Période couverte par les historiques et les ventes générés
+START_DATE = datetime(2024, 1, 1)
+SALES_DAYS = 730
+SALES_PER_MANAGER = 500
+
+
+class DatasetGenerator:
+    """Jeu de données déterminé par sa graine : deux générations identiques donnent les mêmes fichiers.
+
+    L'abonné i a le numéro de position i // n dans la réserve de l'index i % n (n index au total),
+    ce qui permet aux mesures de tirer des abonnés au hasard sans garder la liste en mémoire.
+    """
+
+    def __init__(self, operators: int, indexes_per_operator: int, subscribers: int, max_calls: int,
+                 managers: int, seed: int = 42):
+        self.operator_count = operators
+        self.indexes_per_operator = indexes_per_operator
+        self.subscribers = subscribers
+        self.max_calls = max_calls
+        self.managers = managers
+        self.seed = seed
+
+        index_count = operators * indexes_per_operator
+        # Préfixes de même longueur (jamais préfixes les uns des autres) ; plus longs
+        # que MIN_INDEX_LENGTH s'il le faut pour en avoir assez
+        self.index_length = MIN_INDEX_LENGTH
+        while 9 * 10 ** (self.index_length - 1) < index_count * 2:
+            self.index_length += 1
+        rng = random.Random(seed)
+        candidates = range(10 ** (self.index_length - 1), 10 ** self.index_length)
+        self.indexes = [str(value) for value in rng.sample(candidates, index_count * 2)]
+        # La seconde moitié reste libre pour les mesures (ajout puis suppression d'index)
+        self.spare_indexes = self.indexes[index_count:]
+        self.indexes = self.indexes[:index_count]
+
+        per_index = -(-subscribers // index_count)
+        # Réserve assez grande pour les abonnés et pour des ventes pendant les mesures
+        self.pool_size = min(max(POOL_SIZE, per_index + max(per_index // 4, 1000)),
+                             10 ** (PHONE_NUMBER_LENGTH - self.index_length))
+
+    @classmethod
+    def from_profile(cls, profile: str, seed: int = 42, **overrides) -> "DatasetGenerator":
+        params = dict(PROFILES[profile])
+        params.update({key: value for key, value in overrides.items() if value is not None})
+        return cls(seed=seed, **params)
+
+    def describe(self) -> Dict:
+        """Paramètres du jeu de données, enregistrés avec les résultats."""
+        return {
+            "seed": self.seed,
+            "operators": self.operator_count,
+            "indexes_per_operator": self.indexes_per_operator,
+            "index_length": self.index_length,
+            "subscribers": self.subscribers,
+            "max_calls": self.max_calls,
+            "managers": self.managers,
+            "pool_size": self.pool_size,
+        }
+
+    def operator_name(self, number: int) -> str:
+        return f"Operateur{number:03d}"
+
+    def operator_indexes(self, number: int) -> List[str]:
+        start = number * self.indexes_per_operator
+        return self.indexes[start:start + self.indexes_per_operator]
+
+    def assigned(self, index_number: int) -> int:
+        """Nombre de numéros déjà attribués dans la réserve d'un index."""
+        count = len(self.indexes)
+        return self.subscribers // count + (1 if index_number < self.subscribers % count else 0)
+
+    def phone(self, subscriber: int) -> str:
+        count = len(self.indexes)
+        index = self.indexes[subscriber % count]
+        return f"{index}{str(subscriber // count).zfill(PHONE_NUMBER_LENGTH - len(index))}"
+
+    def free_phone(self, sale: int) -> Optional[str]:
+        """k-ième numéro encore disponible (réparti sur les index), ou None si les réserves sont épuisées."""
+        count = len(self.indexes)
+        index_number = sale % count
+        position = self.assigned(index_number) + sale // count
+        if position >= self.pool_size:
+            return None
+        index = self.indexes[index_number]
+        return f"{index}{str(position).zfill(PHONE_NUMBER_LENGTH - len(index))}"
+
+    def operator_of_index(self, index_number: int) -> str:
+        return self.operator_name(index_number // self.indexes_per_operator)
+
+    def operators(self) -> List[Dict]:
+        operators = []
+        for number in range(self.operator_count):
+            pools = {}
+            for index in self.operator_indexes(number):
+                assigned = self.assigned(self.indexes.index(index))
+                bitmap = bytearray((self.pool_size + 7) // 8)
+                bitmap[:assigned // 8] = b"\xff" * (assigned // 8)
+                if assigned % 8:
+                    bitmap[assigned // 8] = (1 << (assigned % 8)) - 1
+                pools[index] = NumberPool(index, self.pool_size, bitmap).to_dict()
+            operators.append({
+                "name": self.operator_name(number),
+                "indexes": self.operator_indexes(number),
+                "pools": pools,
+                "rates": {"same_operator": 1, "different_operator": 2},
+                "version": 1,
+            })
+        return operators
+
+    def call(self, rng: random.Random, phone: str, when: datetime) -> Dict:
+        """Appel au format de l'historique (voir ClientModel.make_call)."""
+        duration = rng.randint(0, 600)
+        other = self.phone(rng.randrange(self.subscribers))
+        audio_file = f"BD/calls/call_{phone}_{other}_{int(when.timestamp())}.wav"
+        return {
+            "direction": rng.choice(("outgoing", "incoming")),
+            "number": other,
+            "name": "inconnu",
+            "status": rng.choice(("read", "unread")),
+            "duration": duration,
+            "cost": duration * rng.choice((1, 2)),
+            "date": f"{when.day:02d} {_MONTH_NAMES[when.month]} {when.year} {when:%H:%M:%S}",
+            "timestamp": int(when.timestamp()),
+            "audio_file": audio_file,
+        }
+
+    def clients(self) -> Iterator[Dict]:
+        """Abonnés dans l'ordre, chacun avec 0 à max_calls appels (du plus récent au plus ancien)."""
+        rng = random.Random(self.seed + 1)
+        start = START_DATE
+        for subscriber in range(self.subscribers):
+            phone = self.phone(subscriber)
+            calls = []
+            when = start
+            for _ in range(rng.randint(0, self.max_calls)):
+                when += timedelta(seconds=rng.randint(60, 86_400))
+                calls.append(self.call(rng, phone, when))
+            calls.reverse()
+            yield {
+                "phone": phone,
+                "pin": f"{rng.randrange(10_000):04d}",
+                "credit": rng.randrange(0, 50_000, 100),
+                "contacts": [],
+                "blocked_contacts": [],
+                "call_history": calls,
+            }
+
+    def sales(self) -> List[Dict]:
+        """Ventes de crédit des gestionnaires, réparties sur SALES_DAYS jours."""
+        rng = random.Random(self.seed + 2)
+        sales = []
+        for manager in range(self.managers):
+            for _ in range(SALES_PER_MANAGER):
+                subscriber = rng.randrange(self.subscribers)
+                when = START_DATE + timedelta(seconds=rng.randrange(SALES_DAYS * 86_400))
+                sales.append(new_sale(f"gestionnaire{manager:02d}",
+                                      self.operator_of_index(subscriber % len(self.indexes)),
+                                      rng.randrange(100, 10_000, 100), self.phone(subscriber), when.timestamp()))
+        sales.sort(key=lambda sale: sale["timestamp"])
+        return sales
+
+    def write(self, backend: StorageBackend) -> Dict:
+        """Écrire le jeu de données dans un stockage vide. Retourne les volumes écrits."""
+        operators = self.operators()
+        backend.save_operators(operators)
+        calls = 0
+
+        def counted():
+            nonlocal calls
+            for client in self.clients():
+                calls += len(client["call_history"])
+                yield client
+
+        clients = backend.bulk_load(counted())
+        sales = self.sales()
+        backend.record_sales(sales)
+        return {"operators": len(operators), "clients": clients, "calls": calls, "sales": len(sales)}
@@ -0,0 +1,282 @@
+"""
+Mesure des chemins critiques des modèles et contrôleurs sur un jeu de données généré
+
+Exemple : python -m Benchmarks.Run --profile small --backend json --compare ancien.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from Benchmarks.Dataset import PROFILES, SALES_DAYS, START_DATE, DatasetGenerator
+
+
+def peak_rss_kb() -> Optional[int]:
+    """Pic de mémoire résidente du processus (Ko)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def bytes_written() -> Optional[int]:
+    """Octets écrits par le processus depuis son démarrage (Linux)."""
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def percentile(sorted_values: List[int], fraction: float) -> int:
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def measure(operation: Callable[[int], Optional[int]], iterations: int) -> Dict:
+    """Exécute operation(i) pour i dans [0, iterations) et résume les latences.
+
+    Une opération qui retourne une durée (ns) ne compte que cette partie (préparation exclue).
+    """
+    latencies = []
+    written = bytes_written()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(iterations):
+            start = time.perf_counter_ns()
+            measured = operation(i)
+            latencies.append(measured if measured is not None else time.perf_counter_ns() - start)
+    written_after = bytes_written()
+    latencies.sort()
+    total = sum(latencies)
+    return {
+        "iterations": iterations,
+        "mean_us": round(total / iterations / 1000, 2),
+        "p50_us": round(percentile(latencies, 0.50) / 1000, 2),
+        "p90_us": round(percentile(latencies, 0.90) / 1000, 2),
+        "p99_us": round(percentile(latencies, 0.99) / 1000, 2),
+        "max_us": round(latencies[-1] / 1000, 2),
+        "ops_per_sec": round(iterations / (total / 1e9), 1) if total else None,
+        "bytes_written": written_after - written if written is not None else None,
+        "peak_rss_kb": peak_rss_kb(),
+    }
+
+
+def run_benchmarks(dataset: DatasetGenerator, iterations: int, scan_iterations: int, seed: int) -> Dict[str, Dict]:
+    """Chemins critiques : connexion, crédit, historique, vente, suppression d'index, caisse, re-tarification."""
+    # Importés après le changement de répertoire : les modèles travaillent dans BD/
+    from Models.Client import ClientModel
+    from Models.Operateur import OperateurModel
+    from Controllers.Client import ClientController
+    from Controllers.Functions import get_operator_by_phone
+    from Controllers.Operateur import OperateurController
+
+    rng = random.Random(seed)
+    client_model = ClientModel()
+    operator_model = OperateurModel()
+    client_controller = ClientController()
+    operator_controller = OperateurController()
+    subscribers = dataset.subscribers
+    results = {}
+
+    def random_phone():
+        return dataset.phone(rng.randrange(subscribers))
+
+    def login(_):
+        phone = random_phone()
+        client = client_model.get_client_by_phone(phone)
+        assert client is not None and client["pin"].isdigit()
+    results["login_lookup"] = measure(login, iterations)
+
+    def credit_update(_):
+        client_model.update_credit(random_phone(), 100)
+    results["credit_update"] = measure(credit_update, iterations)
+
+    def history_append(_):
+        phone = random_phone()
+        client_model.add_call_to_history(phone, dataset.call(rng, phone, datetime.now()))
+    results["history_append"] = measure(history_append, iterations)
+
+    def history_read(_):
+        client_model.get_call_history(random_phone(), limit=20)
+    results["history_read"] = measure(history_read, iterations)
+
+    def call_routing(_):
+        get_operator_by_phone(random_phone())
+        client_controller.get_call_rate(random_phone(), random_phone())
+    results["call_routing"] = measure(call_routing, iterations)
+
+    sales = 0
+    while sales < iterations and dataset.free_phone(sales) is not None:
+        sales += 1
+
+    def number_sale(i):
+        phone = dataset.free_phone(i)
+        operator_name = dataset.operator_of_index(i % len(dataset.indexes))
+        assert operator_model.assign_number_to_client(phone, operator_name, "1234")
+    if sales:
+        results["number_sale"] = measure(number_sale, sales)
+
+    # Suppression d'un index libre : parcours complet des clients pour vérifier qu'il n'est pas utilisé
+    def index_removal(i):
+        operator_name = dataset.operator_name(i % dataset.operator_count)
+        index = dataset.spare_indexes[i % len(dataset.spare_indexes)]
+        operator_model.add_index_to_operator(operator_name, index)
+        start = time.perf_counter_ns()
+        assert operator_model.remove_index_from_operator(operator_name, index)
+        return time.perf_counter_ns() - start
+    results["index_removal"] = measure(index_removal, scan_iterations)
+
+    def cash_state(i):
+        operator_controller.get_cash_state(f"gestionnaire{i % max(dataset.managers, 1):02d}")
+    results["cash_state"] = measure(cash_state, iterations)
+
+    # Période quelconque : quelques compartiments année/mois/jour additionnés
+    def cash_range(i):
+        start = START_DATE.date() + timedelta(days=rng.randrange(SALES_DAYS))
+        end = start + timedelta(days=rng.randrange(SALES_DAYS))
+        operator_controller.get_cash_state(f"gestionnaire{i % max(dataset.managers, 1):02d}", start, end)
+    results["cash_range"] = measure(cash_range, iterations)
+
+    # Re-tarification : chargement en colonnes de tous les appels, puis passe vectorielle
+    from Models.Rating import CallRecords, RatingEngine
+    records = None
+
+    def call_load(_):
+        nonlocal records
+        records = CallRecords.load()
+    results["call_load"] = measure(call_load, scan_iterations)
+    engine = RatingEngine(records, operator_model.get_all_operators())
+
+    def rerate(i):
+        name = dataset.operator_name(i % dataset.operator_count)
+        result = engine.rerate({name: {"same_operator": 1 + i % 3, "different_operator": 2 + i % 3}})
+        result.by_operator()
+    results["rerate"] = measure(rerate, scan_iterations)
+    return results
+
+
+def code_version(directory: str) -> Optional[str]:
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=directory,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline: Dict, current: Dict, threshold: float):
+    """Affiche l'évolution des latences par rapport à une exécution de référence."""
+    print(f"{'mesure':<16}{'p50 (µs)':>22}{'p99 (µs)':>22}")
+    for name, result in current["benchmarks"].items():
+        old = baseline.get("benchmarks", {}).get(name)
+        if old is None:
+            print(f"{name:<16}{'(nouvelle)':>22}")
+            continue
+        cells = []
+        flagged = False
+        for key in ("p50_us", "p99_us"):
+            ratio = result[key] / old[key] if old[key] else float("inf")
+            flagged |= ratio > threshold
+            cells.append(f"{old[key]:.0f} -> {result[key]:.0f} x{ratio:.2f}")
+        print(f"{name:<16}{cells[0]:>22}{cells[1]:>22}{'  RÉGRESSION' if flagged else ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mesurer les performances des modèles sur un jeu de données généré.")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="small", help="Taille du jeu de données")
+    parser.add_argument("--operators", type=int, help="Nombre d'opérateurs (remplace le profil)")
+    parser.add_argument("--indexes-per-operator", type=int, help="Index par opérateur (remplace le profil)")
+    parser.add_argument("--subscribers", type=int, help="Nombre d'abonnés (remplace le profil)")
+    parser.add_argument("--max-calls", type=int, help="Appels maximum par abonné (remplace le profil)")
+    parser.add_argument("--backend", choices=("json", "sqlite"), default="json", help="Moteur de stockage")
+    parser.add_argument("--seed", type=int, default=42, help="Graine du générateur")
+    parser.add_argument("--iterations", type=int, default=1000, help="Répétitions par mesure")
+    parser.add_argument("--scan-iterations", type=int, default=5, help="Répétitions des mesures qui parcourent tous les clients")
+    parser.add_argument("--workdir", help="Répertoire de travail (par défaut temporaire, supprimé à la fin)")
+    parser.add_argument("--output", help="Fichier JSON des résultats (par défaut Benchmarks/results/)")
+    parser.add_argument("--compare", help="Résultats de référence à comparer")
+    parser.add_argument("--threshold", type=float, default=1.2, help="Ratio de latence signalé comme régression")
+    args = parser.parse_args()
+
+    repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = args.output or os.path.join(
+        repo_dir, "Benchmarks", "results", f"{args.backend}-{args.profile}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    output = os.path.abspath(output)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    dataset = DatasetGenerator.from_profile(
+        args.profile, seed=args.seed, operators=args.operators, indexes_per_operator=args.indexes_per_operator,
+        subscribers=args.subscribers, max_calls=args.max_calls)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="gota-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+
+    from Models.Backend import get_backend, set_default_backend
+    set_default_backend(args.backend)
+    try:
+        print(f"Génération du jeu de données dans {workdir} ...")
+        written = bytes_written()
+        start = time.perf_counter()
+        volumes = dataset.write(get_backend())
+        generation = {
+            "seconds": round(time.perf_counter() - start, 2),
+            "bytes_written": bytes_written() - written if written is not None else None,
+            **volumes,
+        }
+        print(f"{volumes['clients']} abonnés et {volumes['calls']} appels générés en {generation['seconds']}s.")
+
+        benchmarks = run_benchmarks(dataset, args.iterations, args.scan_iterations, args.seed)
+    finally:
+        get_backend().close()
+        if not args.workdir:
+            os.chdir(repo_dir)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "version": code_version(repo_dir),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "backend": args.backend,
+        "profile": args.profile,
+        "dataset": dataset.describe(),
+        "generation": generation,
+        "peak_rss_kb": peak_rss_kb(),
+        "benchmarks": benchmarks,
+    }
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{'mesure':<16}{'p50 (µs)':>12}{'p90 (µs)':>12}{'p99 (µs)':>12}{'op/s':>12}{'octets écrits':>16}")
+    for name, result in benchmarks.items():
+        print(f"{name:<16}{result['p50_us']:>12}{result['p90_us']:>12}{result['p99_us']:>12}"
+              f"{result['ops_per_sec']:>12}{result['bytes_written'] if result['bytes_written'] is not None else '-':>16}")
+    print(f"Pic de mémoire : {report['peak_rss_kb']} Ko. Résultats enregistrés dans {output}")
+    if baseline is not None:
+        compare(baseline, report, args.threshold)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Simulation de trafic d'appels sans carte son : ClientController.request_call et make_call
+pilotés par SyntheticDevices sur une horloge virtuelle
+
+Exemple : python -m Benchmarks.Simulate --calls 2000 --subscribers 500 --backend sqlite
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from typing import List
+
+from Benchmarks.Dataset import DatasetGenerator
+from Benchmarks.Run import bytes_written, peak_rss_kb
+
+
+def directory_size(path: str) -> int:
+    """Place occupée par les fichiers d'un répertoire (octets)."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class TrafficSimulator:
+    """Appels tirés d'une graine, passés un par un par le contrôleur, puis vérifiés.
+
+    Chaque appel a un appelant et un appelé pris parmi les abonnés du jeu de données,
+    décroche avec la probabilité answer_rate après quelques secondes de sonnerie et
+    dure une durée exponentielle de moyenne mean_talk (par pas de block_seconds, pour
+    que la durée facturée soit exacte). Les appels se suivent avec un écart exponentiel
+    de moyenne interval secondes virtuelles.
+
+    Pour chaque appel, le coût attendu est recalculé indépendamment du CreditMeter
+    (tarif par seconde entière, tout le crédit s'il est épuisé) et comparé au débit
+    du crédit de l'appelant et aux historiques des deux abonnés.
+    """
+
+    def __init__(self, dataset: DatasetGenerator, devices, seed: int = 42, answer_rate: float = 0.8,
+                 mean_talk: float = 30, interval: float = 5):
+        # Importés après le changement de répertoire : les modèles travaillent dans BD/
+        from Controllers.Client import ClientController
+
+        self.dataset = dataset
+        self.devices = devices
+        self.rng = random.Random(seed)
+        self.answer_rate = answer_rate
+        self.mean_talk = mean_talk
+        self.interval = interval
+        self.controller = ClientController()
+        self.model = self.controller.model
+        self.outcomes = {"answered": 0, "unanswered": 0, "rejected": 0}
+        self.errors: List[str] = []
+        self.billed = 0.0
+        self.talk_seconds = 0.0
+        self.exhausted = 0
+
+    def _phone(self) -> str:
+        return self.dataset.phone(self.rng.randrange(self.dataset.subscribers))
+
+    def _talk_time(self) -> float:
+        step = self.devices.block_seconds
+        return max(step, round(self.rng.expovariate(1 / self.mean_talk) / step) * step)
+
+    def run(self, calls: int):
+        for number in range(calls):
+            self.devices.sleep(self.rng.expovariate(1 / self.interval))
+            self.call(number)
+
+    def call(self, number: int):
+        caller = self._phone()
+        target = self._phone()
+        while target == caller:
+            target = self._phone()
+        answered = self.rng.random() < self.answer_rate
+        talk = self._talk_time()
+        ring = round(self.rng.uniform(1, 15), 3)
+        if answered:
+            keys = ((ring, "d"), (talk, "r"))
+        elif self.rng.random() < 0.5:
+            keys = ((ring, ""),)  # L'appelant raccroche pendant la sonnerie
+        else:
+            keys = ()  # Personne ne décroche : fin de la sonnerie
+        self.devices.script(lines=(target,), keys=keys)
+
+        credit = self.model.get_client_by_phone(caller)["credit"]
+        caller_calls = self.model.backend.count_calls(caller)
+        target_calls = self.model.backend.count_calls(target)
+        rate = self.controller.get_call_rate(caller, target)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.controller.request_call({"phone": caller})
+
+        if credit <= 0:
+            outcome, cost = "rejected", 0
+        elif not answered:
+            outcome, cost = "unanswered", 0
+        else:
+            outcome = "answered"
+            exhausted = rate > 0 and talk >= credit / rate
+            cost = credit if exhausted else min(rate * int(talk), credit)
+            self.exhausted += exhausted
+            self.talk_seconds += min(talk, credit / rate) if rate > 0 else talk
+        self.outcomes[outcome] += 1
+        self.billed += cost
+        self._check(number, outcome, caller, target, credit - cost,
+                    caller_calls + (outcome == "answered"), target_calls + (outcome == "answered"), cost)
+
+    def _check(self, number: int, outcome: str, caller: str, target: str, credit: float,
+               caller_calls: int, target_calls: int, cost: float):
+        def error(message: str):
+            self.errors.append(f"appel {number} ({outcome}, {caller} -> {target}) : {message}")
+
+        actual = self.model.get_client_by_phone(caller)["credit"]
+        if abs(actual - credit) > 1e-6:
+            error(f"crédit {actual} au lieu de {credit}")
+        if self.model.backend.count_calls(caller) != caller_calls:
+            error(f"{self.model.backend.count_calls(caller)} appels dans l'historique de l'appelant au lieu de {caller_calls}")
+        if self.model.backend.count_calls(target) != target_calls:
+            error(f"{self.model.backend.count_calls(target)} appels dans l'historique de l'appelé au lieu de {target_calls}")
+        if outcome != "answered":
+            return
+        outgoing = self.model.get_call_history(caller, limit=1)[0]
+        incoming = self.model.get_call_history(target, limit=1)[0]
+        if outgoing["direction"] != "outgoing" or outgoing["number"] != target or outgoing["cost"] != cost:
+            error(f"historique de l'appelant incorrect : {outgoing}")
+        if incoming["direction"] != "incoming" or incoming["number"] != caller or incoming["cost"] != cost:
+            error(f"historique de l'appelé incorrect : {incoming}")
+        if not os.path.exists(outgoing["audio_file"]):
+            error(f"enregistrement absent : {outgoing['audio_file']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simuler un trafic d'appels sans périphérique audio et vérifier la facturation.")
+    parser.add_argument("--calls", type=int, default=1000, help="Nombre d'appels simulés")
+    parser.add_argument("--subscribers", type=int, default=1000, help="Nombre d'abonnés")
+    parser.add_argument("--operators", type=int, default=5, help="Nombre d'opérateurs")
+    parser.add_argument("--backend", choices=("json", "sqlite"), default="json", help="Moteur de stockage")
+    parser.add_argument("--seed", type=int, default=42, help="Graine du jeu de données et du trafic")
+    parser.add_argument("--answer-rate", type=float, default=0.8, help="Proportion d'appels décrochés")
+    parser.add_argument("--mean-talk", type=float, default=30, help="Durée moyenne de conversation (secondes)")
+    parser.add_argument("--interval", type=float, default=5, help="Écart moyen entre deux appels (secondes virtuelles)")
+    parser.add_argument("--workdir", help="Répertoire de travail (par défaut temporaire, supprimé à la fin)")
+    parser.add_argument("--output", help="Fichier JSON du rapport")
+    args = parser.parse_args()
+
+    dataset = DatasetGenerator(operators=args.operators, indexes_per_operator=3, subscribers=args.subscribers,
+                               max_calls=0, managers=0, seed=args.seed)
+    repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    workdir = args.workdir or tempfile.mkdtemp(prefix="gota-simulation-")
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+
+    from Models.Backend import get_backend, set_default_backend
+    from Models.Devices import SyntheticDevices, set_default_devices
+    from Models.Recordings import RecordingStore
+    set_default_backend(args.backend)
+    devices = SyntheticDevices(seed=args.seed)
+    set_default_devices(devices)
+    try:
+        print(f"Génération de {args.subscribers} abonnés dans {workdir} ...")
+        dataset.write(get_backend())
+        simulator = TrafficSimulator(dataset, devices, seed=args.seed, answer_rate=args.answer_rate,
+                                     mean_talk=args.mean_talk, interval=args.interval)
+        size_before = directory_size("BD")
+        written = bytes_written()
+        clock = devices.now()
+        start = time.perf_counter()
+        simulator.run(args.calls)
+        elapsed = time.perf_counter() - start
+        size_after = directory_size("BD")
+        recordings = RecordingStore().usage()
+        report = {
+            "backend": args.backend,
+            "calls": args.calls,
+            "outcomes": simulator.outcomes,
+            "credit_exhausted": simulator.exhausted,
+            "seconds": round(elapsed, 2),
+            "calls_per_sec": round(args.calls / elapsed, 1) if elapsed else None,
+            "virtual_seconds": round(devices.now() - clock),
+            "talk_seconds": round(simulator.talk_seconds, 1),
+            "speedup": round(devices.audio_seconds / elapsed, 1) if elapsed else None,
+            "billed": simulator.billed,
+            "billing_errors": len(simulator.errors),
+            "storage": {
+                "bytes_before": size_before,
+                "bytes_after": size_after,
+                "bytes_per_answered_call": (size_after - size_before) // max(simulator.outcomes["answered"], 1),
+                "recordings_bytes": directory_size(os.path.join("BD", "calls")),
+                "recordings": recordings,
+                "bytes_written": bytes_written() - written if written is not None else None,
+            },
+            "peak_rss_kb": peak_rss_kb(),
+        }
+    finally:
+        get_backend().close()
+        if not args.workdir:
+            os.chdir(repo_dir)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({**report, "errors": simulator.errors}, f, indent=2)
+
+    outcomes = report["outcomes"]
+    storage = report["storage"]
+    print(f"{args.calls} appels en {report['seconds']}s ({report['calls_per_sec']} appels/s) : "
+          f"{outcomes['answered']} décrochés, {outcomes['unanswered']} sans réponse, {outcomes['rejected']} refusés.")
+    print(f"{report['virtual_seconds']}s simulées dont {report['talk_seconds']}s de conversation "
+          f"({report['speedup']}x le temps réel), {report['credit_exhausted']} appel(s) coupé(s) par le crédit.")
+    print(f"Stockage : {storage['bytes_before']} -> {storage['bytes_after']} octets "
+          f"({storage['bytes_per_answered_call']} par appel décroché, {storage['recordings_bytes']} d'enregistrements).")
+    print(f"Facturé : {report['billed']}F. Erreurs de facturation : {report['billing_errors']}.")
+    for message in simulator.errors[:10]:
+        print(f"  {message}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,13 +2,16 @@
 Contrôleur pour les clients
 """
 
-from Models.Client import ClientModel
+from consts import DEFAULT_CALL_RATE
+from Models.Service import get_client_model
+from Models.Devices import get_devices
+from Models.Routing import get_router
 from Views.Client import *
 from Controllers.Functions import *
 
 class ClientController:
     def __init__(self):
-        self.model = ClientModel()
+        self.model = get_client_model()
 
     def login_client(self) -> bool:
         """Effectue la connexion du client avec 3 tentatives possibles."""
@@ -64,21 +67,10 @@ class ClientController:
 
     def get_call_rate(self, phone1: str, phone2: str) -> int:
         """Retourne le tarif de l'appel entre deux numéros en fonction de leur opérateur."""
-        # On récupère les préfixes des deux numéros
-        index1 = phone1[:2]  # Les 2 premiers chiffres
-        index2 = phone2[:2]
-
-        operateur_model = OperateurModel()
-        operators = operateur_model.get_all_operators()
-        operator1 = None
-        operator2 = None
-
-        # Trouver l'opérateur pour chaque téléphone
-        for operator in operators:
-            if index1 in operator["indexes"]:
-                operator1 = operator
-            if index2 in operator["indexes"]:
-                operator2 = operator
+        # Trouver l'opérateur de chaque téléphone via la table de routage des préfixes
+        router = get_router()
+        operator1 = router.resolve(phone1)
+        operator2 = router.resolve(phone2)
 
         # Si les deux numéros sont du même opérateur
         if operator1 and operator2:
@@ -86,11 +78,11 @@ class ClientController:
                 return operator1["rates"]["same_operator"]
             else:
                 return operator1["rates"]["different_operator"]
-        return 2
+        return DEFAULT_CALL_RATE
 
     def request_call(self, client_logged):
         """Permet au client de passer un appel si son crédit est suffisant."""
-        target_number = input("Numéro à appeler : ")
+        target_number = get_devices().read_line("Numéro à appeler : ")
 
         if client_logged['phone'] == target_number:
             print_message("", "ERROR")
@@ -123,6 +115,40 @@ class ClientController:
         self.model.make_call(client, display_name, target_number, rate)
 
 
+    def transfer_credit(self, client_logged):
+        """Transfère du crédit vers un ou plusieurs numéros (même montant pour chacun)."""
+        pin = input("Entrez votre code pin : ")
+        if not client_logged or client_logged["pin"] != pin:
+            print_message("Code pin incorrecte", "ERROR")
+            return
+
+        recipients = input("Numéro(s) du bénéficiaire (séparés par des espaces) : ").replace(",", " ").split()
+        if not recipients:
+            print_message("Aucun bénéficiaire.", "ERROR")
+            return
+        for phone in recipients:
+            validation_message = validate_phone_number(phone)
+            if validation_message:
+                print_message(validation_message, "ERROR")
+                return
+
+        amount = input("Montant à transférer à chaque bénéficiaire : ").strip()
+        if not amount.isdigit() or int(amount) <= 0:
+            print_message("Le montant doit être un nombre entier positif.", "ERROR")
+            return
+        amount = int(amount)
+
+        total = amount * len(recipients)
+        confirm = input(f"Entrez 'oui' pour transférer {total}F vers {len(recipients)} numéro(s) : ").strip().lower()
+        if confirm != "oui":
+            print_message("Transfert annulé.", "INFO")
+            return
+
+        success, message = self.model.transfer_credit(client_logged["phone"], [(phone, amount) for phone in recipients])
+        print_message(message, "SUCCESS" if success else "ERROR")
+        return success
+
+
     def add_credit(self, phone: str, amount: float) -> bool:
         """Ajoute du crédit à un client."""
         client = self.model.get_client_by_phone(phone)
@@ -140,7 +166,7 @@ class ClientController:
     def get_call_history(self, client_logged) -> None:
         """Obtenir et afficher l'historique des appels d'un client."""
         client = self.model.get_client_by_phone(client_logged["phone"])
-        if client and client.get("call_history"):
+        if client and self.model.get_call_history(client["phone"], limit=1):
             display_call_history(client)
         else:
             print_message("Aucun appel trouvé dans l'historique.", "INFO")
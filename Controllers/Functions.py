@@ -6,7 +6,8 @@ from Views.Client import display_client_menu
 from Views.Functions import print_menu, print_message
 from Views.Operateur import display_operator_menu
 from consts import *
-from Models.Operateur import OperateurModel
+from Models.Service import get_operator_model
+from Models.Routing import get_router
 
 
 def handle_operator_menu(controller):
@@ -55,7 +56,11 @@ def handle_operator_menu(controller):
 
         elif choice == 8:
             # Afficher l'état de la caisse
-            controller.get_cash_state(username)
+            controller.cash_state_menu(username)
+
+        elif choice == 9:
+            # Ventes en masse depuis un fichier CSV
+            controller.bulk_provision(username)
 
 
 def handle_client_menu(controller):
@@ -94,7 +99,7 @@ def handle_client_menu(controller):
 
             elif choice == 5:
                 # Transférer du crédit
-                print_message("En maintenance ...", "INFO")
+                controller.transfer_credit(client_logged)
 
 
 def validate_operator_name(name: str) -> str:
@@ -105,8 +110,8 @@ def validate_operator_name(name: str) -> str:
         return f"Le nom de l'opérateur doit comporter au maximum {MAX_OPERATOR_NAME_LENGTH} caractères."
 
     # Récupère les opérateurs
-    operateur_model = OperateurModel()
-    existing_operators = operateur_model.get_all_operators()
+    operateur_model = get_operator_model()
+    existing_operators = operateur_model.get_operators_snapshot()
 
     # Vérifier l'unicité du nom
     for operator in existing_operators:
@@ -133,15 +138,25 @@ def validate_amount(amount: float) -> str:
         return f"Le montant doit être d'au moins {MIN_CREDIT_AMOUNT}."
     return ""
 
-def validate_index(index: str) -> str:
-    """Valide un index pour l'opérateur."""
-    if len(index) != INDEX_LENGTH or not index.isdigit():
-        return f"L'index doit être composé de {INDEX_LENGTH} chiffres."
+def validate_index(index: str, check_overlap: bool = True) -> str:
+    """Valide un index pour l'opérateur.
+
+    Un nouvel index (check_overlap) ne doit ni égaler, ni prolonger, ni être le début
+    d'un index déjà attribué : sinon certains numéros auraient deux opérateurs.
+    """
+    if not index.isdigit() or not MIN_INDEX_LENGTH <= len(index) <= MAX_INDEX_LENGTH:
+        return f"L'index doit être composé de {MIN_INDEX_LENGTH} à {MAX_INDEX_LENGTH} chiffres."
+    if check_overlap:
+        existing = get_router().conflict(index)
+        if existing == index:
+            return "Cet index est déjà utilisé par un autre opérateur."
+        if existing is not None:
+            return f"L'index {index} chevauche l'index {existing} déjà attribué."
     return ""
 
 def if_operator_exist(operator_name):
-    operateur_model = OperateurModel()
-    operators = operateur_model.get_all_operators()
+    operateur_model = get_operator_model()
+    operators = operateur_model.get_operators_snapshot()
     for operator in operators:
         if operator_name.lower() == operator['name'].lower():
             return True
@@ -163,15 +178,10 @@ def get_user_choice(max_choice: int, options) -> int:
 
 def get_operator_by_phone(phone: str) -> str:
     """Récupère le nom de l'opérateur à partir du numéro de téléphone."""
-    # Récupère l'index
-    index = phone[:2]
-    operateur_model = OperateurModel()
-
-    # Vérification si les index des opérateurs sont bien définis
-    for operator in operateur_model.get_all_operators():
-        if index in operator["indexes"]:
-            return operator["name"]
+    # Recherche l'opérateur dont l'index préfixe le numéro
+    operator = get_router().resolve(phone)
+    if operator:
+        return operator["name"]
 
     # Si aucun opérateur n'est trouvé, afficher un message explicite
-    return f"Aucun opérateur trouvé pour le préfixe {index} du numéro {phone}."
-
+    return f"Aucun opérateur trouvé pour le préfixe du numéro {phone}."
@@ -3,15 +3,17 @@ Contrôleur pour les opérateurs
 """
 
 import os
+from datetime import date
 from Controllers.Client import ClientController
-from Models.Operateur import OperateurModel
+from Controllers.Provisioning import ProvisioningController
+from Models.Service import get_operator_model
 from Views.Operateur import *
 from Controllers.Functions import *
 
 
 class OperateurController:
     def __init__(self):
-        self.model = OperateurModel()
+        self.model = get_operator_model()
 
     def login_manager(self):
         operator_logged_in = False
@@ -83,9 +85,6 @@ class OperateurController:
         if index_validation_message:
             print_message(index_validation_message, "ERROR")
             return
-        if not self.model.is_index_unique(index):
-            print_message("Cet index est déjà utilisé par un autre opérateur.", "ERROR")
-            return
         if self.model.create_operator(operator_name, index):
             print_message(f"L'opérateur {operator_name} a été créé avec succès.", "SUCCESS")
             return
@@ -116,7 +115,7 @@ class OperateurController:
 
     def list_operators(self):
         """Liste tous les opérateurs."""
-        operators = self.model.get_all_operators()
+        operators = self.model.get_operators_snapshot()
 
         if not operators:
             print_message("Aucun opérateur trouvé.", "INFO")
@@ -135,7 +134,7 @@ class OperateurController:
             operator_name = input("Entrez le nom de l'opérateur: ")
 
         # Récupérer tous les opérateurs
-        operators = self.model.get_all_operators()
+        operators = self.model.get_operators_snapshot()
 
         # Vérifier si des opérateurs ont été récupérer
         if not operators:
@@ -147,7 +146,7 @@ class OperateurController:
             if operator["name"].lower() == operator_name.lower():
                 indexes = operator.get("indexes", [])
 
-                if isinstance(indexes, list) and len(indexes) > 1:
+                if isinstance(indexes, (list, tuple)) and len(indexes) > 1:
                     # Afficher les index et demander à l'utilisateur de choisir
                     print_message("L'opérateur a plusieurs index :", "INFO")
                     for i, index in enumerate(indexes):
@@ -157,7 +156,7 @@ class OperateurController:
 
                     if 0 <= choice < len(indexes):
                         chosen_index = indexes[choice]
-                        numbers = [num for num in operator["numbers"] if num.startswith(chosen_index)]
+                        numbers = self.model.available_numbers(operator, chosen_index)
                         display_numbers_for_index(operator["name"], chosen_index, numbers)
                         return operator, chosen_index
                     else:
@@ -166,7 +165,8 @@ class OperateurController:
                 else:
                     # Si un seul index, afficher directement les numéros
                     index = indexes[0] if indexes else ""
-                    display_numbers_for_index(operator["name"], index, operator["numbers"])
+                    numbers = self.model.available_numbers(operator, index) if index else []
+                    display_numbers_for_index(operator["name"], index, numbers)
                 return operator, index
         # Si l'opérateur n'est pas trouvé
         print_message(f"Aucun opérateur trouvé avec le nom {operator_name}.", "INFO")
@@ -189,7 +189,7 @@ class OperateurController:
             choice = input("Votre choix: ")
 
             if choice == '1':  # Ajouter un index
-                operators = self.model.get_all_operators()
+                operators = self.model.get_operators_snapshot()
                 for operator in operators:
                     if operator_name.lower() == operator['name'].lower():
                         # Vérifier si l'opérateur a déjà 3 index
@@ -197,10 +197,7 @@ class OperateurController:
                             print_message(f"L'opérateur {operator_name} a déjà 3 index, il ne peut pas en ajouter un autre.", "INFO")
                             break
                         # Si l'opérateur a moins de 3 index, on peut ajouter un nouveau
-                        index = input("Entrez le nouvel index: ")
-                        if not self.model.is_index_unique(index):
-                            print_message("Cet index est déjà utilisé par un autre opérateur.", "ERROR")
-                            continue
+                        index = input("Entrez le nouvel index: ").strip()
                         index_validation_message = validate_index(index)
                         if index_validation_message:
                             print_message(index_validation_message, "ERROR")
@@ -212,17 +209,22 @@ class OperateurController:
                             print_message(f"Échec de l'ajout de l'index {index}.", "ERROR")
                         break
             elif choice == '2':  # Supprimer un index
-                index = input("Entrez l'index à supprimer: ")
-                index_validation_message = validate_index(index)
+                index = input("Entrez l'index à supprimer: ").strip()
+                index_validation_message = validate_index(index, check_overlap=False)
                 if index_validation_message:
                     print_message(index_validation_message, "ERROR")
                     continue
 
-                operators = self.model.get_all_operators()
+                operators = self.model.get_operators_snapshot()
                 for operator in operators:
                     if operator_name.lower() == operator['name'].lower():
                         if len(operator["indexes"]) == 1:
-                            if self.model.remove_index_from_operator(operator_name, index):
+                            if index not in operator["indexes"]:
+                                print_message(f"L'index {index} n'existe pas pour l'opérateur {operator_name}.", "INFO")
+                                continue
+                            print_message(f"L'opérateur {operator_name} n'a qu'un seul index {index}.\nSupprimer cet index entraînera également la suppression de l'opérateur.", "INFO")
+                            confirmed = input("Entrez 'oui' pour confirmer la suppression : ").strip().lower() == "oui"
+                            if self.model.remove_index_from_operator(operator_name, index, delete_operator=confirmed):
                                 print_message(f"L'index {index} et l'opérateur {operator_name} ont été supprimés avec succès.", "SUCCESS")
                                 return
                         elif self.model.remove_index_from_operator(operator_name, index):
@@ -285,7 +287,7 @@ class OperateurController:
 
     def sell_credit_to_client(self, manager_name: str) -> bool:
         """Vente de crédit à un client spécifique."""
-        operators = self.model.get_all_operators()
+        operators = self.model.get_operators_snapshot()
         if not operators:
             print_message("Aucun opérateur trouvé.", "INFO")
         else:
@@ -313,7 +315,7 @@ class OperateurController:
         if success:
             # Enregistrer la vente de crédit
             operator_name = get_operator_by_phone(phone)
-            self.model.record_credit_sale(operator_name, amount, manager_name)
+            self.model.record_credit_sale(operator_name, amount, manager_name, phone)
             print_message(f"Succès ! {amount}F de crédit ont été ajoutés au compte du client {phone}.", "SUCCESS")
             return True
         else:
@@ -322,18 +324,69 @@ class OperateurController:
             return False
 
 
-    def get_cash_state(self, manager_name: str):
-        """Affiche l'état de la caisse du gestionnaire avec un détail par opérateur."""
-        cashier_data = self.model._load_cashier()
+    def cash_state_menu(self, manager_name: str):
+        """Demande une période (facultative) puis affiche l'état de la caisse."""
+        period = input("Période 'AAAA-MM-JJ AAAA-MM-JJ' (vide pour jour, mois et année en cours): ").split()
+        if not period:
+            self.get_cash_state(manager_name)
+            return
+        try:
+            start = date.fromisoformat(period[0])
+            end = date.fromisoformat(period[-1])
+        except ValueError:
+            print_message("Date invalide : utilisez le format AAAA-MM-JJ.", "ERROR")
+            return
+        if len(period) > 2 or end < start:
+            print_message("Période invalide : une date de début puis une date de fin.", "ERROR")
+            return
+        self.get_cash_state(manager_name, start, end)
+
+
+    def get_cash_state(self, manager_name: str, start: date = None, end: date = None):
+        """Affiche l'état de la caisse du gestionnaire avec un détail par opérateur.
+
+        Sans période : ventes du jour, du mois et de l'année en cours. Les cumuls sont
+        lus dans quelques compartiments pré-agrégés, sans parcourir le journal des ventes.
+        """
+        if start is not None:
+            totals = self.model.get_sales_totals(start, end or start, manager_name).get(manager_name, {})
+            if not totals:
+                print_message(f"Aucune vente du {start} au {end or start} pour le gestionnaire {manager_name}.", "INFO")
+                return
+            print_message(f"État de la caisse pour le gestionnaire {manager_name} du {start} au {end or start}:", "INFO")
+            for operator_name, amount in sorted(totals.items()):
+                print(f"Opérateur {operator_name}: {amount}F")
+            print(f"Total : {sum(totals.values())}F")
+            return
 
-        if manager_name not in cashier_data:
+        today = date.today()
+        periods = [(label, self.model.get_bucket_totals(bucket, manager_name).get(manager_name, {}))
+                   for label, bucket in (("du jour", f"{today:%Y-%m-%d}"), ("du mois", f"{today:%Y-%m}"),
+                                         ("de l'année", f"{today:%Y}"))]
+        legacy = self.model.get_legacy_cashier().get(manager_name, {})
+        operator_names = sorted({name for _, totals in periods for name in totals} | set(legacy))
+        if not operator_names:
             print_message(f"Aucune donnée pour le gestionnaire {manager_name}.", "INFO")
             return
 
         print_message(f"État de la caisse pour le gestionnaire {manager_name}:", "INFO")
-        for operator_name, data in cashier_data[manager_name].items():
+        for operator_name in operator_names:
             print(f"Opérateur {operator_name}:")
-            print(f"  - État du jour : {data['daily']}F")
-            print(f"  - État du mois : {data['monthly']}F")
-            print(f"  - État de l'année : {data['yearly']}F")
+            for label, totals in periods:
+                print(f"  - État {label} : {totals.get(operator_name, 0)}F")
+            if operator_name in legacy:
+                # Anciens compteurs de caisses.txt, figés depuis la mise en place du journal
+                print(f"  - Cumul avant le journal des ventes : {legacy[operator_name]['yearly']}F")
+
+
+    def bulk_provision(self, manager_name: str):
+        """Ventes en masse de numéros et de crédit à partir d'un fichier CSV."""
+        print_message("Format : une vente par ligne, 'opérateur,numéro,PIN' ou 'numéro,montant'.", "INFO")
+        file_path = input("Chemin du fichier CSV : ").strip()
+        if not os.path.isfile(file_path):
+            print_message(f"Le fichier {file_path} est introuvable.", "ERROR")
+            return False
 
+        results = ProvisioningController().provision(file_path, manager_name)
+        display_provisioning_results(results)
+        return all(result["ok"] for result in results)
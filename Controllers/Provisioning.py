@@ -0,0 +1,144 @@
+"""
+Contrôleur pour la vente en masse de numéros et de crédit à partir d'un fichier CSV
+"""
+
+import csv
+from typing import Dict, List, Optional
+from consts import OPERATOR_UPDATE_RETRIES
+from Models.NumberPool import NumberPool
+from Models.Sales import new_sale
+from Models.Service import get_client_model, get_operator_model
+from Controllers.Functions import (validate_phone_number, validate_pin, validate_amount,
+                                   get_operator_by_phone)
+
+
+class ProvisioningController:
+    """Valide un lot de ventes en une passe puis l'enregistre en une seule écriture.
+
+    Chaque ligne du CSV est soit une vente de numéro (opérateur, numéro, PIN),
+    soit une vente de crédit (numéro, montant).
+    """
+
+    def __init__(self):
+        self.model = get_operator_model()
+        self.client_model = get_client_model()
+
+    @staticmethod
+    def read_rows(file_path: str) -> List[tuple]:
+        """Lignes non vides du fichier, avec leur numéro ; une ligne d'en-tête éventuelle est ignorée."""
+        rows = []
+        with open(file_path, "r", newline="", encoding="utf-8") as f:
+            for line_number, row in enumerate(csv.reader(f), 1):
+                row = [cell.strip() for cell in row]
+                if not any(row):
+                    continue
+                # En-tête : aucune colonne entièrement numérique
+                if not rows and not any(cell.isdigit() for cell in row):
+                    continue
+                rows.append((line_number, row))
+        return rows
+
+    def provision(self, file_path: str, manager_name: Optional[str] = None,
+                  strict: bool = False, dry_run: bool = False) -> List[Dict]:
+        """Traiter un fichier de ventes. Retourne le résultat de chaque ligne.
+
+        Les lignes valides sont enregistrées ensemble ; avec strict, une seule ligne
+        invalide fait rejeter tout le lot. Avec dry_run, rien n'est enregistré.
+        """
+        rows = self.read_rows(file_path)
+        for _ in range(OPERATOR_UPDATE_RETRIES):
+            results, clients, credits, operators, credit_sales = self._validate(rows, manager_name)
+            accepted = [result for result in results if result["ok"]]
+            if strict and len(accepted) != len(results):
+                for result in accepted:
+                    result.update(ok=False, message="Non enregistré : le lot contient des lignes invalides.")
+                return results
+            if dry_run or not accepted:
+                return results
+            try:
+                # Refusé si une autre session a modifié entre-temps un opérateur du lot : on revalide
+                if self.model.apply_provisioning(clients, credits, operators, credit_sales):
+                    return results
+            except Exception as e:
+                for result in accepted:
+                    result.update(ok=False, message=f"Non enregistré : {e}")
+                return results
+        for result in accepted:
+            result.update(ok=False, message="Non enregistré : opérateurs modifiés par une autre session, réessayez.")
+        return results
+
+    def _validate(self, rows: List[tuple], manager_name: Optional[str]) -> tuple:
+        """Valider toutes les lignes en une passe. Retourne les résultats et le lot à enregistrer."""
+        operators_by_name = {operator["name"].lower(): operator for operator in self.model.get_all_operators()}
+        pools: Dict[tuple, NumberPool] = {}
+        sold = set()
+        clients, credits, credit_sales = [], [], []
+        results = []
+
+        for line_number, row in rows:
+            result = {"line": line_number, "phone": "", "ok": False, "message": ""}
+            results.append(result)
+
+            if len(row) == 3:
+                operator_name, phone, pin = row
+                result["phone"] = phone
+                operator = operators_by_name.get(operator_name.lower())
+                error = validate_phone_number(phone) or validate_pin(pin)
+                if operator is None:
+                    error = f"L'opérateur {operator_name} n'existe pas."
+                if not error:
+                    index = next((index for index in operator["indexes"] if phone.startswith(index)), None)
+                    if index is None:
+                        error = f"Le numéro {phone} n'appartient à aucun index de l'opérateur {operator['name']}."
+                    else:
+                        # Réserves décodées une seule fois et partagées par toutes les lignes du lot
+                        pool = pools.get((operator["name"], index))
+                        if pool is None:
+                            pool = pools[(operator["name"], index)] = self.model.get_pool(operator, index)
+                        if self.client_model.client_exists(phone) or not pool.allocate(phone):
+                            error = f"Le numéro {phone} est déjà pris ou n'est pas disponible chez l'opérateur {operator['name']}."
+                if error:
+                    result["message"] = error
+                    continue
+                clients.append(self.client_model.new_client(phone, pin))
+                sold.add(phone)
+                result.update(ok=True, message=f"Numéro vendu par l'opérateur {operator['name']}.")
+
+            elif len(row) == 2:
+                phone, amount = row
+                result["phone"] = phone
+                error = validate_phone_number(phone)
+                if not error and not amount.isdigit():
+                    error = "Le montant doit être un nombre entier."
+                if not error:
+                    amount = int(amount)
+                    error = validate_amount(amount)
+                if not error and manager_name is None:
+                    error = "Un gestionnaire est requis pour vendre du crédit."
+                if not error and phone not in sold and not self.client_model.client_exists(phone):
+                    error = "Client introuvable."
+                if error:
+                    result["message"] = error
+                    continue
+                credits.append((phone, amount))
+                credit_sales.append(new_sale(manager_name, get_operator_by_phone(phone), amount, phone))
+                result.update(ok=True, message=f"{amount}F de crédit vendus.")
+
+            else:
+                result["message"] = "Ligne invalide : attendu (opérateur, numéro, PIN) ou (numéro, montant)."
+
+        # Opérateurs modifiés, chacun avec la version à laquelle il a été lu
+        touched = {}
+        for (operator_name, index), pool in pools.items():
+            operator = touched[operator_name] = operators_by_name[operator_name.lower()]
+            operator["pools"][index] = pool.to_dict()
+        return results, clients, credits, list(touched.values()), credit_sales
+
+    @staticmethod
+    def write_report(results: List[Dict], file_path: str):
+        """Écrire le résultat de chaque ligne dans un fichier CSV."""
+        with open(file_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["ligne", "numero", "statut", "message"])
+            for result in results:
+                writer.writerow([result["line"], result["phone"], "OK" if result["ok"] else "ERREUR", result["message"]])
@@ -0,0 +1,68 @@
+"""
+Contrôleur pour les transferts de crédit en masse (campagnes promotionnelles) à partir d'un fichier CSV
+"""
+
+from typing import Dict, List
+from Models.Service import call_many, get_client_model
+from Controllers.Functions import validate_phone_number
+from Controllers.Provisioning import ProvisioningController
+
+
+class TransferController:
+    """Valide toutes les lignes d'un fichier (numéro, montant) puis les transfère en une seule écriture."""
+
+    def __init__(self):
+        self.model = get_client_model()
+
+    def transfer(self, source: str, file_path: str, strict: bool = False, dry_run: bool = False) -> List[Dict]:
+        """Transférer du crédit de source vers chaque ligne valide du fichier. Retourne le résultat de chaque ligne.
+
+        Les lignes valides sont transférées ensemble, ou aucune si le crédit de la source ne suffit pas.
+        Avec strict, une seule ligne invalide fait rejeter tout le lot. Avec dry_run, rien n'est enregistré.
+        """
+        results = []
+        candidates = []
+        transfers = []
+        source_client = self.model.get_client_by_phone(source)
+        for line_number, row in ProvisioningController.read_rows(file_path):
+            result = {"line": line_number, "phone": row[0], "ok": False, "message": ""}
+            results.append(result)
+            if len(row) != 2:
+                result["message"] = "Ligne invalide : attendu (numéro, montant)."
+                continue
+            phone, amount = row
+            error = validate_phone_number(phone)
+            if not error and (not amount.isdigit() or int(amount) <= 0):
+                error = "Le montant doit être un nombre entier positif."
+            if not error and phone == source:
+                error = "Impossible de transférer du crédit vers le numéro source."
+            if error:
+                result["message"] = error
+                continue
+            candidates.append((result, phone, amount))
+
+        # Existence des bénéficiaires vérifiée en une seule série de requêtes avec le service
+        exists = call_many(self.model, "client_exists", [(phone,) for _, phone, _ in candidates])
+        for (result, phone, amount), found in zip(candidates, exists):
+            if not found:
+                result["message"] = "Client introuvable."
+                continue
+            transfers.append((phone, int(amount)))
+            result.update(ok=True, message=f"{amount}F transférés.")
+
+        accepted = [result for result in results if result["ok"]]
+        error = None
+        if source_client is None:
+            error = f"Le numéro source {source} n'est attribué à aucun client."
+        elif strict and len(accepted) != len(results):
+            error = "le lot contient des lignes invalides."
+        elif dry_run or not accepted:
+            return results
+        else:
+            success, message = self.model.transfer_credit(source, transfers)
+            if not success:
+                error = message
+        if error:
+            for result in accepted:
+                result.update(ok=False, message=f"Non enregistré : {error}")
+        return results
@@ -0,0 +1,339 @@
+"""
+Export en colonnes des appels et des ventes pour les rapports (fichiers projetables en mémoire)
+"""
+
+import json
+import os
+import struct
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from consts import DATA_DIR, PHONE_NUMBER_LENGTH
+from Models.Backend import StorageBackend, get_backend
+from Models.Functions import call_timestamp
+from Models.Locks import file_lock
+from Models.Routing import PrefixRouter
+
+
+MAGIC = b"GOTACOL1"
+# Taille initiale de l'en-tête (schéma JSON complété par des espaces) ; doublée s'il déborde
+HEADER_SIZE = 4096
+# Lignes ajoutées par écriture, et lues par bloc dans les requêtes : la mémoire reste bornée
+EXPORT_CHUNK = 100_000
+
+DIRECTIONS = ("outgoing", "incoming")
+UNKNOWN = "inconnu"
+
+CALL_FIELDS = [
+    ("timestamp", "<i8"),
+    ("day", "<i4"),  # Jour (date.toordinal) en heure locale
+    ("phone", f"S{PHONE_NUMBER_LENGTH}"),  # Abonné dont c'est l'historique
+    ("number", f"S{PHONE_NUMBER_LENGTH}"),  # Correspondant
+    ("operator", "<u2"),  # Opérateur de l'abonné (code du dictionnaire "operator")
+    ("direction", "u1"),  # Position dans DIRECTIONS
+    ("duration", "<i4"),
+    ("cost", "<f8"),
+]
+
+SALE_FIELDS = [
+    ("timestamp", "<i8"),
+    ("day", "<i4"),
+    ("manager", "<u2"),  # Code du dictionnaire "manager"
+    ("operator", "<u2"),
+    ("phone", f"S{PHONE_NUMBER_LENGTH}"),
+    ("amount", "<f8"),
+]
+
+
+def _day(timestamp: float) -> int:
+    return datetime.fromtimestamp(timestamp).date().toordinal()
+
+
+class ColumnarFile:
+    """Tableau structuré NumPy sur disque précédé d'un en-tête JSON (schéma, nombre de lignes, dictionnaires).
+
+    Les lignes sont ajoutées en fin de fichier puis le nombre de lignes de l'en-tête est mis à jour :
+    une écriture interrompue n'est jamais visible et sera écrasée par l'ajout suivant.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def read_header(self) -> Dict:
+        with open(self.path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{self.path} n'est pas un fichier d'export en colonnes.")
+            (size,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(size - len(MAGIC) - 4))
+        header["header_size"] = size
+        return header
+
+    @staticmethod
+    def dtype(header: Dict) -> np.dtype:
+        return np.dtype([(name, fmt) for name, fmt in header["fields"]])
+
+    def create(self, fields: List[tuple], dictionaries: Iterable[str], **extra):
+        header = {"fields": fields, "count": 0, "dictionaries": {name: [] for name in dictionaries}, **extra}
+        with open(self.path, "wb") as f:
+            self._write_header(f, header, HEADER_SIZE)
+            f.flush()
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def _encode_header(header: Dict, size: int) -> Optional[bytes]:
+        payload = json.dumps({key: value for key, value in header.items() if key != "header_size"}).encode("utf-8")
+        if len(MAGIC) + 4 + len(payload) > size:
+            return None
+        return MAGIC + struct.pack("<I", size) + payload.ljust(size - len(MAGIC) - 4)
+
+    def _write_header(self, f, header: Dict, size: int):
+        f.seek(0)
+        f.write(self._encode_header(header, size))
+
+    def records(self) -> np.ndarray:
+        """Lignes validées, projetées en mémoire (lecture seule)."""
+        header = self.read_header()
+        if not header["count"]:
+            return np.zeros(0, dtype=self.dtype(header))
+        return np.memmap(self.path, dtype=self.dtype(header), mode="r",
+                         offset=header["header_size"], shape=(header["count"],))
+
+    def append(self, header: Dict, rows: np.ndarray) -> Dict:
+        """Ajouter des lignes et enregistrer l'en-tête (dictionnaires et état de l'export compris)."""
+        size = header["header_size"]
+        encoded = self._encode_header(dict(header, count=header["count"] + len(rows)), size)
+        if encoded is None:
+            # En-tête trop petit : le fichier est réécrit avec un en-tête plus grand
+            return self.append(dict(header, header_size=self._grow_header(header, size * 2)), rows)
+
+        itemsize = self.dtype(header).itemsize
+        with open(self.path, "r+b") as f:
+            f.seek(size + header["count"] * itemsize)
+            f.write(rows.tobytes())
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+            f.seek(0)
+            f.write(encoded)
+            f.flush()
+            os.fsync(f.fileno())
+        return dict(header, count=header["count"] + len(rows))
+
+    def _grow_header(self, header: Dict, size: int) -> int:
+        while self._encode_header(header, size) is None:
+            size *= 2
+        itemsize = self.dtype(header).itemsize
+        tmp_path = f"{self.path}.tmp"
+        with open(self.path, "rb") as source, open(tmp_path, "wb") as target:
+            self._write_header(target, header, size)
+            source.seek(header["header_size"])
+            remaining = header["count"] * itemsize
+            while remaining:
+                block = source.read(min(remaining, 1 << 20))
+                target.write(block)
+                remaining -= len(block)
+            target.flush()
+            os.fsync(target.fileno())
+        os.replace(tmp_path, self.path)
+        return size
+
+
+def _code(dictionary: List[str], value: str) -> int:
+    """Code d'une valeur dans un dictionnaire d'en-tête (ajoutée si elle est nouvelle)."""
+    try:
+        return dictionary.index(value)
+    except ValueError:
+        dictionary.append(value)
+        return len(dictionary) - 1
+
+
+class AnalyticsExport:
+    """Appels et ventes exportés en colonnes, avec des cumuls par opérateur, par jour et par sens.
+
+    Chaque export n'ajoute que ce qui est nouveau : le nombre d'appels déjà exportés par abonné
+    et la position atteinte dans le journal des ventes sont gardés avec les fichiers.
+
+    Les appels sans date exploitable (anciens enregistrements) sont exportés avec
+    l'horodatage -1 et le jour 0 : comptés dans les rapports sans période, jamais
+    dans une période.
+    """
+
+    def __init__(self, directory: str = os.path.join(DATA_DIR, "analytics"), backend: StorageBackend = None):
+        self.directory = directory
+        self.backend = backend or get_backend()
+        self.calls_file = ColumnarFile(os.path.join(directory, "calls.col"))
+        self.sales_file = ColumnarFile(os.path.join(directory, "sales.col"))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = file_lock(os.path.join(directory, "export.lock"))
+        self.undated = 0  # Appels sans date exploitable du dernier export
+
+    # Export
+
+    def export(self) -> Dict[str, int]:
+        """Ajouter les appels et les ventes enregistrés depuis le dernier export. Retourne les volumes ajoutés."""
+        with self._lock:
+            self.undated = 0
+            return {"calls": self._export_calls(), "sales": self._export_sales(), "undated": self.undated}
+
+    def _positions_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"calls.positions.{generation}.npy")
+
+    def _load_positions(self, header: Dict) -> Dict[str, int]:
+        path = self._positions_path(header["positions"])
+        if not header["positions"] or not os.path.exists(path):
+            return {}
+        positions = np.load(path)
+        return dict(zip(positions["phone"].astype(str).tolist(), positions["count"].tolist()))
+
+    def _commit_calls(self, header: Dict, rows: List[tuple], positions: Dict[str, int]) -> Dict:
+        """Ajouter un lot d'appels avec les positions atteintes (fichier de positions d'une nouvelle génération)."""
+        generation = header["positions"] + 1
+        array = np.array(list(positions.items()), dtype=[("phone", f"S{PHONE_NUMBER_LENGTH}"), ("count", "<i8")])
+        with open(self._positions_path(generation), "wb") as f:
+            np.save(f, array)
+            f.flush()
+            os.fsync(f.fileno())
+        header = self.calls_file.append(dict(header, positions=generation),
+                                        np.array(rows, dtype=ColumnarFile.dtype(header)))
+        # L'en-tête désigne maintenant la nouvelle génération
+        old_path = self._positions_path(generation - 1)
+        if os.path.exists(old_path):
+            os.remove(old_path)
+        return header
+
+    def _export_calls(self) -> int:
+        if not self.calls_file.exists():
+            self.calls_file.create(CALL_FIELDS, ["operator"], positions=0)
+        header = self.calls_file.read_header()
+        positions = self._load_positions(header)
+        operators = header["dictionaries"]["operator"]
+        router = PrefixRouter(self.backend.load_operators())
+        rows, exported = [], 0
+
+        for phone in self.backend.iter_phones():
+            new_calls = self.backend.count_calls(phone) - positions.get(phone, 0)
+            if new_calls <= 0:
+                continue
+            operator = router.resolve(phone)
+            code = _code(operators, operator["name"] if operator else UNKNOWN)
+            # Historique du plus récent au plus ancien : les nouveaux appels sont en tête
+            for call in reversed(self.backend.get_call_history(phone, limit=new_calls)):
+                timestamp = call_timestamp(call)
+                if timestamp is None:
+                    self.undated += 1
+                    timestamp, day = -1, 0
+                else:
+                    day = _day(timestamp)
+                rows.append((timestamp, day, phone, call.get("number", ""), code,
+                             DIRECTIONS.index(call.get("direction", "outgoing")),
+                             call.get("duration", 0), call.get("cost", 0)))
+            positions[phone] = positions.get(phone, 0) + new_calls
+            if len(rows) >= EXPORT_CHUNK:
+                header = self._commit_calls(header, rows, positions)
+                exported += len(rows)
+                rows = []
+        if rows:
+            self._commit_calls(header, rows, positions)
+            exported += len(rows)
+        return exported
+
+    def _export_sales(self) -> int:
+        backend_name = type(self.backend).__name__
+        if not self.sales_file.exists():
+            self.sales_file.create(SALE_FIELDS, ["manager", "operator"], position=[backend_name, 0])
+        header = self.sales_file.read_header()
+        managers = header["dictionaries"]["manager"]
+        operators = header["dictionaries"]["operator"]
+        # Le journal des ventes est en ajout seul : reprise à la position atteinte par l'export précédent
+        stored = header.get("position")
+        if stored is not None and stored[0] == backend_name:
+            position, skip = stored[1], 0
+        else:
+            # Export antérieur aux positions, ou fait depuis un autre moteur : ventes exportées sautées une fois
+            position, skip = 0, header["count"]
+        rows, exported = [], 0
+        for sale, after in self.backend.iter_sales_after(position):
+            position = after
+            if skip:
+                skip -= 1
+                continue
+            rows.append((sale["timestamp"], _day(sale["timestamp"]), _code(managers, sale["manager"]),
+                         _code(operators, sale["operator"] or UNKNOWN), sale.get("phone", ""), sale["amount"]))
+            if len(rows) >= EXPORT_CHUNK:
+                header = self.sales_file.append(dict(header, position=[backend_name, position]),
+                                                np.array(rows, dtype=ColumnarFile.dtype(header)))
+                exported += len(rows)
+                rows = []
+        if rows or header.get("position") != [backend_name, position]:
+            self.sales_file.append(dict(header, position=[backend_name, position]),
+                                   np.array(rows, dtype=ColumnarFile.dtype(header)))
+            exported += len(rows)
+        return exported
+
+    # Requêtes
+
+    @staticmethod
+    def _aggregate(table: ColumnarFile, key: str, sums: List[str], start: Optional[date] = None,
+                   end: Optional[date] = None, direction: Optional[str] = None) -> Dict:
+        """Nombre de lignes et sommes des colonnes sums par valeur de la colonne key, bloc par bloc.
+
+        Seules les lignes du [start, end] (dates incluses) et, pour les appels, du sens demandé sont comptées.
+        """
+        totals: Dict = {}
+        if not table.exists():
+            return totals
+        records = table.records()
+        for offset in range(0, len(records), EXPORT_CHUNK):
+            block = records[offset:offset + EXPORT_CHUNK]
+            mask = np.ones(len(block), dtype=bool)
+            if start is not None:
+                mask &= block["day"] >= start.toordinal()
+            if end is not None:
+                mask &= block["day"] <= end.toordinal()
+            if direction is not None:
+                mask &= block["direction"] == DIRECTIONS.index(direction)
+            values, groups = np.unique(block[key][mask], return_inverse=True)
+            columns = {"count": np.bincount(groups, minlength=len(values))}
+            for name in sums:
+                columns[name] = np.bincount(groups, weights=block[name][mask], minlength=len(values))
+            for position, value in enumerate(values.tolist()):
+                total = totals.setdefault(value, dict.fromkeys(columns, 0))
+                for name, column in columns.items():
+                    total[name] += column[position].item()
+        return totals
+
+    @staticmethod
+    def _decode(table: ColumnarFile, dictionary: str, totals: Dict) -> Dict[str, Dict]:
+        names = table.read_header()["dictionaries"][dictionary] if totals else []
+        return {names[code]: value for code, value in totals.items()}
+
+    def calls_by_operator(self, start: Optional[date] = None, end: Optional[date] = None,
+                          direction: Optional[str] = None) -> Dict[str, Dict]:
+        """Nombre d'appels, durée et coût par opérateur de l'abonné."""
+        totals = self._aggregate(self.calls_file, "operator", ["duration", "cost"], start, end, direction)
+        return self._decode(self.calls_file, "operator", totals)
+
+    def calls_by_day(self, start: Optional[date] = None, end: Optional[date] = None,
+                     direction: Optional[str] = None) -> Dict[date, Dict]:
+        totals = self._aggregate(self.calls_file, "day", ["duration", "cost"], start, end, direction)
+        return {date.fromordinal(day): value for day, value in sorted(totals.items())}
+
+    def calls_by_direction(self, start: Optional[date] = None, end: Optional[date] = None) -> Dict[str, Dict]:
+        totals = self._aggregate(self.calls_file, "direction", ["duration", "cost"], start, end)
+        return {DIRECTIONS[code]: value for code, value in totals.items()}
+
+    def sales_by_operator(self, start: Optional[date] = None, end: Optional[date] = None) -> Dict[str, Dict]:
+        """Nombre de ventes et montant par opérateur."""
+        totals = self._aggregate(self.sales_file, "operator", ["amount"], start, end)
+        return self._decode(self.sales_file, "operator", totals)
+
+    def sales_by_manager(self, start: Optional[date] = None, end: Optional[date] = None) -> Dict[str, Dict]:
+        totals = self._aggregate(self.sales_file, "manager", ["amount"], start, end)
+        return self._decode(self.sales_file, "manager", totals)
+
+    def sales_by_day(self, start: Optional[date] = None, end: Optional[date] = None) -> Dict[date, Dict]:
+        totals = self._aggregate(self.sales_file, "day", ["amount"], start, end)
+        return {date.fromordinal(day): value for day, value in sorted(totals.items())}
@@ -0,0 +1,220 @@
+"""
+Interface commune des moteurs de stockage
+"""
+
+import os
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from consts import STORAGE_BACKEND, DATA_DIR
+
+
+class StorageBackend:
+    """Opérations de persistance utilisées par les modèles client et opérateur."""
+
+    # Clients
+    def get_client(self, phone: str) -> Optional[Dict]:
+        """Obtenir la fiche d'un client (sans son historique d'appels), ou None."""
+        raise NotImplementedError
+
+    def client_exists(self, phone: str) -> bool:
+        """Vérifier l'existence d'un client."""
+        return self.get_client(phone) is not None
+
+    def insert_client(self, client: Dict) -> bool:
+        """Ajouter un client (et son éventuel "call_history"). Retourne False si le numéro est déjà attribué."""
+        raise NotImplementedError
+
+    def iter_clients(self) -> Iterator[Dict]:
+        """Parcourir tous les clients."""
+        raise NotImplementedError
+
+    def iter_phones(self) -> Iterator[str]:
+        """Parcourir les numéros des clients, sans décoder leurs fiches si le moteur le permet."""
+        for client in self.iter_clients():
+            yield client["phone"]
+
+    def find_client_with_prefix(self, prefix: str) -> Optional[str]:
+        """Premier numéro de client commençant par prefix, ou None (le parcours s'arrête au premier trouvé)."""
+        return next((phone for phone in self.iter_phones() if phone.startswith(prefix)), None)
+
+    def bulk_load(self, clients: Iterable[Dict]) -> int:
+        """Charger en flux un grand nombre de clients (avec leur "call_history") dans un stockage
+        sans clients, sans passer par le journal (imports, jeux de données de test).
+        Retourne le nombre de clients chargés."""
+        count = 0
+        for client in clients:
+            count += self.insert_client(client)
+        return count
+
+    def update_credit(self, phone: str, amount: float) -> bool:
+        """Ajouter (ou retirer) un montant au crédit d'un client."""
+        raise NotImplementedError
+
+    def debit_credit(self, phone: str, amount: float) -> Optional[float]:
+        """Retirer un montant du crédit sans le rendre négatif, de façon atomique.
+        Retourne le montant réellement retiré, ou None si le client n'existe pas."""
+        raise NotImplementedError
+
+    def refund_reservation(self, phone: str, reservation: str, amount: float) -> bool:
+        """Rendre au client la part non consommée d'une réservation de crédit, une seule fois
+        par réservation (un nouvel appel après un arrêt brutal ne rembourse pas deux fois).
+        Retourne False si le client n'existe pas."""
+        raise NotImplementedError
+
+    def transfer_credit(self, source: str, transfers: List[Tuple[str, float]]) -> bool:
+        """Débiter la source du total et créditer chaque bénéficiaire (numéro, montant) en une seule écriture.
+        Retourne False, sans rien enregistrer, si le crédit de la source ne suffit pas ou si un client n'existe pas."""
+        raise NotImplementedError
+
+    def add_call(self, phone: str, call: Dict) -> bool:
+        """Ajouter un appel en tête de l'historique d'un client."""
+        raise NotImplementedError
+
+    def get_call_history(self, phone: str, limit: Optional[int] = None) -> List[Dict]:
+        """Historique des appels d'un client, du plus récent au plus ancien."""
+        raise NotImplementedError
+
+    def iter_call_records(self) -> Iterator[Tuple[str, Dict]]:
+        """Parcourir les appels de tous les clients : (numéro du client, appel)."""
+        for phone in self.iter_phones():
+            for call in self.get_call_history(phone):
+                yield phone, call
+
+    def count_calls(self, phone: str) -> int:
+        """Nombre d'appels dans l'historique d'un client."""
+        return len(self.get_call_history(phone))
+
+    def set_call_status(self, phone: str, call_index: int, status: str) -> bool:
+        """Modifier le statut d'un appel (indice 0 = appel le plus récent)."""
+        raise NotImplementedError
+
+    def forget_recordings(self, phone: str, audio_files: Iterable[str]) -> int:
+        """Marquer comme supprimés les enregistrements audio_files dans l'historique d'un client
+        (audio_file à None, recording à "deleted"). Retourne le nombre d'appels modifiés."""
+        raise NotImplementedError
+
+    def clients_signature(self):
+        """Valeur qui change quand les fiches clients sont modifiées par un autre processus."""
+        return None
+
+    def compact(self):
+        """Réorganiser le stockage (sans effet par défaut)."""
+
+    def apply_batch(self, clients: List[Dict], credits: List[Tuple[str, float]],
+                    operators: Optional[List[Dict]] = None, sales: Optional[List[Dict]] = None) -> bool:
+        """Enregistrer d'un coup un lot déjà validé : créations de clients, recharges,
+        opérateurs modifiés (remplacés s'ils n'ont pas changé de version depuis leur lecture)
+        et ventes de crédit (voir Models.Sales.new_sale) à ajouter au journal des ventes.
+        Retourne False, sans rien enregistrer, si un opérateur a été modifié entre-temps."""
+        raise NotImplementedError
+
+    # Opérateurs
+    def load_operators(self) -> List[Dict]:
+        """Obtenir la liste des opérateurs."""
+        raise NotImplementedError
+
+    def save_operators(self, operators: List[Dict]):
+        """Remplacer la liste des opérateurs."""
+        raise NotImplementedError
+
+    def insert_operator(self, operator: Dict) -> bool:
+        """Ajouter un opérateur. Retourne False si son nom ou l'un de ses index est déjà pris."""
+        raise NotImplementedError
+
+    def replace_operator(self, name: str, operator: Dict, expected_version: int) -> bool:
+        """Remplacer un opérateur s'il est toujours à la version lue (compare-and-swap).
+        Retourne False en cas de conflit avec une autre session ou d'index déjà pris."""
+        raise NotImplementedError
+
+    def delete_operator(self, name: str, expected_version: int) -> bool:
+        """Supprimer un opérateur s'il est toujours à la version lue."""
+        raise NotImplementedError
+
+    def operators_signature(self):
+        """Valeur qui change quand les opérateurs sont modifiés par un autre processus."""
+        return None
+
+    # Caisses
+    def load_cashier(self) -> Dict:
+        """Obtenir les anciens cumuls des caisses (antérieurs au journal des ventes), en lecture seule."""
+        raise NotImplementedError
+
+    def save_cashier(self, cashier_data: Dict):
+        """Remplacer les anciens cumuls des caisses."""
+        raise NotImplementedError
+
+    def record_sales(self, sales: List[Dict]):
+        """Ajouter des ventes au journal et aux cumuls par jour, mois et année, de façon atomique."""
+        raise NotImplementedError
+
+    def sales_totals(self, buckets: Iterable[str], manager_name: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+        """Additionner des cumuls ("2026", "2026-10", "2026-10-18") : gestionnaire -> opérateur -> montant."""
+        raise NotImplementedError
+
+    def iter_sales(self, start: Optional[float] = None, end: Optional[float] = None) -> Iterator[Dict]:
+        """Parcourir les ventes dont l'horodatage est dans [start, end[, dans l'ordre d'enregistrement."""
+        raise NotImplementedError
+
+    def iter_sales_after(self, position: int = 0) -> Iterator[Tuple[Dict, int]]:
+        """Parcourir les ventes enregistrées après une position (0 : depuis la première), chacune
+        avec la position qui la suit : un parcours repris à cette position ne relit rien."""
+        raise NotImplementedError
+
+    def close(self):
+        """Libérer les ressources du moteur."""
+
+
+def indexes_conflict(operators: List[Dict], indexes: List[str], exclude: Optional[str] = None) -> bool:
+    """Vérifie si l'un des index chevauche (égal ou préfixe) un index d'un autre opérateur."""
+    for operator in operators:
+        if operator["name"] == exclude:
+            continue
+        for existing in operator["indexes"]:
+            if any(existing.startswith(index) or index.startswith(existing) for index in indexes):
+                return True
+    return False
+
+
+_backends: Dict[tuple, StorageBackend] = {}
+_backends_lock = threading.Lock()
+
+
+def create_backend(kind: str, data_dir: str = DATA_DIR) -> StorageBackend:
+    """Instancier un moteur de stockage ("json" ou "sqlite")."""
+    if kind == "json":
+        from Models.JsonBackend import JsonBackend
+        return JsonBackend(data_dir)
+    if kind == "sqlite":
+        from Models.SqliteBackend import SqliteBackend
+        return SqliteBackend(os.path.join(data_dir, "gota.db"))
+    raise ValueError(f"Moteur de stockage inconnu : {kind}")
+
+
+_default_kind: Optional[str] = None
+
+
+def set_default_backend(kind: str):
+    """Choisir le moteur utilisé par get_backend() à la place de STORAGE_BACKEND (outils en ligne de commande)."""
+    global _default_kind
+    _default_kind = kind
+
+
+def chosen_backend() -> Optional[str]:
+    """Moteur choisi par set_default_backend(), None si STORAGE_BACKEND s'applique."""
+    return _default_kind
+
+
+def default_backend_kind() -> str:
+    """Moteur utilisé par get_backend() sans argument."""
+    return _default_kind or STORAGE_BACKEND
+
+
+def get_backend(kind: str = None) -> StorageBackend:
+    """Moteur de stockage partagé du processus, selon la configuration."""
+    kind = kind or default_backend_kind()
+    # Les chemins sont relatifs au répertoire courant : une instance par répertoire
+    key = (kind, os.path.abspath(DATA_DIR))
+    with _backends_lock:
+        if key not in _backends:
+            _backends[key] = create_backend(kind)
+        return _backends[key]
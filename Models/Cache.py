@@ -0,0 +1,88 @@
+"""
+Cache partagé des modèles (lecture à travers le cache, invalidation par signature)
+"""
+
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Hashable
+from consts import MODEL_CACHE_SIZE
+
+
+def freeze(value: Any) -> Any:
+    """Copie en lecture seule : dictionnaires -> MappingProxyType, listes -> tuples."""
+    if isinstance(value, (dict, MappingProxyType)):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value: Any) -> Any:
+    """Copie modifiable d'un instantané (inverse de freeze)."""
+    if isinstance(value, (dict, MappingProxyType)):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [thaw(item) for item in value]
+    return value
+
+
+class ModelCache:
+    """Instantanés en lecture seule, regroupés par espace ("operators", "clients", ...).
+
+    Une entrée est valide tant que la signature de son espace (date/taille des fichiers,
+    version de la base) et la génération locale, incrémentée à chaque écriture du
+    processus, n'ont pas changé.
+    """
+
+    def __init__(self, max_entries: int = MODEL_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._hits: Dict[str, int] = {}
+        self._misses: Dict[str, int] = {}
+
+    def get(self, namespace: str, key: Hashable, signature: Hashable, loader: Callable[[], Any]) -> Any:
+        """Instantané en lecture seule, chargé via loader() si absent ou périmé."""
+        with self._lock:
+            version = (self._generations.get(namespace, 0), signature)
+            entry = self._entries.get((namespace, key))
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end((namespace, key))
+                self._hits[namespace] = self._hits.get(namespace, 0) + 1
+                return entry[1]
+            self._misses[namespace] = self._misses.get(namespace, 0) + 1
+
+        value = freeze(loader())
+        with self._lock:
+            # Une écriture concurrente a pu invalider l'espace pendant le chargement
+            if version[0] == self._generations.get(namespace, 0):
+                self._entries[(namespace, key)] = (version, value)
+                self._entries.move_to_end((namespace, key))
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, namespace: str):
+        """À appeler après une écriture : toutes les entrées de l'espace sont périmées."""
+        with self._lock:
+            # Les entrées périmées sont remplacées à la prochaine lecture ou évincées
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Compteurs de succès et d'échecs par espace."""
+        with self._lock:
+            namespaces = set(self._hits) | set(self._misses)
+            return {
+                namespace: {
+                    "hits": self._hits.get(namespace, 0),
+                    "misses": self._misses.get(namespace, 0),
+                    "entries": sum(1 for key in self._entries if key[0] == namespace),
+                }
+                for namespace in sorted(namespaces)
+            }
+
+
+# Cache unique du processus, partagé par tous les modèles
+model_cache = ModelCache()
@@ -0,0 +1,162 @@
+"""
+Déroulement d'un appel : automate sonnerie → conversation → fin, piloté par événements
+"""
+
+import os
+from contextlib import ExitStack
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from consts import CALL_RING_TIMEOUT, DATA_DIR
+from Models.Backend import StorageBackend
+from Models.CreditMeter import CreditMeter
+from Models.Devices import CallDevices
+from Models.Recorder import CallRecorder
+from Views.Functions import print_message
+
+CALLS_DIR = os.path.join(DATA_DIR, "calls")
+
+# États de l'appel
+RINGING = "ringing"
+TALKING = "talking"
+ENDED = "ended"
+
+
+class CallSession:
+    """Appel sortant, de la sonnerie au règlement du crédit.
+
+    run() attend un seul événement à la fois des périphériques (touche, délai écoulé,
+    fin de la capture audio) et applique la transition prévue pour l'état courant
+    dans TRANSITIONS ; un événement sans transition est ignoré. Aucun thread n'attend
+    le clavier et rien n'est sondé : le raccroché est pris en compte dès la touche,
+    l'épuisement du crédit dès le bloc audio qui le consomme.
+
+    reason donne la fin de l'appel : "cancelled" (raccroché pendant la sonnerie),
+    "no_answer", "hung_up", "exhausted" ou "error".
+    """
+
+    TRANSITIONS: Dict[Tuple[str, str], str] = {
+        (RINGING, "key"): "_on_ringing_key",
+        (RINGING, "timeout"): "_on_ring_timeout",
+        (TALKING, "key"): "_on_talking_key",
+        (TALKING, "audio"): "_on_capture_stopped",
+    }
+
+    def __init__(self, devices: CallDevices, caller: str, target: str, rate: float, backend: StorageBackend,
+                 ring_timeout: float = CALL_RING_TIMEOUT):
+        self.devices = devices
+        self.caller = caller
+        self.target = target
+        self.rate = rate
+        self.backend = backend
+        self.ring_timeout = ring_timeout
+        self.state: Optional[str] = None
+        self.reason: Optional[str] = None
+        self.deadline: Optional[float] = None  # Heure (horloge des périphériques) de l'événement "timeout"
+        self.audio_filename: Optional[str] = None
+        self.call_time: Optional[datetime] = None
+        self.samplerate = 0
+        self.duration = 0.0
+        self.cost = 0
+        self.meter: Optional[CreditMeter] = None
+        self.recorder: Optional[CallRecorder] = None
+        self._stack = ExitStack()
+
+    @property
+    def answered(self) -> bool:
+        return self.meter is not None
+
+    def run(self) -> bool:
+        """Dérouler l'appel jusqu'à sa fin. Retourne True si l'appel a été décroché."""
+        self._ring()
+        try:
+            while self.state != ENDED:
+                timeout = None if self.deadline is None else max(0.0, self.deadline - self.devices.now())
+                kind, value = self.devices.next_event(timeout)
+                handler = self.TRANSITIONS.get((self.state, kind))
+                if handler is not None:
+                    getattr(self, handler)(value)
+        except Exception as e:
+            print(f"Erreur pendant l'appel : {e}")
+            self._end("error")
+        finally:
+            self._settle()
+        return self.answered
+
+    def _end(self, reason: str):
+        self.state = ENDED
+        self.reason = reason
+        self.deadline = None
+
+    # Sonnerie
+
+    def _ring(self):
+        # Démarrer la sonnerie sans attendre sa fin
+        self.devices.play_tone("ring-tone.mp3")
+        print("ça sonne ....")
+        print("Appuyez sur [d] pour parler ou [Entrée] pour raccrocher.")
+        self.state = RINGING
+        self.deadline = self.devices.now() + self.ring_timeout
+
+    def _on_ringing_key(self, key: str):
+        if key == "d":
+            self._answer()
+        else:
+            self._cancel("cancelled")
+
+    def _on_ring_timeout(self, _):
+        self._cancel("no_answer")
+
+    def _cancel(self, reason: str):
+        self.devices.stop_tone()
+        self.devices.play_tone_and_wait("end-call.mp3")
+        print_message("Appel annulé.", "INFO")
+        self._end(reason)
+
+    # Conversation
+
+    def _answer(self):
+        self.devices.stop_tone()
+        os.makedirs(CALLS_DIR, exist_ok=True)
+        now = self.devices.now()
+        self.call_time = datetime.fromtimestamp(now)
+        self.audio_filename = os.path.join(CALLS_DIR, f"call_{self.caller}_{self.target}_{int(now)}.wav")
+        self.samplerate = self.devices.samplerate
+
+        # Crédit réservé au décroché puis décompté en mémoire : le callback audio ne touche pas au disque
+        self.meter = CreditMeter(self.caller, self.rate, self.backend)
+        self.meter.start()
+        # Enregistrement écrit sur le disque pendant l'appel par un thread à part
+        self.recorder = CallRecorder(self.audio_filename, self.samplerate).start()
+        self._stack.enter_context(self.devices.open_input(self._on_block, self.samplerate))
+        self.state = TALKING
+        self.deadline = None  # Fin par la touche [r] ou par l'épuisement du crédit
+        print_message("Enregistrement en cours... Parlez maintenant.", "INFO")
+        print("Appuyer sur [r] pour raccrocher.")
+
+    def _on_block(self, block) -> bool:
+        """Callback audio : enregistrer le bloc et le décompter. False arrête la capture (crédit épuisé)."""
+        seconds = len(block) / self.samplerate
+        self.duration += seconds
+        self.recorder.write(block)
+        return self.meter.consume(seconds)
+
+    def _on_talking_key(self, key: str):
+        if key == "r":
+            self._end("hung_up")
+
+    def _on_capture_stopped(self, _):
+        self._end("exhausted" if self.meter.exhausted else "hung_up")
+
+    def _settle(self):
+        # Micro fermé avant le règlement : plus aucun bloc n'est décompté
+        self._stack.close()
+        if self.meter is None:
+            return
+        # Règlement unique : le crédit non consommé est rendu au client
+        self.cost = self.meter.settle()
+        if self.recorder is None:
+            return
+        try:
+            self.recorder.close()
+        except Exception as e:
+            print_message(f"Erreur lors de l'enregistrement de l'appel : {e}", "ERROR")
@@ -3,227 +3,171 @@ Modèle pour la gestion des clients
 """
 
 import os
-import json
-from typing import Dict, List, Optional
-import pygame
+from typing import Dict, Iterator, List, Optional, Tuple
 from Views.Functions import print_message
-import time
-from datetime import datetime
-import threading
 import locale
-import sounddevice as sd
-import wavio
-import numpy as np
+from Models.Backend import get_backend
+from Models.Cache import model_cache
+from Models.Call import CallSession
+from Models.Devices import get_devices
+from Models.Recordings import RecordingStore
 
 
 class ClientModel:
     def __init__(self):
-        self.clients_file = "BD/clients.txt"
         if not os.path.exists("BD"):
             os.makedirs("BD")
+        self.backend = get_backend()
 
-    def create_client(self, phone: str, pin: str) -> bool:
-        """Créer un client avec un numéro de téléphone et un code PIN."""
-        clients = self.get_all_clients()
-
-        # Vérifier si le client avec ce numéro existe déjà
-        if any(client["phone"] == phone for client in clients):
-            print_message(f"Le numéro {phone} est déjà attribué à un client.", "ERROR")
-            return False
-
-        client = {
+    @staticmethod
+    def new_client(phone: str, pin: str) -> Dict:
+        """Fiche d'un nouveau client, sans crédit ni contacts."""
+        return {
             "phone": phone,
             "pin": pin,
             "credit": 0,
             "contacts": [],
-            "call_history": [],
             "blocked_contacts": []
         }
 
-        clients.append(client)
-        self._save_clients(clients)
+    def create_client(self, phone: str, pin: str) -> bool:
+        """Créer un client avec un numéro de téléphone et un code PIN."""
+        client = self.new_client(phone, pin)
+
+        # Le moteur de stockage refuse un numéro déjà attribué (vérification par index)
+        if not self.backend.insert_client(client):
+            print_message(f"Le numéro {phone} est déjà attribué à un client.", "ERROR")
+            return False
+        model_cache.invalidate("clients")
         return True
 
     def get_client_by_phone(self, phone: str) -> Optional[Dict]:
-        """Obtenir les détails d'un client via son numéro de téléphone."""
-        clients = self.get_all_clients()
-        for client in clients:
-            if client["phone"] == phone:
-                return client
-        return None
+        """Obtenir les détails d'un client via son numéro de téléphone (instantané en lecture seule)."""
+        return model_cache.get("clients", (id(self.backend), phone), self.backend.clients_signature(),
+                               lambda: self.backend.get_client(phone))
+
+    def client_exists(self, phone: str) -> bool:
+        """Vérifier qu'un numéro est attribué à un client."""
+        return self.backend.client_exists(phone)
 
     def get_all_clients(self) -> List[Dict]:
-        """Obtenir tous les clients."""
-        if not os.path.exists(self.clients_file):
-            return []
-        try:
-            with open(self.clients_file, "r", encoding="utf-8") as f:
-                content = f.read().strip()
-                data = json.loads(content)
-                return data
-        except (json.JSONDecodeError, FileNotFoundError) as e:
-            print_message(f"Erreur lors de la lecture du fichier : {e}", "ERROR")
-            return []
-
-
-    def _save_clients(self, clients: List[Dict]):
-        """Sauvegarder la liste des clients dans un fichier."""
-        # Sauvegarde explicite pour s'assurer que les données sont bien enregistrées
-        try:
-            with open(self.clients_file, "w") as f:
-                json.dump(clients, f, indent=4)
-        except Exception as e:
-            print_message(f"Erreur lors de la sauvegarde des clients : {e}", "ERROR")
+        """Obtenir tous les clients (en mémoire : préférer iter_clients pour un parcours)."""
+        return list(self.backend.iter_clients())
+
+    def iter_clients(self) -> Iterator[Dict]:
+        """Parcourir les clients un par un, en mémoire constante ; le parcours peut s'arrêter à tout moment."""
+        return self.backend.iter_clients()
+
+    def find_client_with_prefix(self, prefix: str) -> Optional[str]:
+        """Premier numéro de client commençant par prefix, ou None."""
+        return self.backend.find_client_with_prefix(prefix)
 
     def update_credit(self, phone: str, amount: float) -> bool:
         """Mettre à jour le crédit du client."""
-        clients = self.get_all_clients()
-        for client in clients:
-            if client["phone"] == phone:
-                client["credit"] += amount
-                self._save_clients(clients)
-                return True
-        print_message("Client introuvable.", "ERROR")
-        return False
+        if not self.backend.update_credit(phone, amount):
+            print_message("Client introuvable.", "ERROR")
+            return False
+        model_cache.invalidate("clients")
+        return True
+
+
+    def debit_credit(self, phone: str, amount: float) -> float:
+        """Débiter le crédit du client sans le rendre négatif. Retourne le montant réellement débité."""
+        # Lecture et débit atomiques : un appel concurrent ou une recharge ne sont pas écrasés
+        debited = self.backend.debit_credit(phone, amount)
+        model_cache.invalidate("clients")
+        return debited or 0
+
+
+    def transfer_credit(self, source: str, transfers: List[Tuple[str, float]]) -> Tuple[bool, str]:
+        """Transférer du crédit de source vers un ou plusieurs bénéficiaires (numéro, montant).
+
+        Le débit et tous les crédits sont enregistrés ensemble, ou rien ne l'est.
+        """
+        merged: Dict[str, float] = {}
+        for phone, amount in transfers:
+            if phone == source:
+                return False, "Impossible de transférer du crédit vers son propre numéro."
+            if amount <= 0:
+                return False, f"Montant invalide pour le numéro {phone}."
+            merged[phone] = merged.get(phone, 0) + amount
+        if not merged:
+            return False, "Aucun bénéficiaire."
+        total = sum(merged.values())
+
+        if self.backend.transfer_credit(source, list(merged.items())):
+            model_cache.invalidate("clients")
+            return True, f"{total}F transférés à {len(merged)} bénéficiaire(s)."
+
+        # Refus du moteur de stockage : on en cherche la cause pour l'expliquer
+        client = self.backend.get_client(source)
+        if client is None:
+            return False, "Client introuvable."
+        missing = next((phone for phone in merged if not self.backend.client_exists(phone)), None)
+        if missing is not None:
+            return False, f"Le numéro {missing} n'est attribué à aucun client."
+        return False, f"Crédit insuffisant : {total}F demandés, {client['credit']}F disponibles."
 
 
     def add_call_to_history(self, phone: str, call_details: dict):
         """Ajouter un appel à l'historique d'un client."""
-        clients = self.get_all_clients()
-        for client in clients:
-            if client["phone"] == phone:
-                client["call_history"].insert(0, call_details)
-                self._save_clients(clients)
-                return True
-        return False
+        return self.backend.add_call(phone, call_details)
+
+
+    def get_call_history(self, phone: str, limit: Optional[int] = None) -> List[Dict]:
+        """Obtenir l'historique des appels d'un client, du plus récent au plus ancien."""
+        return self.backend.get_call_history(phone, limit)
 
 
     def update_call_status(self, phone: str, call_index: int, new_status: str) -> bool:
         """Mettre à jour le statut d'un appel dans l'historique du client."""
-        clients = self.get_all_clients()
-
-        for client in clients:
-            if client["phone"] == phone:
-                call_history = client.get("call_history", [])
+        if not self.backend.client_exists(phone):
+            print_message("Client introuvable.", "ERROR")
+            return False
 
-                if 0 <= call_index < len(call_history):
-                    # Mettre à jour le statut de l'appel
-                    call_history[call_index]["status"] = new_status
-                    # Sauvegarder les modifications dans le fichier
-                    self._save_clients(clients)
-                    return True
-                else:
-                    print_message("Erreur : Indice d'appel invalide.", "ERROR")
-                    return False
+        if not 0 <= call_index < self.backend.count_calls(phone):
+            print_message("Erreur : Indice d'appel invalide.", "ERROR")
+            return False
 
-        print_message("Client introuvable.", "ERROR")
-        return False
+        # Mettre à jour le statut de l'appel
+        return self.backend.set_call_status(phone, call_index, new_status)
 
 
     def make_call(self, caller, target_name: str, target_number, rate: int):
         """Effectuer un appel, jouer la sonnerie et gérer la fin de l'appel par crédit ou entrée utilisateur."""
         print(f"Appel en cours vers {target_name}...")
 
-        # Fonction pour jouer un son
-        def play_sound(sound_file):
-            """Jouer un fichier sonore."""
-            pygame.mixer.init()
-            sound_path = os.path.join("BD", "sounds", sound_file)
-            if os.path.exists(sound_path):
-                pygame.mixer.music.load(sound_path)
-                pygame.mixer.music.play()
-                while pygame.mixer.music.get_busy():
-                    time.sleep(1)
-            pygame.mixer.quit()
-
-        # Fonction d'attente d'entrée utilisateur avec timeout
-        def get_user_input(timeout):
-            """Obtenir l'entrée utilisateur avec un timeout."""
-            action = [None]
-
-            def wait_for_input():
-                action[0] = input().lower()
-
-            input_thread = threading.Thread(target=wait_for_input)
-            input_thread.start()
-            input_thread.join(timeout)
-            if input_thread.is_alive():
-                return None
-            return action[0]
-
-        # Démarrer la sonnerie dans un thread
-        ringtone_thread = threading.Thread(target=play_sound, args=("ring-tone.mp3",))
-        ringtone_thread.start()
-
-        # Attendre l'action de l'utilisateur ou la fin de la sonnerie (timeout de 20 secondes)
-        print("ça sonne ....")
-        print("Appuyez sur [d] pour parler ou [Entrée] pour raccrocher.")
-        action = get_user_input(20)
-
-        # Arrêter la sonnerie si l'utilisateur répond ou si la sonnerie est terminée
-        pygame.mixer.music.stop()
-        ringtone_thread.join()
-
-        if action != 'd':
-            play_sound("end-call.mp3")
-            print_message("Appel annulé.", "INFO")
+        # Automate de l'appel sur les périphériques du poste (simulés pour les tests de charge)
+        session = CallSession(get_devices(), caller['phone'], target_number, rate, self.backend)
+        if not session.run():
             return False
+        audio_filename = session.audio_filename
+        recording_duration = session.duration
+        cost = session.cost
+        call_time = session.call_time
 
-        audio_dir = os.path.join("BD", "calls")
-        if not os.path.exists(audio_dir):
-            os.makedirs(audio_dir)
-
-        audio_filename = os.path.join(audio_dir, f"call_{caller['phone']}_{target_number}_{int(time.time())}.wav")
-
-        initial_credit = caller['credit']
-        max_duration = initial_credit // rate  # Durée maximale en secondes que le client peut appeler
-        recording_duration = 0
-        cost = 0
-        call_ended = False
-        call_interrupted = False
-        samplerate = sd.default.samplerate or 44100
-        recorded_data = []
-
-        locale.setlocale(locale.LC_TIME, 'fr_FR.UTF-8')
-        call_time = datetime.now()
+        try:
+            locale.setlocale(locale.LC_TIME, 'fr_FR.UTF-8')
+        except locale.Error:
+            pass  # Locale absente (serveur) : mois en anglais
         formatted_date = call_time.strftime("%d %B %Y %H:%M:%S")
 
-        # Fonction de callback pour enregistrer l'audio et gérer la durée de l'appel
-        def callback(indata, frames, time, status):
-            nonlocal recording_duration, call_ended, call_interrupted, cost
-            duration_in_seconds = frames / samplerate
-            recording_duration += duration_in_seconds
-            recorded_data.append(indata.copy())
-
-            if recording_duration >= max_duration:
-                call_ended = True
-                cost = caller['credit']
-                print_message(f"Crédit épuisé. Durée : {int(recording_duration)} seconde(s). Coût : {cost}F.", "INFO")
-                self.update_credit(caller['phone'], -cost)
-                raise sd.CallbackStop  # Arrêter l'appel si la durée maximale atteinte (crédit épuisé)
-
-        # Enregistrer l'appel
-        try:
-            with sd.InputStream(callback=callback, samplerate=samplerate):
-                print_message("Enregistrement en cours... Parlez maintenant.", "INFO")
-                print("Appuyer sur [r] pour raccrocher.")
-                while not call_ended and not call_interrupted:
-                    action = get_user_input(max_duration)
-                    if action == 'r':
-                        cost = rate * int(recording_duration)
-                        print_message(f"Appel raccroché. Durée : {int(recording_duration)} seconde(s). Coût : {cost}F.", "INFO")
-                        self.update_credit(caller['phone'], -cost)
-                        call_interrupted = True
-                        break
-                    time.sleep(1)  # Attente passive pour permettre à l'appel de se dérouler
-        except Exception as e:
-            print(f"Erreur pendant l'appel : {e}")
-
-        # Enregistrer l'audio dans un fichier
-        print_message("Sauvegarde du fichier audio en cours...", "INFO")
-        recorded_array = np.concatenate(recorded_data, axis=0)
-        wavio.write(audio_filename, recorded_array, samplerate, sampwidth=2)
-        print_message(f"Fichier audio sauvegardé sous {audio_filename}", "INFO")
+        if session.reason == "exhausted":
+            print_message(f"Crédit épuisé. Durée : {int(recording_duration)} seconde(s). Coût : {cost}F.", "INFO")
+        else:
+            print_message(f"Appel raccroché. Durée : {int(recording_duration)} seconde(s). Coût : {cost}F.", "INFO")
+
+        if session.recorder is not None and os.path.exists(audio_filename):
+            # Index des enregistrements : quota disque, archivage et suppression des plus anciens
+            RecordingStore(backend=self.backend).register(audio_filename, caller['phone'], target_number,
+                                                          created=call_time.timestamp())
+            if session.recorder.dropped_frames:
+                print_message(f"{session.recorder.dropped_frames / session.samplerate:.1f} seconde(s) d'audio perdue(s) : disque trop lent.", "ERROR")
+            print_message(f"Fichier audio sauvegardé sous {audio_filename}", "INFO")
+        else:
+            # Enregistreur non démarré ou fichier non écrit : l'appel est tout de même facturé et historisé
+            print_message("L'appel n'a pas pu être enregistré.", "ERROR")
+            audio_filename = ""
 
         # Préparer les détails de l'appel pour l'appelant
         call_details_for_caller = {
@@ -234,6 +178,7 @@ class ClientModel:
             "duration": int(recording_duration),
             "cost": cost,
             "date": formatted_date,
+            "timestamp": int(call_time.timestamp()),
             "audio_file": audio_filename
         }
 
@@ -251,6 +196,7 @@ class ClientModel:
             "duration": int(recording_duration),
             "cost": cost,
             "date": formatted_date,
+            "timestamp": int(call_time.timestamp()),
             "audio_file": audio_filename
         }
 
@@ -0,0 +1,287 @@
+"""
+Format des enregistrements d'appels : rééchantillonnage et compression G.711 (A-law / μ-law)
+"""
+
+import io
+import mmap
+import struct
+import wave
+from typing import BinaryIO, Dict, Optional, Union
+import numpy as np
+from consts import RECORDING_CODEC, RECORDING_SAMPLERATE, RECORDING_TRIM_SILENCE
+from Models.Vad import SilenceTrimmer
+
+# Codes de format WAV (champ wFormatTag du bloc "fmt ")
+FORMAT_TAGS = {"pcm": 1, "alaw": 6, "mulaw": 7}
+CODECS = {tag: codec for codec, tag in FORMAT_TAGS.items()}
+
+# Bornes des segments G.711 (valeurs sur 13 bits pour A-law, 14 bits pour μ-law)
+_ALAW_SEGMENTS = np.array([0x1F, 0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF])
+_ULAW_SEGMENTS = np.array([0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF])
+_ULAW_BIAS = 0x84
+_ULAW_CLIP = 8159
+
+
+def alaw_encode(samples: np.ndarray) -> np.ndarray:
+    """Échantillons 16 bits signés -> octets A-law (G.711)."""
+    pcm = samples.astype(np.int32) >> 3
+    negative = pcm < 0
+    mask = np.where(negative, 0x55, 0xD5)
+    pcm = np.where(negative, -pcm - 1, pcm)
+    segment = np.searchsorted(_ALAW_SEGMENTS, pcm)
+    shift = np.where(segment < 2, 1, segment)
+    value = (np.minimum(segment, 7) << 4) | ((pcm >> shift) & 0x0F)
+    # Au-delà du dernier segment : valeur saturée
+    value = np.where(segment >= 8, 0x7F, value)
+    return (value ^ mask).astype(np.uint8)
+
+
+def ulaw_encode(samples: np.ndarray) -> np.ndarray:
+    """Échantillons 16 bits signés -> octets μ-law (G.711)."""
+    pcm = samples.astype(np.int32) >> 2
+    negative = pcm < 0
+    mask = np.where(negative, 0x7F, 0xFF)
+    pcm = np.minimum(np.abs(pcm), _ULAW_CLIP) + (_ULAW_BIAS >> 2)
+    segment = np.searchsorted(_ULAW_SEGMENTS, pcm)
+    value = (np.minimum(segment, 7) << 4) | ((pcm >> (segment + 1)) & 0x0F)
+    value = np.where(segment >= 8, 0x7F, value)
+    return (value ^ mask).astype(np.uint8)
+
+
+def _alaw_table() -> np.ndarray:
+    code = np.arange(256) ^ 0x55
+    segment = (code & 0x70) >> 4
+    value = ((code & 0x0F) << 4) + np.where(segment == 0, 8, 0x108)
+    value = np.where(segment > 1, value << np.maximum(segment - 1, 0), value)
+    return np.where(code & 0x80, value, -value).astype(np.int16)
+
+
+def _ulaw_table() -> np.ndarray:
+    code = ~np.arange(256) & 0xFF
+    value = (((code & 0x0F) << 3) + _ULAW_BIAS) << ((code & 0x70) >> 4)
+    return np.where(code & 0x80, _ULAW_BIAS - value, value - _ULAW_BIAS).astype(np.int16)
+
+
+# Décodage par table : 256 valeurs possibles par octet
+_DECODE_TABLES = {"alaw": _alaw_table(), "mulaw": _ulaw_table()}
+_ENCODERS = {"alaw": alaw_encode, "mulaw": ulaw_encode}
+
+
+def decode(data: bytes, codec: str) -> np.ndarray:
+    """Octets G.711 -> échantillons 16 bits signés."""
+    return _DECODE_TABLES[codec][np.frombuffer(data, dtype=np.uint8)]
+
+
+def to_pcm16(block: np.ndarray) -> np.ndarray:
+    """Bloc audio (flottants dans [-1, 1] ou entiers 16 bits) -> entiers 16 bits, même échelle que wavio."""
+    if block.dtype.kind == "f":
+        return np.rint(np.clip(block, -1.0, 1.0) * 32767).astype(np.int16)
+    return block.astype(np.int16)
+
+
+class Resampler:
+    """Changement de fréquence d'échantillonnage d'un flux mono, bloc par bloc.
+
+    Un filtre passe-bas (sinus cardinal fenêtré) supprime d'abord les fréquences
+    que la fréquence cible ne peut pas représenter, puis chaque échantillon de
+    sortie est interpolé linéairement. Les derniers échantillons de chaque bloc
+    sont gardés pour que le découpage en blocs ne s'entende pas.
+    """
+
+    def __init__(self, rate_in: int, rate_out: int, taps: int = 63):
+        self.step = rate_in / rate_out
+        if rate_out < rate_in:
+            cutoff = 0.45 * rate_out / rate_in  # En fraction de la fréquence d'entrée
+            n = np.arange(taps) - (taps - 1) / 2
+            kernel = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(taps)
+            self.kernel = kernel / kernel.sum()
+        else:
+            self.kernel = np.ones(1)
+        self._history = np.zeros(len(self.kernel) - 1)
+        self._tail: Optional[float] = None
+        self._base = 0  # Position (dans le flux filtré) du premier échantillon disponible
+        self._next = 0.0  # Position du prochain échantillon de sortie
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        if self.step == 1:
+            return samples
+        signal = np.concatenate((self._history, samples))
+        filtered = np.convolve(signal, self.kernel, mode="valid")
+        if len(self._history):
+            self._history = signal[-len(self._history):]
+        if self._tail is not None:
+            filtered = np.concatenate(([self._tail], filtered))
+        if not len(filtered):
+            return filtered
+        last = self._base + len(filtered) - 1
+        # Seules les positions strictement avant le dernier échantillon ont leurs deux voisins
+        count = int(np.ceil((last - self._next) / self.step)) if self._next < last else 0
+        positions = self._next + self.step * np.arange(count) - self._base
+        index = positions.astype(np.int64)
+        fraction = positions - index
+        output = filtered[index] * (1 - fraction) + filtered[index + 1] * fraction
+        self._next += count * self.step
+        self._tail = filtered[-1]
+        self._base = last
+        return output
+
+
+class RecordingWriter:
+    """Fichier WAV mono écrit au fil de l'eau : PCM 16 bits ou G.711 8 bits (A-law, μ-law).
+
+    Les blocs reçus (une colonne par canal, à la fréquence du périphérique) sont
+    mixés en mono, rééchantillonnés à samplerate, débarrassés des silences
+    (Models.Vad.SilenceTrimmer, si trim) puis encodés. Le silence de fin est retiré
+    et les tailles de l'en-tête sont écrites à la fermeture ; metadata() donne
+    ensuite la durée gardée, le temps de parole et le niveau de la parole.
+    """
+
+    def __init__(self, path: str, input_rate: int, samplerate: Optional[int] = RECORDING_SAMPLERATE,
+                 codec: str = RECORDING_CODEC, trim: bool = RECORDING_TRIM_SILENCE):
+        if codec not in FORMAT_TAGS:
+            raise ValueError(f"Format d'enregistrement inconnu : {codec}")
+        self.codec = codec
+        # samplerate à None : fréquence du périphérique conservée
+        self.samplerate = int(samplerate or input_rate)
+        self.sampwidth = 2 if codec == "pcm" else 1
+        self.frames = 0
+        self._resampler = Resampler(int(input_rate), self.samplerate)
+        self._trimmer = SilenceTrimmer(self.samplerate, trim)
+        self._file = open(path, "wb")
+        self._write_header()
+        self._data_start = self._file.tell()
+
+    def _write_header(self):
+        data_size = self.frames * self.sampwidth
+        fmt = struct.pack("<HHIIHH", FORMAT_TAGS[self.codec], 1, self.samplerate,
+                          self.samplerate * self.sampwidth, self.sampwidth, 8 * self.sampwidth)
+        if self.codec == "pcm":
+            chunks = b"fmt " + struct.pack("<I", len(fmt)) + fmt
+        else:
+            # Formats compressés : bloc "fmt " étendu (cbSize) et bloc "fact" obligatoires
+            fmt += struct.pack("<H", 0)
+            chunks = (b"fmt " + struct.pack("<I", len(fmt)) + fmt
+                      + b"fact" + struct.pack("<II", 4, self.frames))
+        chunks += b"data" + struct.pack("<I", data_size)
+        self._file.seek(0)
+        self._file.write(b"RIFF" + struct.pack("<I", 4 + len(chunks) + data_size + (data_size & 1)) + b"WAVE" + chunks)
+
+    def write(self, block: np.ndarray):
+        samples = block.astype(np.float64)
+        if block.dtype.kind != "f":
+            samples /= 32767
+        if samples.ndim == 2:
+            samples = samples.mean(axis=1)
+        samples = self._trimmer.process(to_pcm16(self._resampler.process(samples)))
+        data = samples.astype("<i2").tobytes() if self.codec == "pcm" else _ENCODERS[self.codec](samples).tobytes()
+        self._file.write(data)
+        self.frames += len(samples)
+
+    def metadata(self) -> Dict:
+        return dict(self._trimmer.metadata(), codec=self.codec, samplerate=self.samplerate)
+
+    def close(self):
+        if self._file.closed:
+            return
+        keep = self._trimmer.keep_frames
+        if keep < self.frames:
+            # Silence de fin déjà écrit : retiré
+            self.frames = keep
+            self._file.truncate(self._data_start + keep * self.sampwidth)
+            self._file.seek(0, io.SEEK_END)
+        if self.frames * self.sampwidth & 1:
+            self._file.write(b"\0")  # Les blocs RIFF sont alignés sur deux octets
+        self._write_header()
+        self._file.close()
+
+
+class RecordingReader:
+    """Lecture d'un enregistrement (ancien PCM 16 bits ou G.711), restitué en PCM 16 bits.
+
+    Les fichiers illisibles lèvent wave.Error, comme le module wave.
+    """
+
+    def __init__(self, source: Union[str, BinaryIO]):
+        # Chemin, ou fichier déjà ouvert (membre d'une archive) fermé avec le lecteur
+        self._file = open(source, "rb") if isinstance(source, str) else source
+        self._map: Optional[mmap.mmap] = None
+        try:
+            self._parse()
+        except Exception:
+            self._file.close()
+            raise
+
+    def _parse(self):
+        riff = self._file.read(12)
+        if len(riff) < 12 or riff[:4] != b"RIFF" or riff[8:] != b"WAVE":
+            raise wave.Error("le fichier n'est pas un fichier WAV")
+        fmt = None
+        while True:
+            header = self._file.read(8)
+            if len(header) < 8:
+                raise wave.Error("bloc de données introuvable")
+            name, size = header[:4], struct.unpack("<I", header[4:])[0]
+            if name == b"fmt ":
+                fmt = self._file.read(size + (size & 1))
+            elif name == b"data":
+                break
+            else:
+                self._file.seek(size + (size & 1), 1)
+        if fmt is None or len(fmt) < 16:
+            raise wave.Error("bloc de format manquant")
+        tag, self.channels, self.samplerate, _, _, bits = struct.unpack("<HHIIHH", fmt[:16])
+        self.codec = CODECS.get(tag)
+        if self.codec is None or bits != (16 if self.codec == "pcm" else 8):
+            raise wave.Error(f"format audio non pris en charge ({tag}, {bits} bits)")
+        self.sampwidth = bits // 8
+        self.frames = size // (self.sampwidth * self.channels)
+        self._remaining = self.frames
+        self._data_offset = self._file.tell()
+
+    def read(self, frames: int) -> bytes:
+        """Jusqu'à frames trames suivantes, en PCM 16 bits signé (b"" à la fin du fichier)."""
+        frames = min(frames, self._remaining)
+        data = self._file.read(frames * self.sampwidth * self.channels)
+        self._remaining -= len(data) // (self.sampwidth * self.channels)
+        if self.codec == "pcm":
+            return data
+        return decode(data, self.codec).astype("<i2").tobytes()
+
+    def samples(self) -> np.ndarray:
+        """Toutes les données de l'enregistrement : entiers 16 bits, ou octets G.711 à passer à decode().
+
+        Un fichier sur disque est projeté en mémoire : les pages ne sont lues qu'au
+        fur et à mesure qu'elles sont utilisées. Un membre d'archive est lu en entier.
+        """
+        dtype = np.dtype("<i2") if self.codec == "pcm" else np.dtype(np.uint8)
+        count = self.frames * self.channels
+        try:
+            fileno = self._file.fileno()
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            fileno = None
+        if fileno is not None:
+            if self._map is None:
+                self._map = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+            buffer, offset = self._map, self._data_offset
+        else:
+            self._file.seek(self._data_offset)
+            buffer, offset = self._file.read(count * dtype.itemsize), 0
+        # Fichier tronqué (arrêt brutal pendant l'enregistrement) : trames complètes seulement
+        available = (len(buffer) - offset) // dtype.itemsize
+        count = min(count, available - available % self.channels)
+        return np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+
+    def close(self):
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                pass  # Tableau encore utilisé : la projection est libérée avec lui
+            self._map = None
+        self._file.close()
+
+    def __enter__(self) -> "RecordingReader":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,162 @@
+"""
+Décompte en mémoire du crédit de l'appelant pendant un appel
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+from consts import DATA_DIR, CREDIT_CHECKPOINT_INTERVAL
+from Models.Backend import StorageBackend, get_backend
+from Models.Cache import model_cache
+from Models.Locks import try_lock_file, unlock_file
+
+
+RESERVATIONS_DIR = os.path.join(DATA_DIR, "reservations")
+
+
+class CreditMeter:
+    """Crédit réservé au décroché, décompté en mémoire bloc par bloc, réglé une fois au raccroché.
+
+    consume() ne fait que des calculs : il peut être appelé depuis le callback audio
+    sans jamais attendre le disque. Un thread à part enregistre régulièrement la
+    consommation ; après un arrêt brutal, recover_reservations() rend au client
+    la part réservée qu'il n'a pas consommée.
+
+    Le point de contrôle <numéro>-<réservation>.json reste verrouillé (fichier .lock)
+    tant que l'appel dure : un point de contrôle non verrouillé est celui d'un appel interrompu.
+    """
+
+    def __init__(self, phone: str, rate: float, backend: StorageBackend = None,
+                 checkpoint_interval: float = CREDIT_CHECKPOINT_INTERVAL):
+        self.phone = phone
+        self.rate = rate
+        self.backend = backend or get_backend()
+        self.checkpoint_interval = checkpoint_interval
+        self.reserved = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.exhausted = False
+        self.reservation = uuid.uuid4().hex
+        self.path = os.path.join(RESERVATIONS_DIR, f"{phone}-{self.reservation}.json")
+        self.lock_path = os.path.join(RESERVATIONS_DIR, f"{phone}-{self.reservation}.lock")
+        self._lock_fd: Optional[int] = None
+        self._stop = threading.Event()
+        self._checkpoints: Optional[threading.Thread] = None
+
+    def start(self) -> float:
+        """Réserver tout le crédit disponible de l'appelant. Retourne le montant réservé."""
+        os.makedirs(RESERVATIONS_DIR, exist_ok=True)
+        self._lock_fd = try_lock_file(self.lock_path)
+        self.reserved = self.backend.debit_credit(self.phone, float("inf")) or 0
+        model_cache.invalidate("clients")
+        self.max_seconds = self.reserved / self.rate if self.rate > 0 else float("inf")
+        self._write_checkpoint()
+        self._checkpoints = threading.Thread(target=self._checkpoint_loop, daemon=True)
+        self._checkpoints.start()
+        return self.reserved
+
+    def consume(self, seconds: float) -> bool:
+        """Décompter une durée d'appel. Retourne False quand le crédit réservé est épuisé."""
+        self.seconds += seconds
+        if self.seconds >= self.max_seconds:
+            self.exhausted = True
+        return not self.exhausted
+
+    @property
+    def cost(self) -> float:
+        """Coût de l'appel jusqu'ici : tarif par seconde entière, tout le crédit réservé s'il est épuisé."""
+        if self.exhausted:
+            return self.reserved
+        return min(self.rate * int(self.seconds), self.reserved)
+
+    def settle(self) -> float:
+        """Terminer l'appel : rendre au client le crédit non consommé. Retourne le coût de l'appel."""
+        self._stop.set()
+        if self._checkpoints is not None:
+            self._checkpoints.join()
+        cost = self.cost
+        # 1. Point de contrôle marqué réglé avec le coût exact : après un arrêt brutal,
+        #    recover_reservations() rend exactement ce qui reste dû
+        self._write_checkpoint(settled=True)
+        # 2. Remboursement unique par réservation : refait par recover_reservations()
+        #    s'il n'a pas eu lieu, sans effet s'il a déjà été enregistré
+        if self.reserved - cost:
+            self.backend.refund_reservation(self.phone, self.reservation, self.reserved - cost)
+            model_cache.invalidate("clients")
+        # 3. Plus rien à régler
+        os.remove(self.path)
+        _release(self._lock_fd, self.lock_path)
+        return cost
+
+    def _checkpoint_loop(self):
+        while not self._stop.wait(self.checkpoint_interval):
+            self._write_checkpoint()
+
+    def _write_checkpoint(self, settled: bool = False):
+        checkpoint = {"phone": self.phone, "reservation": self.reservation, "rate": self.rate,
+                      "reserved": self.reserved, "consumed": self.cost, "settled": settled, "updated": time.time()}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(checkpoint, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+def _release(fd: Optional[int], lock_path: str):
+    if fd is not None:
+        unlock_file(fd)
+    try:
+        os.remove(lock_path)
+    except OSError:
+        pass  # Déjà supprimé par une autre session, ou encore ouvert par elle (Windows)
+
+
+def _settle_checkpoint(checkpoint: Dict, backend: StorageBackend):
+    # Consommation perdue depuis le dernier point de contrôle : au bénéfice du client
+    refund = checkpoint["reserved"] - checkpoint["consumed"]
+    if refund <= 0:
+        return
+    if "reservation" in checkpoint:
+        backend.refund_reservation(checkpoint["phone"], checkpoint["reservation"], refund)
+    else:
+        # Point de contrôle d'une version antérieure, sans numéro de réservation
+        backend.update_credit(checkpoint["phone"], refund)
+
+
+def recover_reservations(backend: StorageBackend = None) -> int:
+    """Régler les appels interrompus par un arrêt brutal. Retourne le nombre d'appels réglés.
+
+    Le verrou du point de contrôle désigne la session qui le règle : si elle s'arrête à son
+    tour, le verrou est relâché et l'appel est réglé par la suivante. Les points de contrôle
+    renommés <nom>.json.<pid> par une version antérieure sont repris de la même façon.
+    """
+    if not os.path.isdir(RESERVATIONS_DIR):
+        return 0
+    backend = backend or get_backend()
+    recovered = 0
+    for file_name in sorted(os.listdir(RESERVATIONS_DIR)):
+        name, extension, claim = file_name.partition(".json")
+        if not extension or (claim and not (claim[:1] == "." and claim[1:].isdigit())):
+            continue
+        lock_path = os.path.join(RESERVATIONS_DIR, f"{name}.lock")
+        fd = try_lock_file(lock_path)
+        if fd is None:
+            continue  # Appel en cours, ou réglé en ce moment par une autre session
+        path = os.path.join(RESERVATIONS_DIR, file_name)
+        try:
+            with open(path, "r") as f:
+                checkpoint = json.load(f)
+        except FileNotFoundError:
+            _release(fd, lock_path)  # Réglé entre-temps par une autre session
+            continue
+        _settle_checkpoint(checkpoint, backend)
+        os.remove(path)
+        _release(fd, lock_path)
+        recovered += 1
+    if recovered:
+        model_cache.invalidate("clients")
+    return recovered
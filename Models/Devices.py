@@ -0,0 +1,399 @@
+"""
+Périphériques d'un appel : clavier, micro, sonneries et horloge, réels ou simulés
+"""
+
+import os
+import queue
+import random
+import selectors
+import sys
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Iterator, List, Optional, Tuple
+import numpy as np
+from consts import RECORDING_SAMPLERATE
+
+try:
+    import msvcrt
+except ImportError:  # Hors Windows : sélecteur sur l'entrée standard
+    msvcrt = None
+
+# Callback du micro : reçoit un bloc (trames × canaux), retourne False pour arrêter la capture
+BlockCallback = Callable[[np.ndarray], bool]
+
+# Événement attendu par un appel : ("key", ligne en minuscules), ("timeout", None)
+# ou ("audio", None) quand on_block a arrêté la capture
+Event = Tuple[str, Optional[str]]
+
+
+class CallDevices:
+    """Tout ce que le déroulement d'un appel demande au poste de l'abonné.
+
+    request_call et make_call ne parlent qu'à cette interface : LocalDevices utilise
+    le terminal, sounddevice et pygame ; SyntheticDevices rejoue un scénario sur une
+    horloge virtuelle, sans périphérique audio ni saisie.
+    """
+
+    samplerate: int
+
+    def now(self) -> float:
+        """Heure courante (timestamp)."""
+        raise NotImplementedError
+
+    def sleep(self, seconds: float):
+        raise NotImplementedError
+
+    def read_line(self, prompt: str = "") -> str:
+        """Ligne saisie par l'abonné."""
+        raise NotImplementedError
+
+    def next_event(self, timeout: Optional[float]) -> Event:
+        """Premier événement des timeout secondes (None : sans limite) : touche, fin du micro ou délai écoulé."""
+        raise NotImplementedError
+
+    def open_input(self, on_block: BlockCallback, samplerate: int):
+        """Contexte pendant lequel le micro appelle on_block pour chaque bloc capté.
+
+        Quand on_block retourne False, la capture s'arrête et next_event retourne ("audio", None).
+        """
+        raise NotImplementedError
+
+    def play_tone(self, sound_file: str):
+        """Démarrer une sonnerie sans attendre sa fin."""
+        raise NotImplementedError
+
+    def play_tone_and_wait(self, sound_file: str):
+        raise NotImplementedError
+
+    def stop_tone(self):
+        raise NotImplementedError
+
+
+class _StdinLines:
+    """Lignes de l'entrée standard, lues par os.read dans un tampon propre au processus.
+
+    Un tube ou un fichier livre souvent plusieurs lignes d'un coup : avec sys.stdin.readline(),
+    les suivantes restaient dans le tampon de TextIOWrapper, invisibles pour select. Hors
+    terminal, cet objet remplace sys.stdin : next_event, read_line et les input() des menus
+    se servent du même tampon. Un terminal ne livre qu'une ligne par lecture : input() y
+    garde l'édition de ligne.
+    """
+
+    def __init__(self, stream):
+        self._fd = stream.fileno()
+        self.encoding = getattr(stream, "encoding", None) or "utf-8"
+        self._buffer = bytearray()
+        self.eof = False
+
+    def fileno(self) -> int:
+        return self._fd
+
+    def isatty(self) -> bool:
+        return os.isatty(self._fd)
+
+    def fill(self) -> bool:
+        """Une lecture de l'entrée standard dans le tampon ; False à la fin de l'entrée."""
+        data = os.read(self._fd, 4096)
+        if not data:
+            self.eof = True
+        self._buffer += data
+        return bool(data)
+
+    def pending(self) -> Optional[str]:
+        """Ligne complète du tampon (retour à la ligne compris), la dernière ligne incomplète
+        une fois l'entrée terminée, None sinon."""
+        end = self._buffer.find(b"\n") + 1
+        if not end:
+            if not self.eof or not self._buffer:
+                return None
+            end = len(self._buffer)
+        line = bytes(self._buffer[:end])
+        del self._buffer[:end]
+        return line.decode(self.encoding, errors="replace")
+
+    def readline(self) -> str:
+        """Comme sys.stdin.readline() : "" à la fin de l'entrée (input() lève alors EOFError)."""
+        while True:
+            line = self.pending()
+            if line is not None:
+                return line
+            if self.eof:
+                return ""
+            self.fill()
+
+
+_stdin: Optional[_StdinLines] = None
+
+
+def stdin_lines() -> _StdinLines:
+    """Tampon de l'entrée standard partagé par le processus, installé comme sys.stdin hors terminal.
+
+    À appeler avant le premier input() : des lignes déjà lues par le sys.stdin d'origine
+    resteraient dans son tampon.
+    """
+    global _stdin
+    if _stdin is None:
+        _stdin = _StdinLines(sys.stdin)
+        if not _stdin.isatty():
+            sys.stdin = _stdin
+    return _stdin
+
+
+class LocalDevices(CallDevices):
+    """Terminal, micro (sounddevice) et sonneries (pygame) du poste local.
+
+    sounddevice et pygame ne sont importés qu'à la première utilisation : un serveur
+    sans carte son peut charger les modèles avec SyntheticDevices.
+
+    next_event attend dans un sélecteur à la fois l'entrée standard et un tube que le
+    callback audio réveille : aucun thread ne reste bloqué sur input() et la fin de
+    la capture est vue immédiatement. Les lignes sont lues dans le tampon de
+    stdin_lines(), consulté avant chaque attente. Sous Windows, où select ne sait pas
+    attendre la console, le clavier est consulté toutes les 50 ms.
+    """
+
+    def __init__(self):
+        self._events: "queue.SimpleQueue[Event]" = queue.SimpleQueue()
+        self._selector: Optional[selectors.BaseSelector] = None
+        self._wakeup: Optional[Tuple[int, int]] = None
+        self._stdin = stdin_lines() if msvcrt is None else None
+        self._capturing = False
+
+    @property
+    def samplerate(self) -> int:
+        import sounddevice as sd
+        return int(sd.default.samplerate or 44100)
+
+    def now(self) -> float:
+        return time.time()
+
+    def sleep(self, seconds: float):
+        time.sleep(seconds)
+
+    def read_line(self, prompt: str = "") -> str:
+        # Hors terminal, input() lit le même tampon que next_event (voir stdin_lines)
+        return input(prompt)
+
+    def _post(self, event: Event):
+        """Ajouter un événement depuis un autre thread (callback audio) et réveiller next_event."""
+        self._events.put(event)
+        if self._wakeup is not None:
+            try:
+                os.write(self._wakeup[1], b"\0")
+            except BlockingIOError:
+                pass  # Tube plein : next_event est déjà réveillé
+
+    def _open_selector(self) -> selectors.BaseSelector:
+        if self._selector is None:
+            read_end, write_end = os.pipe()
+            os.set_blocking(read_end, False)
+            os.set_blocking(write_end, False)
+            self._wakeup = (read_end, write_end)
+            self._selector = selectors.DefaultSelector()
+            self._selector.register(self._stdin.fileno(), selectors.EVENT_READ, "key")
+            self._selector.register(read_end, selectors.EVENT_READ, "wakeup")
+        return self._selector
+
+    def next_event(self, timeout: Optional[float]) -> Event:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        selector = self._open_selector() if msvcrt is None else None
+        while True:
+            try:
+                return self._events.get_nowait()
+            except queue.Empty:
+                pass
+            # Lignes déjà reçues (plusieurs peuvent arriver d'un coup) : avant toute attente
+            line = self._stdin.pending() if self._stdin is not None else None
+            if line is not None:
+                return "key", line.strip().lower()
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return "timeout", None
+            if selector is None:
+                if msvcrt.kbhit():
+                    return "key", input().strip().lower()
+                time.sleep(0.05 if remaining is None else min(0.05, remaining))
+                continue
+            if self._stdin.eof and remaining is None and not self._capturing:
+                # Ni touche ni fin de capture ne peuvent plus arriver : comme input() à la fin
+                raise EOFError("Fin de l'entrée standard.")
+            for key, _ in selector.select(remaining):
+                if key.data == "wakeup":
+                    while True:
+                        try:
+                            if not os.read(self._wakeup[0], 4096):
+                                break
+                        except BlockingIOError:
+                            break
+                    continue
+                if not self._stdin.fill():
+                    # Fin de l'entrée standard : dernière ligne incomplète, ou Entrée
+                    selector.unregister(self._stdin.fileno())
+                    return "key", (self._stdin.pending() or "").strip().lower()
+
+    @contextmanager
+    def open_input(self, on_block: BlockCallback, samplerate: int):
+        import sounddevice as sd
+
+        # Événements d'une capture précédente : sans objet pour celle-ci
+        while not self._events.empty():
+            self._events.get_nowait()
+
+        def callback(indata, frames, time, status):
+            if not on_block(indata):
+                self._post(("audio", None))
+                raise sd.CallbackStop
+
+        with sd.InputStream(callback=callback, samplerate=samplerate):
+            self._capturing = True
+            try:
+                yield
+            finally:
+                self._capturing = False
+
+    def _tones(self):
+        # Mixeur et sonneries déjà prêts : démarrage et arrêt immédiats
+        from Models.Tones import get_tone_engine
+        return get_tone_engine()
+
+    def play_tone(self, sound_file: str):
+        self._tones().play(sound_file)
+
+    def play_tone_and_wait(self, sound_file: str):
+        self._tones().play_and_wait(sound_file)
+
+    def stop_tone(self):
+        self._tones().stop()
+
+
+class SyntheticDevices(CallDevices):
+    """Poste simulé : horloge virtuelle, saisies scriptées et voix synthétique.
+
+    script() programme les lignes saisies et les touches (chacune après un délai en
+    secondes virtuelles). Le temps n'avance que dans sleep() et next_event() ;
+    pendant ce temps, si le micro est ouvert, on_block reçoit des blocs de
+    block_seconds alternant parole (harmoniques et bruit) et silence, tirés d'un
+    petit répertoire généré une fois à partir de la graine. Les sonneries ne
+    prennent pas de temps.
+    """
+
+    def __init__(self, seed: int = 0, start: Optional[float] = None,
+                 samplerate: int = RECORDING_SAMPLERATE or 8000, block_seconds: float = 0.125):
+        self.samplerate = samplerate
+        self.block_seconds = block_seconds
+        self.block_frames = max(1, round(samplerate * block_seconds))
+        self._now = time.time() if start is None else start
+        self._rng = random.Random(seed)
+        self._lines: Deque[str] = deque()
+        self._keys: Deque[Tuple[float, str]] = deque()
+        self._on_block: Optional[BlockCallback] = None
+        self._talking = False
+        self.audio_seconds = 0.0  # Audio fourni au micro depuis la création
+        self._voice, self._silence = self._make_blocks(np.random.default_rng(seed))
+
+    def _make_blocks(self, rng: np.random.Generator, count: int = 16) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+        t = np.arange(self.block_frames) / self.samplerate
+        voice, silence = [], []
+        for _ in range(count):
+            pitch = rng.uniform(90, 250)
+            signal = sum(np.sin(2 * np.pi * pitch * harmonic * t + rng.uniform(0, 2 * np.pi)) / harmonic
+                         for harmonic in range(1, 6))
+            signal = 0.1 * signal + rng.normal(0, 0.01, self.block_frames)
+            voice.append(signal.astype(np.float32).reshape(-1, 1))
+            silence.append(rng.normal(0, 0.0005, self.block_frames).astype(np.float32).reshape(-1, 1))
+        return voice, silence
+
+    def script(self, lines: Tuple[str, ...] = (), keys: Tuple[Tuple[float, str], ...] = ()):
+        """Remplacer les saisies à venir : lignes lues par read_line, touches (délai, touche)."""
+        self._lines = deque(lines)
+        self._keys = deque(keys)
+
+    def now(self) -> float:
+        return self._now
+
+    def sleep(self, seconds: float):
+        self._advance(seconds)
+
+    def read_line(self, prompt: str = "") -> str:
+        if not self._lines:
+            raise EOFError("Plus de saisie dans le scénario.")
+        return self._lines.popleft()
+
+    def next_event(self, timeout: Optional[float]) -> Event:
+        limit = float("inf") if timeout is None else timeout
+        key_delay = self._keys[0][0] if self._keys else float("inf")
+        step = min(limit, key_delay)
+        if step == float("inf") and self._on_block is None:
+            raise EOFError("Plus de touche dans le scénario.")
+        capturing = self._on_block is not None
+        elapsed = self._advance(step)
+        if self._keys:
+            delay, key = self._keys[0]
+            self._keys[0] = (delay - elapsed, key)
+        if capturing and self._on_block is None:
+            return "audio", None
+        if key_delay <= limit:
+            return "key", self._keys.popleft()[1]
+        return "timeout", None
+
+    @contextmanager
+    def open_input(self, on_block: BlockCallback, samplerate: int) -> Iterator[None]:
+        if samplerate != self.samplerate:
+            raise ValueError(f"Micro simulé à {self.samplerate} Hz (demandé : {samplerate} Hz)")
+        self._on_block = on_block
+        try:
+            yield
+        finally:
+            self._on_block = None
+
+    def _advance(self, seconds: float) -> float:
+        """Avancer l'horloge, en alimentant le micro s'il est ouvert. Retourne le temps écoulé,
+        plus court que seconds si on_block a arrêté la capture."""
+        if self._on_block is None:
+            self._now += seconds
+            return seconds
+        # Temps exprimé en trames : pas d'erreur d'arrondi cumulée sur les longs appels
+        frames = round(seconds * self.samplerate) if seconds != float("inf") else None
+        fed = 0
+        while frames is None or fed < frames:
+            count = self.block_frames if frames is None else min(frames - fed, self.block_frames)
+            # Parole et silence par plages de quelques blocs, comme une conversation
+            if self._rng.random() < 0.15:
+                self._talking = not self._talking
+            block = self._rng.choice(self._voice if self._talking else self._silence)[:count]
+            fed += count
+            self.audio_seconds += count / self.samplerate
+            if not self._on_block(block):
+                self._on_block = None
+                elapsed = fed / self.samplerate
+                self._now += elapsed
+                return elapsed
+        self._now += seconds
+        return seconds
+
+    def play_tone(self, sound_file: str):
+        pass
+
+    def play_tone_and_wait(self, sound_file: str):
+        pass
+
+    def stop_tone(self):
+        pass
+
+
+_devices: Optional[CallDevices] = None
+
+
+def set_default_devices(devices: CallDevices):
+    """Choisir les périphériques utilisés par les appels (simulateur, tests de charge)."""
+    global _devices
+    _devices = devices
+
+
+def get_devices() -> CallDevices:
+    """Périphériques du processus : le poste local par défaut."""
+    global _devices
+    if _devices is None:
+        _devices = LocalDevices()
+    return _devices
@@ -0,0 +1,37 @@
+"""
+Fonctions communes aux modèles
+"""
+
+from datetime import datetime
+from typing import Dict, Optional
+
+
+# Noms des mois tels qu'écrits par strftime("%B") avec la locale fr_FR
+FRENCH_MONTHS = {
+    "janvier": 1, "février": 2, "mars": 3, "avril": 4, "mai": 5, "juin": 6,
+    "juillet": 7, "août": 8, "septembre": 9, "octobre": 10, "novembre": 11, "décembre": 12,
+}
+# Sans la locale fr_FR (serveur), make_call écrit les mois en anglais
+ENGLISH_MONTHS = {
+    "january": 1, "february": 2, "march": 3, "april": 4, "may": 5, "june": 6,
+    "july": 7, "august": 8, "september": 9, "october": 10, "november": 11, "december": 12,
+}
+MONTHS = {**FRENCH_MONTHS, **ENGLISH_MONTHS}
+
+
+def parse_call_date(date: str) -> Optional[datetime]:
+    """Convertit une date d'appel ("18 octobre 2026 14:05:09") en datetime, sans dépendre de la locale."""
+    try:
+        day, month, year, clock = date.split()
+        hour, minute, second = (int(part) for part in clock.split(":"))
+        return datetime(int(year), MONTHS[month.lower()], int(day), hour, minute, second)
+    except (ValueError, KeyError, AttributeError):
+        return None
+
+
+def call_timestamp(call: Dict) -> Optional[float]:
+    """Horodatage (secondes epoch) d'un appel de l'historique."""
+    if call.get("timestamp") is not None:
+        return call["timestamp"]
+    date = parse_call_date(call.get("date", ""))
+    return date.timestamp() if date else None
@@ -0,0 +1,148 @@
+"""
+Historique des appels par abonné, stocké à part des fiches clients
+"""
+
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+from consts import HISTORY_SEGMENT_SIZE
+
+
+class HistoryStore:
+    """Historique d'appels en segments append-only : un répertoire par abonné, un fichier par segment."""
+
+    def __init__(self, base_dir: str, segment_size: int = HISTORY_SEGMENT_SIZE):
+        self.base_dir = base_dir
+        self.segment_size = segment_size
+        self._lock = threading.RLock()
+
+    def _dir(self, phone: str) -> str:
+        # Répartition des abonnés dans des sous-répertoires selon les derniers chiffres
+        return os.path.join(self.base_dir, phone[-3:], phone)
+
+    def _segment_path(self, phone: str, segment: int) -> str:
+        return os.path.join(self._dir(phone), f"{segment:06d}.jsonl")
+
+    def _last_segment(self, phone: str) -> Optional[int]:
+        directory = self._dir(phone)
+        if not os.path.isdir(directory):
+            return None
+        segments = [int(name[:-6]) for name in os.listdir(directory) if name.endswith(".jsonl")]
+        return max(segments) if segments else None
+
+    @staticmethod
+    def _read_lines(path: str) -> List[bytes]:
+        """Lignes complètes d'un segment (une éventuelle ligne tronquée est ignorée)."""
+        with open(path, "rb") as f:
+            lines = f.read().split(b"\n")
+        return [line for line in lines[:-1] if line]
+
+    def count(self, phone: str) -> int:
+        """Nombre d'appels dans l'historique d'un abonné."""
+        with self._lock:
+            last = self._last_segment(phone)
+            if last is None:
+                return 0
+            return last * self.segment_size + len(self._read_lines(self._segment_path(phone, last)))
+
+    def append(self, phone: str, call: Dict):
+        """Ajouter un appel (le plus récent) à l'historique."""
+        self.extend(phone, [call])
+
+    def extend(self, phone: str, calls: Iterable[Dict], durable: bool = True):
+        """Ajouter des appels, du plus ancien au plus récent.
+
+        Avec durable=False, les segments ne sont pas synchronisés sur disque (chargements en masse).
+        """
+        with self._lock:
+            directory = self._dir(phone)
+            os.makedirs(directory, exist_ok=True)
+            segment = self._last_segment(phone) or 0
+            path = self._segment_path(phone, segment)
+            lines = 0
+            if os.path.exists(path):
+                complete = self._read_lines(path)
+                lines = len(complete)
+                # Retirer une ligne tronquée par un arrêt brutal
+                valid_size = sum(len(line) + 1 for line in complete)
+                if os.path.getsize(path) != valid_size:
+                    with open(path, "r+b") as f:
+                        f.truncate(valid_size)
+
+            f = open(path, "ab")
+            try:
+                for call in calls:
+                    if lines >= self.segment_size:
+                        f.flush()
+                        if durable:
+                            os.fsync(f.fileno())
+                        f.close()
+                        segment += 1
+                        lines = 0
+                        f = open(self._segment_path(phone, segment), "ab")
+                    f.write(json.dumps(call).encode("utf-8") + b"\n")
+                    lines += 1
+                f.flush()
+                if durable:
+                    os.fsync(f.fileno())
+            finally:
+                f.close()
+
+    def read(self, phone: str, limit: Optional[int] = None) -> List[Dict]:
+        """Historique du plus récent au plus ancien, en ne lisant que les segments nécessaires."""
+        with self._lock:
+            last = self._last_segment(phone)
+            calls = []
+            if last is None:
+                return calls
+            for segment in range(last, -1, -1):
+                for line in reversed(self._read_lines(self._segment_path(phone, segment))):
+                    calls.append(json.loads(line))
+                    if limit is not None and len(calls) >= limit:
+                        return calls
+            return calls
+
+    def set_status(self, phone: str, call_index: int, status: str) -> bool:
+        """Modifier le statut d'un appel (indice 0 = le plus récent) en réécrivant un seul segment."""
+        with self._lock:
+            position = self.count(phone) - 1 - call_index
+            if call_index < 0 or position < 0:
+                return False
+            path = self._segment_path(phone, position // self.segment_size)
+            lines = self._read_lines(path)
+            call = json.loads(lines[position % self.segment_size])
+            call["status"] = status
+            lines[position % self.segment_size] = json.dumps(call).encode("utf-8")
+            self._rewrite(path, lines)
+            return True
+
+    def forget_recordings(self, phone: str, audio_files: Set[str]) -> int:
+        """Retirer des appels les chemins d'enregistrements supprimés, segment par segment."""
+        changed = 0
+        with self._lock:
+            last = self._last_segment(phone)
+            for segment in range(0 if last is None else last + 1):
+                path = self._segment_path(phone, segment)
+                lines = self._read_lines(path)
+                modified = False
+                for position, line in enumerate(lines):
+                    call = json.loads(line)
+                    if call.get("audio_file") in audio_files:
+                        call["audio_file"] = None
+                        call["recording"] = "deleted"
+                        lines[position] = json.dumps(call).encode("utf-8")
+                        modified = True
+                        changed += 1
+                if modified:
+                    self._rewrite(path, lines)
+        return changed
+
+    @staticmethod
+    def _rewrite(path: str, lines: List[bytes]):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(b"".join(line + b"\n" for line in lines))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
@@ -0,0 +1,145 @@
+"""
+Index persistant des clients par numéro de téléphone
+"""
+
+import os
+import struct
+import zlib
+from typing import Iterable, Optional, Tuple
+
+
+# En-tête : signature, capacité, nombre d'entrées, taille et date du fichier indexé
+_HEADER = struct.Struct("<4sIIQQ")
+_MAGIC = b"GIDX"
+# Case : numéro (complété par des zéros), position et longueur de l'enregistrement
+_SLOT = struct.Struct("<16sQI")
+_EMPTY_KEY = b"\0" * 16
+_MIN_CAPACITY = 1024
+# Nombre de cases lues d'un coup lors d'un sondage
+_PROBE_BATCH = 8
+# Nombre de cases lues d'un coup lors d'un parcours complet
+_SCAN_BATCH = 4096
+
+
+class PhoneIndex:
+    """Table de hachage sur disque associant un numéro à la position de son enregistrement."""
+
+    def __init__(self, index_file: str, data_file: str):
+        self.index_file = index_file
+        self.data_file = data_file
+
+    def _data_signature(self) -> Tuple[int, int]:
+        """Taille et date de modification du fichier indexé."""
+        stat = os.stat(self.data_file)
+        return stat.st_size, stat.st_mtime_ns
+
+    def _read_header(self, f) -> Optional[Tuple[int, int, int, int]]:
+        raw = f.read(_HEADER.size)
+        if len(raw) != _HEADER.size:
+            return None
+        magic, capacity, count, size, mtime = _HEADER.unpack(raw)
+        if magic != _MAGIC or capacity == 0:
+            return None
+        return capacity, count, size, mtime
+
+    def is_valid(self) -> bool:
+        """Vérifie que l'index existe et correspond à l'état actuel du fichier des clients."""
+        if not os.path.exists(self.index_file) or not os.path.exists(self.data_file):
+            return False
+        with open(self.index_file, "rb") as f:
+            header = self._read_header(f)
+        if header is None:
+            return False
+        return (header[2], header[3]) == self._data_signature()
+
+    @staticmethod
+    def _key(phone: str) -> bytes:
+        return phone.encode("ascii").ljust(16, b"\0")
+
+    @staticmethod
+    def _home_slot(key: bytes, capacity: int) -> int:
+        return zlib.crc32(key) % capacity
+
+    def _probe(self, f, key: bytes, capacity: int) -> Tuple[int, Optional[Tuple[int, int]]]:
+        """Cherche la case d'une clé. Retourne (case, (position, longueur)) ou (case libre, None)."""
+        slot = self._home_slot(key, capacity)
+        for _ in range(0, capacity, _PROBE_BATCH):
+            batch = min(_PROBE_BATCH, capacity - slot)
+            f.seek(_HEADER.size + slot * _SLOT.size)
+            raw = f.read(batch * _SLOT.size)
+            for i in range(batch):
+                stored, offset, length = _SLOT.unpack_from(raw, i * _SLOT.size)
+                if stored == _EMPTY_KEY:
+                    return slot + i, None
+                if stored == key:
+                    return slot + i, (offset, length)
+            slot = (slot + batch) % capacity
+        raise ValueError("Index des clients plein.")
+
+    def lookup(self, phone: str) -> Optional[Tuple[int, int]]:
+        """Retourne (position, longueur) de l'enregistrement d'un numéro, ou None."""
+        with open(self.index_file, "rb") as f:
+            header = self._read_header(f)
+            if header is None:
+                return None
+            _, location = self._probe(f, self._key(phone), header[0])
+            return location
+
+    def entries(self) -> Iterable[Tuple[str, int, int]]:
+        """Parcourt toutes les entrées de l'index, par blocs de cases (mémoire constante)."""
+        with open(self.index_file, "rb") as f:
+            header = self._read_header(f)
+            if header is None:
+                return
+            remaining = header[0]
+            while remaining:
+                raw = f.read(min(remaining, _SCAN_BATCH) * _SLOT.size)
+                if not raw:
+                    return
+                remaining -= len(raw) // _SLOT.size
+                for stored, offset, length in _SLOT.iter_unpack(raw):
+                    if stored != _EMPTY_KEY:
+                        yield stored.rstrip(b"\0").decode("ascii"), offset, length
+
+    def rebuild(self, entries: Iterable[Tuple[str, int, int]]):
+        """Reconstruit entièrement l'index à partir des positions des enregistrements."""
+        entries = list(entries)
+        capacity = _MIN_CAPACITY
+        while capacity < 2 * len(entries):
+            capacity *= 2
+
+        table = bytearray(capacity * _SLOT.size)
+        for phone, offset, length in entries:
+            key = self._key(phone)
+            slot = self._home_slot(key, capacity)
+            while table[slot * _SLOT.size:slot * _SLOT.size + 16] != _EMPTY_KEY:
+                slot = (slot + 1) % capacity
+            _SLOT.pack_into(table, slot * _SLOT.size, key, offset, length)
+
+        size, mtime = self._data_signature()
+        tmp_file = f"{self.index_file}.tmp"
+        with open(tmp_file, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, capacity, len(entries), size, mtime))
+            f.write(table)
+        os.replace(tmp_file, self.index_file)
+
+    def insert(self, phone: str, offset: int, length: int):
+        """Ajoute une entrée et met à jour la signature du fichier indexé."""
+        with open(self.index_file, "rb") as f:
+            capacity, count, _, _ = self._read_header(f)
+        if 2 * (count + 1) > capacity:
+            # Taux de remplissage trop élevé : on double la capacité
+            entries = [entry for entry in self.entries() if entry[0] != phone]
+            self.rebuild(entries + [(phone, offset, length)])
+            return
+
+        with open(self.index_file, "r+b") as f:
+            key = self._key(phone)
+            slot, existing = self._probe(f, key, capacity)
+            f.seek(_HEADER.size + slot * _SLOT.size)
+            f.write(_SLOT.pack(key, offset, length))
+            if existing is None:
+                count += 1
+            size, mtime = self._data_signature()
+            f.seek(0)
+            f.write(_HEADER.pack(_MAGIC, capacity, count, size, mtime))
@@ -0,0 +1,182 @@
+"""
+Journal append-only des mutations (write-ahead log)
+"""
+
+import json
+import os
+import threading
+import zlib
+from typing import Dict, List, Optional, Tuple
+from Models.Locks import file_lock
+
+
+class _JournalState:
+    """État en mémoire d'un journal, partagé par toutes les instances du processus."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.inode = None
+        self.offset = 0
+        self.last_seq = 0
+        # numéro -> liste de (seq, opération) non encore compactées
+        self.by_phone: Dict[str, List[Tuple[int, Dict]]] = {}
+        # (seq, ventes) des transactions non encore compactées qui portent des ventes
+        self.sales: List[Tuple[int, List[Dict]]] = []
+
+
+_states: Dict[str, _JournalState] = {}
+_states_lock = threading.Lock()
+
+
+def _encode(entry: Dict) -> bytes:
+    payload = json.dumps(entry, separators=(",", ":")).encode("utf-8")
+    return b"%08x " % zlib.crc32(payload) + payload + b"\n"
+
+
+def _decode(line: bytes):
+    """Décode une ligne du journal, ou None si elle est tronquée ou corrompue."""
+    if not line.endswith(b"\n") or len(line) < 10:
+        return None
+    checksum, payload = line[:8], line[9:-1]
+    try:
+        if int(checksum, 16) != zlib.crc32(payload):
+            return None
+        return json.loads(payload)
+    except ValueError:
+        return None
+
+
+class MutationJournal:
+    """Journal des mutations : chaque ligne est une transaction atomique d'opérations."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with _states_lock:
+            self._state = _states.setdefault(os.path.abspath(path), _JournalState())
+        self._file_lock = file_lock(f"{path}.lock")
+
+    @property
+    def lock(self) -> threading.RLock:
+        return self._state.lock
+
+    def _reset(self):
+        state = self._state
+        state.inode = None
+        state.offset = 0
+        state.last_seq = 0
+        state.by_phone = {}
+        state.sales = []
+
+    def _index_entry(self, entry: Dict):
+        state = self._state
+        state.last_seq = max(state.last_seq, entry["seq"])
+        for op in entry["ops"]:
+            state.by_phone.setdefault(op["phone"], []).append((entry["seq"], op))
+        if entry.get("sales"):
+            state.sales.append((entry["seq"], entry["sales"]))
+
+    def sync(self):
+        """Relit la fin du journal écrite depuis la dernière lecture."""
+        with self.lock:
+            state = self._state
+            if not os.path.exists(self.path):
+                self._reset()
+                return
+            stat = os.stat(self.path)
+            if stat.st_ino != state.inode or stat.st_size < state.offset:
+                # Journal remplacé (compaction) : on le relit entièrement
+                self._reset()
+                state.inode = stat.st_ino
+            if stat.st_size == state.offset:
+                return
+
+            with open(self.path, "rb") as f:
+                f.seek(state.offset)
+                for line in f:
+                    entry = _decode(line)
+                    if entry is None:
+                        # Écriture en cours dans un autre processus, ou interrompue
+                        # par un arrêt brutal : on s'arrête avant
+                        break
+                    self._index_entry(entry)
+                    state.offset += len(line)
+
+    def append(self, ops: List[Dict], sales: Optional[List[Dict]] = None) -> int:
+        """Ajoute une transaction au journal et la rend durable. Retourne son numéro de séquence.
+
+        sales : ventes de crédit de la transaction, gardées avec elle jusqu'à la compaction pour
+        être rejouées si leur écriture dans le journal des ventes a été interrompue.
+        """
+        # Le verrou de fichier garantit des numéros de séquence uniques entre processus
+        with self.lock, self._file_lock:
+            self.sync()
+            if os.path.exists(self.path) and os.path.getsize(self.path) > self._state.offset:
+                # Ligne tronquée par un arrêt brutal : retirée pour que les ajouts restent lisibles
+                with open(self.path, "r+b") as f:
+                    f.truncate(self._state.offset)
+            entry = {"seq": self._state.last_seq + 1, "ops": ops}
+            if sales:
+                entry["sales"] = sales
+            line = _encode(entry)
+            with open(self.path, "ab") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            if self._state.inode is None:
+                self._state.inode = os.stat(self.path).st_ino
+            self._state.offset += len(line)
+            self._index_entry(entry)
+            return entry["seq"]
+
+    def pending(self, phone: str) -> List[Tuple[int, Dict]]:
+        """Opérations en attente de compaction pour un numéro, dans l'ordre d'écriture."""
+        with self.lock:
+            self.sync()
+            return list(self._state.by_phone.get(phone, []))
+
+    def all_pending(self) -> Dict[str, List[Tuple[int, Dict]]]:
+        """Toutes les opérations en attente, regroupées par numéro."""
+        with self.lock:
+            self.sync()
+            return {phone: list(ops) for phone, ops in self._state.by_phone.items()}
+
+    def pending_sales(self) -> List[Tuple[int, List[Dict]]]:
+        """(seq, ventes) des transactions en attente de compaction, dans l'ordre d'écriture."""
+        with self.lock:
+            self.sync()
+            return list(self._state.sales)
+
+    @property
+    def last_seq(self) -> int:
+        with self.lock:
+            self.sync()
+            return self._state.last_seq
+
+    def size(self) -> int:
+        """Taille du journal en octets."""
+        with self.lock:
+            self.sync()
+            return self._state.offset
+
+    def discard_through(self, seq: int):
+        """Supprime les transactions déjà intégrées au fichier principal (numéro <= seq)."""
+        with self.lock, self._file_lock:
+            self.sync()
+            kept = []
+            if os.path.exists(self.path):
+                with open(self.path, "rb") as f:
+                    for line in f:
+                        entry = _decode(line)
+                        if entry is not None and entry["seq"] > seq:
+                            kept.append(line)
+            if not kept:
+                # On conserve le dernier numéro de séquence pour ne jamais le réutiliser
+                kept.append(_encode({"seq": self._state.last_seq, "ops": []}))
+
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.writelines(kept)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self.sync()
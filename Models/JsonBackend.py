@@ -0,0 +1,544 @@
+"""
+Moteur de stockage en fichiers JSON (installations de petite taille)
+"""
+
+import copy
+import json
+import os
+import shutil
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from consts import DATA_DIR, JOURNAL_COMPACTION_SIZE, SETTLED_RESERVATIONS_KEPT
+from Models.Backend import StorageBackend, indexes_conflict
+from Models.History import HistoryStore
+from Models.Index import PhoneIndex
+from Models.Journal import MutationJournal
+from Models.Locks import file_lock, record_locks
+from Models.Sales import SalesJournal
+from Views.Functions import print_message
+
+
+# Fin du tableau JSON dans le fichier des clients
+CLIENTS_FILE_END = b"\n]\n"
+# Taille des blocs lus dans un fichier des clients à convertir
+CLIENTS_READ_SIZE = 1 << 16
+
+
+class JsonBackend(StorageBackend):
+    """Clients indexés par numéro avec journal des mutations, opérateurs et caisses en JSON."""
+
+    def __init__(self, data_dir: str = DATA_DIR):
+        if not os.path.exists(data_dir):
+            os.makedirs(data_dir)
+        self.clients_file = os.path.join(data_dir, "clients.txt")
+        self.operators_file = os.path.join(data_dir, "operators.txt")
+        self.cashier_file = os.path.join(data_dir, "caisses.txt")
+        self.index = PhoneIndex(os.path.join(data_dir, "clients.idx"), self.clients_file)
+        self.journal = MutationJournal(os.path.join(data_dir, "clients.journal"))
+        self.history_dir = os.path.join(data_dir, "history")
+        self.history = HistoryStore(self.history_dir)
+        self.sales = SalesJournal(os.path.join(data_dir, "sales"))
+        # Protège le remplacement du fichier des clients et de son index
+        self._clients_lock = threading.RLock()
+        # Réécriture du fichier des clients (compaction, index) : un seul processus à la fois
+        self._storage_lock = file_lock(os.path.join(data_dir, "clients.lock"))
+        # Vérifications puis écritures sur un client : verrou par enregistrement
+        self._record_locks = record_locks(os.path.join(data_dir, "clients.locks"))
+        self._operators_lock = file_lock(f"{self.operators_file}.lock")
+        self._cashier_lock = file_lock(f"{self.cashier_file}.lock")
+        if not os.path.isdir(self.history_dir):
+            self._migrate_history()
+        self._restore_sales()
+
+    # Clients
+
+    def get_client(self, phone: str) -> Optional[Dict]:
+        # Journal lu avant le fichier principal : si une compaction d'un autre processus
+        # intervient entre les deux, les opérations déjà intégrées sont ignorées (_seq)
+        pending = self.journal.pending(phone)
+        return self._public(self._replay(self._read_client(phone), pending))
+
+    def client_exists(self, phone: str) -> bool:
+        """Vérifie l'existence d'un client via les créations en attente et l'index."""
+        if any(op["op"] == "create" for _, op in self.journal.pending(phone)):
+            return True
+        return self._locate_client(phone) is not None
+
+    def insert_client(self, client: Dict) -> bool:
+        with self._record_locks.lock(client["phone"]):
+            if self.client_exists(client["phone"]):
+                return False
+            client = dict(client)
+            history = client.pop("call_history", [])
+            self._log([{"op": "create", "phone": client["phone"], "client": client}])
+            if history:
+                self.history.extend(client["phone"], reversed(history))
+            return True
+
+    def iter_clients(self) -> Iterator[Dict]:
+        for client in self._merge(self._iter_base_clients(), self.journal.all_pending()):
+            yield self._public(client)
+
+    def iter_phones(self) -> Iterator[str]:
+        """Numéros lus dans l'index et les créations en attente : aucune fiche n'est décodée."""
+        # Créations lues avant l'index : une compaction entre les deux les fait apparaître
+        # dans l'index, d'où le filtre pour ne pas les donner deux fois
+        created = [phone for phone, ops in self.journal.all_pending().items()
+                   if any(op["op"] == "create" for _, op in ops)]
+        with self._clients_lock:
+            has_base = self._ensure_index()
+        if has_base:
+            pending = set(created)
+            for phone, _, _ in self.index.entries():
+                if phone not in pending:
+                    yield phone
+        yield from created
+
+    def bulk_load(self, clients: Iterable[Dict]) -> int:
+        with self._storage_lock:
+            if os.path.exists(self.clients_file) or self.journal.last_seq:
+                raise ValueError("Le chargement en masse demande un stockage sans clients.")
+            count = 0
+
+            def records():
+                nonlocal count
+                for client in clients:
+                    client = dict(client)
+                    history = client.pop("call_history", [])
+                    if history:
+                        # Pas de fsync par abonné : un chargement interrompu se recommence à vide
+                        self.history.extend(client["phone"], reversed(history), durable=False)
+                    count += 1
+                    yield client
+
+            if not self._save_clients(records()):
+                raise IOError("Échec de l'écriture du fichier des clients.")
+            return count
+
+    def update_credit(self, phone: str, amount: float) -> bool:
+        if not self.client_exists(phone):
+            return False
+        self._log([{"op": "credit", "phone": phone, "amount": amount}])
+        return True
+
+    def debit_credit(self, phone: str, amount: float) -> Optional[float]:
+        with self._record_locks.lock(phone):
+            client = self.get_client(phone)
+            if client is None:
+                return None
+            debit = min(amount, max(client["credit"], 0))
+            if debit:
+                self._log([{"op": "credit", "phone": phone, "amount": -debit}])
+            return debit
+
+    def refund_reservation(self, phone: str, reservation: str, amount: float) -> bool:
+        with self._record_locks.lock(phone):
+            # Fiche complète : les réservations déjà réglées ne sont pas exposées par get_client
+            client = self._replay(self._read_client(phone), self.journal.pending(phone))
+            if client is None:
+                return False
+            if reservation not in client.get("_reservations", []):
+                self._log([{"op": "refund", "phone": phone, "amount": amount, "reservation": reservation}])
+            return True
+
+    def transfer_credit(self, source: str, transfers: List[Tuple[str, float]]) -> bool:
+        """Débit et crédits forment une seule transaction du journal."""
+        total = sum(amount for _, amount in transfers)
+        with self._record_locks.lock(source, *(phone for phone, _ in transfers)):
+            client = self.get_client(source)
+            if client is None or client["credit"] < total:
+                return False
+            if not all(self.client_exists(phone) for phone, _ in transfers):
+                return False
+            self._log([{"op": "credit", "phone": source, "amount": -total}] +
+                      [{"op": "credit", "phone": phone, "amount": amount} for phone, amount in transfers])
+            return True
+
+    def add_call(self, phone: str, call: Dict) -> bool:
+        if not self.client_exists(phone):
+            return False
+        with self._record_locks.lock(phone):
+            self.history.append(phone, call)
+        return True
+
+    def get_call_history(self, phone: str, limit: Optional[int] = None) -> List[Dict]:
+        return self.history.read(phone, limit)
+
+    def count_calls(self, phone: str) -> int:
+        return self.history.count(phone)
+
+    def set_call_status(self, phone: str, call_index: int, status: str) -> bool:
+        with self._record_locks.lock(phone):
+            return self.history.set_status(phone, call_index, status)
+
+    def forget_recordings(self, phone: str, audio_files: Iterable[str]) -> int:
+        with self._record_locks.lock(phone):
+            return self.history.forget_recordings(phone, set(audio_files))
+
+    def clients_signature(self):
+        signature = []
+        for path in (self.clients_file, self.journal.path):
+            if os.path.exists(path):
+                stat = os.stat(path)
+                signature.append((stat.st_ino, stat.st_mtime_ns, stat.st_size))
+            else:
+                signature.append(None)
+        return tuple(signature)
+
+    def apply_batch(self, clients: List[Dict], credits: List[Tuple[str, float]],
+                    operators: Optional[List[Dict]] = None, sales: Optional[List[Dict]] = None) -> bool:
+        """Toutes les créations et recharges du lot forment une seule transaction du journal."""
+        ops = []
+        histories = []
+        for client in clients:
+            client = dict(client)
+            history = client.pop("call_history", [])
+            ops.append({"op": "create", "phone": client["phone"], "client": client})
+            if history:
+                histories.append((client["phone"], history))
+        ops.extend({"op": "credit", "phone": phone, "amount": amount} for phone, amount in credits)
+
+        # Verrou des ventes pris avant l'écriture du journal : les lots sont enregistrés
+        # dans le journal des ventes dans l'ordre de leurs numéros (voir _restore_sales)
+        with self._operators_lock, self._record_locks.lock(*(op["phone"] for op in ops)), self.sales.locked():
+            if any(self.client_exists(client["phone"]) for client in clients):
+                return False
+            updated = None
+            if operators:
+                updated = self._swap_operators(self.load_operators(), operators)
+                if updated is None:
+                    return False
+            if ops or sales:
+                # Les ventes font partie de la transaction : rejouées si la suite est interrompue
+                seq = self._log(ops, sales)
+                self.sales.record(sales or [], batch=seq)
+            for phone, history in histories:
+                self.history.extend(phone, reversed(history))
+            if updated is not None:
+                self._write_json(self.operators_file, updated)
+        return True
+
+    def _read_client(self, phone: str) -> Optional[Dict]:
+        """Lire l'enregistrement d'un client dans le fichier principal, sans le journal."""
+        with self._clients_lock:
+            location = self._locate_client(phone)
+            if location is None:
+                return None
+            offset, length = location
+            with open(self.clients_file, "rb") as f:
+                f.seek(offset)
+                return json.loads(f.read(length))
+
+    def _locate_client(self, phone: str) -> Optional[Tuple[int, int]]:
+        """Position de l'enregistrement d'un client dans le fichier, via l'index."""
+        with self._clients_lock:
+            if not self._ensure_index():
+                return None
+            return self.index.lookup(phone)
+
+    def _ensure_index(self) -> bool:
+        """Vérifie que l'index est à jour. Retourne False s'il n'y a aucun fichier des clients."""
+        with self._clients_lock:
+            if not os.path.exists(self.clients_file):
+                return False
+            if not self.index.is_valid():
+                with self._storage_lock:
+                    # Un autre processus a pu remplacer le fichier et son index entre-temps
+                    if not self.index.is_valid():
+                        # Index absent ou fichier modifié hors de l'application : on réécrit
+                        # le fichier au format indexable et on reconstruit l'index
+                        self._save_clients(self._stream_clients_file())
+            return True
+
+    def _stream_clients_file(self) -> Iterator[Dict]:
+        """Lire le fichier principal des clients quel que soit son format (tableau JSON), un client à la fois.
+
+        Le texte est lu par blocs et chaque fiche décodée dès qu'elle est complète :
+        la mémoire utilisée ne dépend pas de la taille du fichier.
+        """
+        decoder = json.JSONDecoder()
+        with open(self.clients_file, "r", encoding="utf-8") as f:
+            buffer, position, eof, started = "", 0, False, False
+            while True:
+                # Séparateurs entre les fiches
+                while position < len(buffer) and buffer[position] in " \t\r\n,":
+                    position += 1
+                if position < len(buffer) and not started:
+                    if buffer[position] != "[":
+                        raise ValueError("Le fichier des clients n'est pas un tableau JSON.")
+                    started = True
+                    position += 1
+                    continue
+                if position < len(buffer) and buffer[position] == "]":
+                    return
+                if position < len(buffer):
+                    try:
+                        client, end = decoder.raw_decode(buffer, position)
+                    except json.JSONDecodeError:
+                        if eof:
+                            raise
+                    else:
+                        position = end
+                        yield client
+                        continue
+                elif eof:
+                    if started:
+                        raise ValueError("Fichier des clients tronqué.")
+                    return  # Fichier vide
+                # Fiche incomplète ou bloc épuisé : on lit la suite du fichier
+                chunk = f.read(CLIENTS_READ_SIZE)
+                eof = not chunk
+                buffer, position = buffer[position:] + chunk, 0
+
+    def _iter_base_clients(self) -> Iterator[Dict]:
+        """Parcourir le fichier principal au format indexable, sans appliquer le journal."""
+        with self._clients_lock:
+            if not self._ensure_index():
+                return
+            # Le fichier ouvert reste lisible même s'il est remplacé par une compaction
+            f = open(self.clients_file, "rb")
+        with f:
+            for line in f:
+                line = line.strip().rstrip(b",")
+                if line in (b"", b"[", b"]"):
+                    continue
+                yield json.loads(line)
+
+    def _merge(self, clients: Iterable[Dict], pending: Dict[str, List[Tuple[int, Dict]]],
+               keep_history: bool = False) -> Iterator[Dict]:
+        """Appliquer les opérations en attente à un flux de clients, puis ajouter les clients créés."""
+        for client in clients:
+            yield self._replay(client, pending.pop(client["phone"], []), keep_history)
+        # Clients créés depuis la dernière compaction
+        for ops in sorted((ops for ops in pending.values() if ops), key=lambda ops: ops[0][0]):
+            client = self._replay(None, ops, keep_history)
+            if client is not None:
+                yield client
+
+    def _migrate_history(self):
+        """Sortir les historiques d'appels des fiches clients (données d'une version antérieure)."""
+        if not os.path.exists(self.clients_file) and not os.path.exists(self.journal.path):
+            os.makedirs(self.history_dir)
+            return
+
+        # 1. Copier les historiques dans un répertoire temporaire, mis en place d'un seul coup
+        staging_dir = f"{self.history_dir}.tmp"
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        staging = HistoryStore(staging_dir)
+        self._ensure_index()
+        for client in self._merge(self._iter_base_clients(), self.journal.all_pending(), keep_history=True):
+            if client.get("call_history"):
+                staging.extend(client["phone"], reversed(client["call_history"]))
+        os.makedirs(staging_dir, exist_ok=True)
+        os.replace(staging_dir, self.history_dir)
+
+        # 2. Réécrire les fiches sans leur historique
+        self.compact()
+
+    def _save_clients(self, clients: Iterable[Dict]) -> bool:
+        """Sauvegarder la liste des clients dans un fichier."""
+        # Un client par ligne : le fichier reste un tableau JSON valide et chaque
+        # enregistrement peut être relu seul grâce à sa position dans l'index.
+        # Écriture dans un fichier temporaire puis remplacement atomique.
+        try:
+            entries = []
+            tmp_file = f"{self.clients_file}.tmp"
+            with open(tmp_file, "wb") as f:
+                f.write(b"[")
+                for i, client in enumerate(clients):
+                    record = json.dumps(client).encode("utf-8")
+                    f.write(b"\n" if i == 0 else b",\n")
+                    entries.append((client["phone"], f.tell(), len(record)))
+                    f.write(record)
+                f.write(CLIENTS_FILE_END)
+                f.flush()
+                os.fsync(f.fileno())
+            with self._clients_lock:
+                os.replace(tmp_file, self.clients_file)
+                self.index.rebuild(entries)
+            return True
+        except Exception as e:
+            print_message(f"Erreur lors de la sauvegarde des clients : {e}", "ERROR")
+            return False
+
+    @staticmethod
+    def _replay(client: Optional[Dict], ops: List[Tuple[int, Dict]], keep_history: bool = False) -> Optional[Dict]:
+        """Appliquer à un client les opérations du journal qu'il n'intègre pas encore."""
+        # Une transaction peut contenir plusieurs opérations pour le même client
+        applied_seq = client.get("_seq", 0) if client is not None else 0
+        for seq, op in ops:
+            if seq <= applied_seq:
+                continue  # Déjà intégrée lors d'une compaction
+            if op["op"] == "create":
+                if client is None:
+                    client = copy.deepcopy(op["client"])
+            elif client is None:
+                continue
+            elif op["op"] == "credit":
+                client["credit"] += op["amount"]
+            elif op["op"] == "refund":
+                settled = client.setdefault("_reservations", [])
+                if op["reservation"] not in settled:
+                    client["credit"] += op["amount"]
+                    settled.append(op["reservation"])
+                    del settled[:-SETTLED_RESERVATIONS_KEPT]
+            # Opérations d'historique des versions antérieures, avant sa sortie des fiches
+            elif op["op"] == "call":
+                client.setdefault("call_history", []).insert(0, dict(op["call"]))
+            elif op["op"] == "status":
+                client["call_history"][op["index"]]["status"] = op["status"]
+            if client is not None:
+                client["_seq"] = seq
+        if client is not None and not keep_history:
+            # L'historique migré vers le stockage dédié n'est plus exposé ni réécrit
+            client.pop("call_history", None)
+        return client
+
+    @staticmethod
+    def _public(client: Optional[Dict]) -> Optional[Dict]:
+        """Fiche rendue aux modèles : sans le numéro de la dernière opération intégrée (_seq) ni
+        les dernières réservations réglées, qui ne servent qu'au stockage et restent dans le fichier principal."""
+        if client is not None:
+            client.pop("_seq", None)
+            client.pop("_reservations", None)
+        return client
+
+    def _log(self, ops: List[Dict], sales: Optional[List[Dict]] = None) -> int:
+        """Écrire une transaction dans le journal et déclencher la compaction si besoin."""
+        seq = self.journal.append(ops, sales)
+        if self.journal.size() >= JOURNAL_COMPACTION_SIZE and not self._storage_lock.locked():
+            threading.Thread(target=self.compact, daemon=True).start()
+        return seq
+
+    def _restore_sales(self):
+        """Enregistrer les ventes des lots du journal absentes du journal des ventes
+        (arrêt brutal entre l'écriture du lot et celle de ses ventes)."""
+        with self.sales.locked():
+            pending = self.journal.pending_sales()
+            if not pending:
+                return
+            recorded = self.sales.last_batch()
+            for seq, sales in pending:
+                if seq > recorded:
+                    self.sales.record(sales, batch=seq)
+
+    def compact(self):
+        """Intégrer le journal dans le fichier principal des clients."""
+        if not self._storage_lock.acquire(blocking=False):
+            return  # Une compaction est déjà en cours (dans ce processus ou un autre)
+        try:
+            with self.journal.lock:
+                last_seq = self.journal.last_seq
+                pending = {
+                    phone: [(seq, op) for seq, op in ops if seq <= last_seq]
+                    for phone, ops in self.journal.all_pending().items()
+                }
+
+            # Ventes des transactions qui vont quitter le journal : forcément enregistrées
+            self._restore_sales()
+            # L'index doit être à jour avant de réécrire le fichier en flux
+            self._ensure_index()
+            compacted = self._merge(self._iter_base_clients(), pending)
+
+            # Le journal n'est vidé qu'une fois le nouveau fichier en place
+            if self._save_clients(compacted):
+                self.journal.discard_through(last_seq)
+        finally:
+            self._storage_lock.release()
+
+    # Opérateurs
+
+    def load_operators(self) -> List[Dict]:
+        if not os.path.exists(self.operators_file):
+            return []
+        with open(self.operators_file, "r") as f:
+            return json.load(f)
+
+    def save_operators(self, operators: List[Dict]):
+        with self._operators_lock:
+            self._write_json(self.operators_file, operators)
+
+    def insert_operator(self, operator: Dict) -> bool:
+        with self._operators_lock:
+            operators = self.load_operators()
+            if any(existing["name"].lower() == operator["name"].lower() for existing in operators):
+                return False
+            if indexes_conflict(operators, operator["indexes"]):
+                return False
+            operators.append(dict(operator, version=1))
+            self._write_json(self.operators_file, operators)
+            return True
+
+    def replace_operator(self, name: str, operator: Dict, expected_version: int) -> bool:
+        with self._operators_lock:
+            updated = self._swap_operators(self.load_operators(), [dict(operator, version=expected_version)], name)
+            if updated is None:
+                return False
+            self._write_json(self.operators_file, updated)
+            return True
+
+    def delete_operator(self, name: str, expected_version: int) -> bool:
+        with self._operators_lock:
+            operators = self.load_operators()
+            kept = [operator for operator in operators
+                    if operator["name"] != name or operator.get("version", 0) != expected_version]
+            if len(kept) == len(operators):
+                return False
+            self._write_json(self.operators_file, kept)
+            return True
+
+    @staticmethod
+    def _swap_operators(current: List[Dict], operators: List[Dict], name: Optional[str] = None) -> Optional[List[Dict]]:
+        """Liste des opérateurs après remplacement de ceux fournis, chacun portant la version
+        à laquelle il a été lu. None si l'un d'eux a changé entre-temps ou si un index est déjà pris."""
+        current = list(current)
+        for operator in operators:
+            old_name = name or operator["name"]
+            position = next((i for i, existing in enumerate(current) if existing["name"] == old_name), None)
+            if position is None or current[position].get("version", 0) != operator.get("version", 0):
+                return None
+            if indexes_conflict(current, operator["indexes"], exclude=old_name):
+                return None
+            current[position] = dict(operator, version=operator.get("version", 0) + 1)
+        return current
+
+    def operators_signature(self):
+        if not os.path.exists(self.operators_file):
+            return None
+        stat = os.stat(self.operators_file)
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    # Caisses
+
+    def load_cashier(self) -> Dict:
+        if not os.path.exists(self.cashier_file):
+            return {}
+        with open(self.cashier_file, "r") as f:
+            return json.load(f)
+
+    def save_cashier(self, cashier_data: Dict):
+        with self._cashier_lock:
+            self._write_json(self.cashier_file, cashier_data)
+
+    def record_sales(self, sales: List[Dict]):
+        self.sales.record(sales)
+
+    def sales_totals(self, buckets: Iterable[str], manager_name: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+        return self.sales.totals(buckets, manager_name)
+
+    def iter_sales(self, start: Optional[float] = None, end: Optional[float] = None) -> Iterator[Dict]:
+        return self.sales.iter_sales(start, end)
+
+    def iter_sales_after(self, position: int = 0) -> Iterator[Tuple[Dict, int]]:
+        # Position : octet du journal des ventes
+        return self.sales.iter_after(position)
+
+    @staticmethod
+    def _write_json(path: str, data):
+        """Remplacer un fichier JSON d'un seul coup : les autres processus ne lisent jamais un fichier à moitié écrit."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
@@ -0,0 +1,184 @@
+"""
+Verrous consultatifs entre processus (plusieurs terminaux sur le même répertoire BD)
+"""
+
+import os
+import threading
+import zlib
+from contextlib import contextmanager
+from typing import Dict, Optional
+from consts import RECORD_LOCK_STRIPES
+
+try:
+    import fcntl
+except ImportError:  # Windows : verrous limités au processus
+    fcntl = None
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+
+class _Holder:
+    """Verrou réentrant d'un processus : le verrou système n'est pris qu'au premier niveau."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.depth = 0
+
+
+class FileLock:
+    """Verrou exclusif sur un fichier, réentrant dans le processus."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._holder = _Holder()
+        self._fd = None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        holder = self._holder
+        if not holder.lock.acquire(blocking):
+            return False
+        if holder.depth == 0 and fcntl is not None:
+            try:
+                if self._fd is None:
+                    directory = os.path.dirname(self.path)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self._fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                holder.lock.release()
+                return False
+            except BaseException:
+                holder.lock.release()
+                raise
+        holder.depth += 1
+        return True
+
+    def release(self):
+        holder = self._holder
+        holder.depth -= 1
+        if holder.depth == 0 and fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        holder.lock.release()
+
+    def locked(self) -> bool:
+        """Indique si un fil du processus détient le verrou."""
+        return self._holder.depth > 0
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class RecordLocks:
+    """Verrous par enregistrement : chaque clé est associée à un octet du fichier de verrous
+    (verrou de plage fcntl), si bien que des sessions travaillant sur des clients
+    différents ne s'attendent pas."""
+
+    def __init__(self, path: str, stripes: int = RECORD_LOCK_STRIPES):
+        self.path = path
+        self.stripes = stripes
+        self._holders: Dict[int, _Holder] = {}
+        self._holders_lock = threading.Lock()
+        self._fd = None
+
+    def _stripe(self, key: str) -> int:
+        return zlib.crc32(key.encode("utf-8")) % self.stripes
+
+    def _holder(self, stripe: int) -> _Holder:
+        with self._holders_lock:
+            if self._fd is None and fcntl is not None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            return self._holders.setdefault(stripe, _Holder())
+
+    @contextmanager
+    def lock(self, *keys: str):
+        """Verrouille les enregistrements donnés (dans un ordre fixe, pour éviter les interblocages)."""
+        stripes = sorted({self._stripe(key) for key in keys})
+        taken = []
+        try:
+            for stripe in stripes:
+                self._acquire(stripe)
+                taken.append(stripe)
+            yield
+        finally:
+            for stripe in reversed(taken):
+                self._release(stripe)
+
+    def _acquire(self, stripe: int):
+        holder = self._holder(stripe)
+        holder.lock.acquire()
+        if holder.depth == 0 and fcntl is not None:
+            try:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, stripe, os.SEEK_SET)
+            except BaseException:
+                holder.lock.release()
+                raise
+        holder.depth += 1
+
+    def _release(self, stripe: int):
+        holder = self._holders[stripe]
+        holder.depth -= 1
+        if holder.depth == 0 and fcntl is not None:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, stripe, os.SEEK_SET)
+        holder.lock.release()
+
+
+_instances: Dict[tuple, object] = {}
+_instances_lock = threading.Lock()
+
+
+def _shared(cls, path: str):
+    # Une seule instance par fichier dans le processus : les verrous fcntl sont
+    # attachés au processus et seraient relâchés par la fermeture d'un autre descripteur
+    key = (cls, os.path.abspath(path))
+    with _instances_lock:
+        if key not in _instances:
+            _instances[key] = cls(path)
+        return _instances[key]
+
+
+def file_lock(path: str) -> FileLock:
+    """Verrou exclusif partagé par tout le processus pour ce fichier."""
+    return _shared(FileLock, path)
+
+
+def record_locks(path: str) -> RecordLocks:
+    """Verrous par enregistrement partagés par tout le processus pour ce fichier."""
+    return _shared(RecordLocks, path)
+
+
+def try_lock_file(path: str) -> Optional[int]:
+    """Verrou exclusif non bloquant sur un fichier, relâché par le système si le processus s'arrête.
+
+    Contrairement à FileLock, le verrou est propre à un descripteur (flock, ou msvcrt.locking
+    sous Windows) : il indique qu'un processus vivant se sert du fichier, y compris le processus
+    courant. Retourne le descripteur à passer à unlock_file, ou None si le fichier est déjà verrouillé.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        elif msvcrt is not None:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def unlock_file(fd: int):
+    """Relâcher un verrou pris par try_lock_file."""
+    if fcntl is None and msvcrt is not None:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    os.close(fd)  # flock est relâché à la fermeture du descripteur
@@ -0,0 +1,90 @@
+"""
+Réserve de numéros d'un index d'opérateur, sous forme de bitmap d'attribution
+"""
+
+import base64
+import zlib
+from typing import Dict, Iterable, Iterator, Optional
+from consts import PHONE_NUMBER_LENGTH, POOL_SIZE
+
+
+class NumberPool:
+    """Numéros index + suffixe (0 à size - 1) ; un bit à 1 indique un numéro attribué."""
+
+    def __init__(self, index: str, size: int = POOL_SIZE, bitmap: Optional[bytearray] = None):
+        self.index = index
+        self.size = size
+        self.bitmap = bitmap if bitmap is not None else bytearray((size + 7) // 8)
+        self.suffix_length = PHONE_NUMBER_LENGTH - len(index)
+
+    @classmethod
+    def from_dict(cls, index: str, data: Dict) -> "NumberPool":
+        """Reconstruit une réserve à partir de sa forme enregistrée dans le fichier des opérateurs."""
+        bitmap = bytearray(zlib.decompress(base64.b64decode(data["bitmap"])))
+        return cls(index, data["size"], bitmap)
+
+    @classmethod
+    def from_available(cls, index: str, numbers: Iterable[str], size: int = POOL_SIZE) -> "NumberPool":
+        """Construit une réserve à partir d'une liste de numéros disponibles (ancien format)."""
+        pool = cls(index, size, bytearray(b"\xff" * ((size + 7) // 8)))
+        for number in numbers:
+            pool.release(number)
+        return pool
+
+    def to_dict(self) -> Dict:
+        """Forme compacte : le bitmap compressé ne grossit presque pas pour une réserve peu entamée."""
+        return {
+            "size": self.size,
+            "bitmap": base64.b64encode(zlib.compress(bytes(self.bitmap))).decode("ascii"),
+        }
+
+    def number(self, position: int) -> str:
+        return f"{self.index}{str(position).zfill(self.suffix_length)}"
+
+    def position(self, phone: str) -> Optional[int]:
+        """Position d'un numéro dans la réserve, ou None s'il n'en fait pas partie."""
+        if len(phone) != PHONE_NUMBER_LENGTH or not phone.startswith(self.index):
+            return None
+        suffix = phone[len(self.index):]
+        if not suffix.isdigit() or int(suffix) >= self.size:
+            return None
+        return int(suffix)
+
+    def _is_set(self, position: int) -> bool:
+        return bool(self.bitmap[position >> 3] & (1 << (position & 7)))
+
+    def is_available(self, phone: str) -> bool:
+        """Vérifie en temps constant qu'un numéro fait partie de la réserve et n'est pas attribué."""
+        position = self.position(phone)
+        return position is not None and not self._is_set(position)
+
+    def allocate(self, phone: str) -> bool:
+        """Marque un numéro comme attribué. Retourne False s'il n'est pas disponible."""
+        if not self.is_available(phone):
+            return False
+        position = self.position(phone)
+        self.bitmap[position >> 3] |= 1 << (position & 7)
+        return True
+
+    def release(self, phone: str):
+        """Remet un numéro à disposition."""
+        position = self.position(phone)
+        if position is not None:
+            self.bitmap[position >> 3] &= ~(1 << (position & 7)) & 0xFF
+
+    def iter_available(self) -> Iterator[str]:
+        """Parcourt les numéros disponibles dans l'ordre."""
+        for byte_index, byte in enumerate(self.bitmap):
+            if byte == 0xFF:
+                continue  # 8 numéros attribués : octet sauté d'un coup
+            for bit in range(8):
+                position = byte_index * 8 + bit
+                if position >= self.size:
+                    return
+                if not byte & (1 << bit):
+                    yield self.number(position)
+
+    def available_count(self) -> int:
+        """Nombre de numéros encore disponibles."""
+        bits = int.from_bytes(self.bitmap, "little") & ((1 << self.size) - 1)
+        return self.size - bin(bits).count("1")
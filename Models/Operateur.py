@@ -3,168 +3,238 @@ Modèle pour la gestion des opérateurs
 """
 
 import os
-import json
-from typing import List, Dict
+from datetime import date
+from typing import Callable, List, Dict, Optional, Tuple
+from consts import OPERATOR_UPDATE_RETRIES
+from Models.Backend import get_backend
 from Models.Client import ClientModel
+from Models.NumberPool import NumberPool
+from Models.Cache import model_cache, thaw
+from Models.Routing import get_router
+from Models.Sales import new_sale, period_buckets
 from Views.Functions import print_message
 
 
 class OperateurModel:
     def __init__(self):
-        self.operators_file = "BD/operators.txt"
-        self.cashier_file = "BD/caisses.txt"
-
         if not os.path.exists("BD"):
             os.makedirs("BD")
+        self.backend = get_backend()
 
     def create_operator(self, name: str, index: str) -> bool:
         """Créer un opérateur avec un nom et un index."""
         operator = {
             "name": name,
             "indexes": [index],
-            "numbers": self._generate_numbers(index),
+            "pools": {index: NumberPool(index).to_dict()},
             "rates": {
                 "same_operator": 1,  # 1F par seconde
                 "different_operator": 2
             }
         }
 
-        operators = self.get_all_operators()
-        operators.append(operator)
-        self._save_operators(operators)
+        # Refusé si une autre session a créé entre-temps le même nom ou un index qui chevauche
+        if not self.backend.insert_operator(operator):
+            return False
+        model_cache.invalidate("operators")
         return True
 
-    def _generate_numbers(self, index: str) -> List[str]:
-        """Génère 100 numéros pour un index donné."""
-        return [f"{index}{str(i).zfill(7)}" for i in range(100)]
-
     def get_all_operators(self) -> List[Dict]:
-        """Récupère la liste de tous les opérateurs."""
-        if not os.path.exists(self.operators_file):
-            return []
-        with open(self.operators_file, "r") as f:
-            return json.load(f)
+        """Récupère la liste de tous les opérateurs (copie modifiable)."""
+        return thaw(self.get_operators_snapshot())
+
+    def get_operators_snapshot(self) -> Tuple:
+        """Liste des opérateurs en lecture seule, partagée par tout le processus via le cache."""
+        return model_cache.get("operators", ("list", id(self.backend)), self.backend.operators_signature(),
+                               self._load_operators)
+
+    def _load_operators(self) -> List[Dict]:
+        """Charge les opérateurs depuis le stockage."""
+        operators = self.backend.load_operators()
+        if any("numbers" in operator for operator in operators):
+            # Ancien format : liste des numéros disponibles convertie en réserves compactes
+            for operator in operators:
+                if "numbers" in operator:
+                    numbers = operator.pop("numbers")
+                    operator["pools"] = {
+                        index: NumberPool.from_available(index, (n for n in numbers if n.startswith(index))).to_dict()
+                        for index in operator["indexes"]
+                    }
+            self._save_operators(operators)
+        return operators
+
+    def get_pool(self, operator: Dict, index: str) -> NumberPool:
+        """Réserve de numéros d'un index de l'opérateur."""
+        return NumberPool.from_dict(index, operator["pools"][index])
+
+    def _pool_for_phone(self, operator: Dict, phone: str) -> Optional[NumberPool]:
+        """Réserve de l'opérateur dont l'index préfixe le numéro."""
+        for index in operator["indexes"]:
+            if phone.startswith(index):
+                return self.get_pool(operator, index)
+        return None
+
+    def available_numbers(self, operator: Dict, index: str) -> List[str]:
+        """Numéros encore disponibles pour un index de l'opérateur."""
+        return list(self.get_pool(operator, index).iter_available())
 
     def _save_operators(self, operators: List[Dict]):
-        """Sauvegarde la liste des opérateurs dans le fichier."""
-        with open(self.operators_file, "w") as f:
-            json.dump(operators, f, indent=2)
+        """Sauvegarde la liste des opérateurs."""
+        self.backend.save_operators(operators)
+        model_cache.invalidate("operators")
+
+    def _find_operator(self, name: str) -> Optional[Dict]:
+        """Copie modifiable d'un opérateur (nom insensible à la casse), avec sa version."""
+        for operator in self.get_operators_snapshot():
+            if operator["name"].lower() == name.lower():
+                return thaw(operator)
+        return None
+
+    def _update_operator(self, name: str, mutate: Callable[[Dict], bool]) -> bool:
+        """Modifier un opérateur par compare-and-swap sur sa version.
+
+        mutate modifie la copie fournie et retourne False pour abandonner. En cas de
+        conflit avec une autre session, l'opérateur est relu et la modification rejouée.
+        """
+        for _ in range(OPERATOR_UPDATE_RETRIES):
+            operator = self._find_operator(name)
+            if operator is None:
+                return False
+            old_name, version = operator["name"], operator.get("version", 0)
+            if mutate(operator) is False:
+                return False
+            swapped = self.backend.replace_operator(old_name, operator, version)
+            model_cache.invalidate("operators")
+            if swapped:
+                return True
+        print_message(f"L'opérateur {name} est modifié par une autre session, réessayez.", "ERROR")
+        return False
 
     def rename_operator(self, old_name: str, new_name: str) -> bool:
         """Renommer un opérateur."""
-        operators = self.get_all_operators()
-        for operator in operators:
-            if operator["name"] == old_name:
-                operator["name"] = new_name
-                self._save_operators(operators)
-                return True
-        return False
+        def rename(operator):
+            operator["name"] = new_name
+        return self._update_operator(old_name, rename)
 
     def add_index_to_operator(self, operator_name: str, index: str) -> bool:
-        operators = self.get_all_operators()
-        for operator in operators:
-            if operator["name"].lower() == operator_name.lower():
-                operator["indexes"].append(index)
-                operator["numbers"].extend(self._generate_numbers(index))
-                self._save_operators(operators)
-                return True
-        return False
+        def add_index(operator):
+            if index in operator["indexes"] or not self.is_index_unique(index):
+                return False
+            operator["indexes"].append(index)
+            operator["pools"][index] = NumberPool(index).to_dict()
+        return self._update_operator(operator_name, add_index)
+
+    def remove_index_from_operator(self, name: str, index: str, delete_operator: bool = False) -> bool:
+        """Supprimer un index d'un opérateur si possible.
+
+        Le dernier index n'est supprimé, avec l'opérateur, que si delete_operator est vrai
+        (confirmation demandée par le contrôleur).
+        """
+        operator = self._find_operator(name)
+        if operator is None or operator["name"] != name:
+            return False
+        if index not in operator["indexes"]:
+            print_message(f"L'index {index} n'existe pas pour l'opérateur {name}.", "INFO")
+            return False
+        if not self._can_remove_index(operator, index):
+            print_message(f"Impossible de supprimer l'index {index} car il est encore utilisé par des clients.", "INFO")
+            return False
+        if len(operator["indexes"]) == 1:
+            if not delete_operator:
+                print_message("Suppression annulée.", "INFO")
+                return False
 
-    def remove_index_from_operator(self, name: str, index: str) -> bool:
-        """Supprimer un index d'un opérateur si possible."""
-        operators = self.get_all_operators()
-        for operator in operators:
-            if operator["name"] == name:
-                if index in operator["indexes"]:
-                    if not self._can_remove_index(operator, index):
-                        print_message(f"Impossible de supprimer l'index {index} car il est encore utilisé par des clients.", "INFO")
-                        return False
-                    if len(operator["indexes"]) == 1:
-                        print_message(f"L'opérateur {name} n'a qu'un seul index {index}.\nSupprimer cet index entraînera également la suppression de l'opérateur.", "INFO")
-                        r_confirm = input("Entrez 'oui' pour confirmer la suppression : ").strip().lower()
-                        if r_confirm != "oui" :
-                            print("Suppression annulée.")
-                            return False
-
-                        operators = [op for op in operators if op["name"] != name]
-                        self._save_operators(operators)
-                        return True
-
-                    operator["indexes"].remove(index)
-                    operator["numbers"] = [num for num in operator["numbers"] if not num.startswith(index)]
-                    self._save_operators(operators)
-                    return True
-                print_message(f"L'index {index} n'existe pas pour l'opérateur {name}.", "INFO")
+            # Refusé si l'opérateur a été modifié pendant la confirmation
+            deleted = self.backend.delete_operator(name, operator.get("version", 0))
+            model_cache.invalidate("operators")
+            if not deleted:
+                print_message(f"L'opérateur {name} a été modifié par une autre session, réessayez.", "ERROR")
+            return deleted
+
+        def remove_index(operator):
+            if index not in operator["indexes"] or len(operator["indexes"]) == 1:
                 return False
-        return False
+            operator["indexes"].remove(index)
+            del operator["pools"][index]
+        return self._update_operator(name, remove_index)
 
     def _can_remove_index(self, operator, index: str) -> bool:
         """Vérifie si un index peut être supprimé en fonction des clients existants."""
-        client_model = ClientModel()
-
-        # Vérifiez si des clients utilisent cet index
-        for client in client_model.get_all_clients():
-            if client["phone"].startswith(index):
-                return False  # L'index est encore utilisé par un client
-        return True
+        # Parcours arrêté au premier client qui utilise encore cet index
+        return ClientModel().find_client_with_prefix(index) is None
 
     def is_index_unique(self, index: str) -> bool:
         """Vérifie si l'index est unique parmi tous les opérateurs."""
-        operators = self.get_all_operators()
-        return not any(index in operator["indexes"] for operator in operators)
+        # Un index ne doit pas non plus être le préfixe d'un autre (routage ambigu)
+        return get_router(self.backend).conflict(index) is None
 
     def _save_cashier(self, cashier_data: Dict):
-        """Sauvegarde les informations de caisse dans un fichier."""
-        with open(self.cashier_file, "w") as f:
-            json.dump(cashier_data, f, indent=2)
+        """Sauvegarde les informations de caisse."""
+        self.backend.save_cashier(cashier_data)
 
     def _load_cashier(self) -> Dict:
-        """Charge les informations de caisse du gestionnaire."""
-        if not os.path.exists(self.cashier_file):
-            return {}
+        """Charge les cumuls de caisse antérieurs au journal des ventes."""
+        return self.backend.load_cashier()
 
-        with open(self.cashier_file, "r") as f:
-            return json.load(f)
+    def get_legacy_cashier(self) -> Dict[str, Dict[str, float]]:
+        """Cumuls de caisse antérieurs au journal des ventes : gestionnaire -> opérateur -> montant."""
+        return self._load_cashier()
 
-    def record_credit_sale(self, operator_name: str, amount: float, manager_name: str):
+    def record_credit_sale(self, operator_name: str, amount: float, manager_name: str, phone: str = ""):
         """Vendre du crédit à un client et enregistrer la vente dans la caisse du gestionnaire."""
-        # Enregistrer la vente dans la caisse du gestionnaire
-        cashier_data = self._load_cashier()
-
-        if manager_name not in cashier_data:
-            cashier_data[manager_name] = {}
-
-        # Ajouter ou mettre à jour les informations de caisse pour l'opérateur
-        if operator_name not in cashier_data[manager_name]:
-            cashier_data[manager_name][operator_name] = {"daily": 0, "monthly": 0, "yearly": 0}
+        # Ajout au journal des ventes (sans écraser celles des autres sessions)
+        self.backend.record_sales([new_sale(manager_name, operator_name, amount, phone)])
+        print_message(f"Crédit de {amount}F vendu. Vente enregistrée dans la caisse du gestionnaire {manager_name} pour l'opérateur {operator_name}.", "SUCCESS")
 
-        # Ajouter la vente au jour, mois et année pour cet opérateur
-        cashier_data[manager_name][operator_name]["daily"] += amount
-        cashier_data[manager_name][operator_name]["monthly"] += amount
-        cashier_data[manager_name][operator_name]["yearly"] += amount
+    def get_sales_totals(self, start: date, end: date, manager_name: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+        """Ventes du [start, end] (dates incluses) : gestionnaire -> opérateur -> montant."""
+        return self.backend.sales_totals(period_buckets(start, end), manager_name)
 
-        self._save_cashier(cashier_data)
-        print_message(f"Crédit de {amount}F vendu. Vente enregistrée dans la caisse du gestionnaire {manager_name} pour l'opérateur {operator_name}.", "SUCCESS")
+    def get_bucket_totals(self, bucket: str, manager_name: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+        """Ventes d'une année ("2026"), d'un mois ("2026-10") ou d'un jour ("2026-10-18")."""
+        return self.backend.sales_totals([bucket], manager_name)
 
 
     def is_number_available_for_operator(self, phone: str, operator_name: str) -> bool:
         """Vérifie si un numéro est disponible pour un opérateur donné."""
-        operators = self.get_all_operators()
+        operators = self.get_operators_snapshot()
         for operator in operators:
             if operator["name"] == operator_name:
-                if phone in operator["numbers"]:
-                    return True
-                else:
-                    return False
+                pool = self._pool_for_phone(operator, phone)
+                return pool is not None and pool.is_available(phone)
         return False
 
     def assign_number_to_client(self, phone: str, operator_name: str, pin: str) -> bool:
-        operators = self.get_all_operators()
-        for operator in operators:
-            if operator["name"] == operator_name and phone in operator["numbers"]:
-                operator["numbers"].remove(phone)
-                client_model = ClientModel()
-                client_model.create_client(phone, pin)
-                self._save_operators(operators)
-                return True
-        return False
+        def allocate(operator):
+            pool = self._pool_for_phone(operator, phone) if operator["name"] == operator_name else None
+            if pool is None or not pool.allocate(phone):
+                return False  # Numéro indisponible, éventuellement vendu par une autre session
+            operator["pools"][pool.index] = pool.to_dict()
+
+        def release(operator):
+            pool = self._pool_for_phone(operator, phone)
+            if pool is None:
+                return False
+            pool.release(phone)
+            operator["pools"][pool.index] = pool.to_dict()
+
+        # Le numéro est d'abord réservé dans la réserve de l'opérateur, puis le client créé
+        if not self._update_operator(operator_name, allocate):
+            return False
+        client_model = ClientModel()
+        if not client_model.create_client(phone, pin):
+            self._update_operator(operator_name, release)
+            return False
+        return True
+
+    def apply_provisioning(self, clients: List[Dict], credits: List[Tuple[str, float]],
+                           operators: Optional[List[Dict]], credit_sales: List[Dict]) -> bool:
+        """Enregistrer un lot validé de ventes (numéros et crédit) en une seule écriture.
+
+        credit_sales : ventes de crédit (voir Models.Sales.new_sale) à ajouter au journal.
+        Retourne False si un opérateur ou un numéro a été modifié par une autre session.
+        """
+        applied = self.backend.apply_batch(clients, credits, operators, credit_sales)
+        model_cache.invalidate("clients")
+        model_cache.invalidate("operators")
+        return applied
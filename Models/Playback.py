@@ -0,0 +1,154 @@
+"""
+Lecture des messages vocaux : sortie audio ouverte une fois, alimentée par callback
+"""
+
+import atexit
+import threading
+from typing import Optional, Tuple
+import numpy as np
+import pyaudio
+from consts import PLAYBACK_BUFFER_FRAMES
+from Models.Codec import RecordingReader, decode
+
+
+class PlaybackEngine:
+    """Lecteur d'enregistrements partagé par toutes les écoutes d'une session.
+
+    PyAudio et le flux de sortie restent ouverts d'une écoute à l'autre : le flux
+    n'est rouvert que si la fréquence ou le nombre de canaux change. Les données
+    de l'enregistrement sont projetées en mémoire (RecordingReader.samples()) et
+    le callback de PyAudio décode à la demande des tampons de buffer_frames trames.
+    La position peut être changée pendant la lecture (seek, skip) et stop() coupe
+    le son au tampon suivant.
+    """
+
+    def __init__(self, buffer_frames: int = PLAYBACK_BUFFER_FRAMES):
+        self.buffer_frames = buffer_frames
+        self._audio: Optional[pyaudio.PyAudio] = None
+        self._stream = None
+        self._stream_format: Optional[Tuple[int, int]] = None
+        self._reader: Optional[RecordingReader] = None
+        self._data: Optional[np.ndarray] = None
+        self._codec = "pcm"
+        self._channels = 1
+        self.samplerate = 0
+        self.frames = 0
+        self._position = 0
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+        self._finished.set()
+
+    def load(self, reader: RecordingReader):
+        """Préparer la lecture d'un enregistrement (reader est fermé à la fin de la lecture suivante ou de la session)."""
+        self.stop()
+        self._release()
+        data = reader.samples()
+        with self._lock:
+            self._reader = reader
+            self._data = data
+            self._codec = reader.codec
+            self._channels = reader.channels
+            self.samplerate = reader.samplerate
+            self.frames = len(data) // reader.channels
+            self._position = 0
+        self._open_stream(reader.samplerate, reader.channels)
+
+    def _open_stream(self, samplerate: int, channels: int):
+        if self._audio is None:
+            self._audio = pyaudio.PyAudio()
+            atexit.register(self.close)
+        if self._stream is not None and self._stream_format == (samplerate, channels):
+            return
+        if self._stream is not None:
+            self._stream.close()
+        self._stream = self._audio.open(format=pyaudio.paInt16, channels=channels, rate=samplerate,
+                                        output=True, frames_per_buffer=self.buffer_frames,
+                                        stream_callback=self._callback, start=False)
+        self._stream_format = (samplerate, channels)
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        with self._lock:
+            data = self._data
+            start = self._position if data is not None else self.frames
+            end = min(start + frame_count, self.frames)
+            chunk = data[start * self._channels:end * self._channels] if data is not None else None
+            self._position = end
+        out = np.zeros(frame_count * self._channels, dtype="<i2")
+        if chunk is not None and len(chunk):
+            out[:len(chunk)] = decode(chunk, self._codec) if self._codec != "pcm" else chunk
+        if end - start < frame_count:
+            self._finished.set()
+            return out.tobytes(), pyaudio.paComplete
+        return out.tobytes(), pyaudio.paContinue
+
+    def play(self):
+        """Lire depuis la position courante, sans attendre la fin."""
+        if self._stream is None:
+            return
+        self._finished.clear()
+        if self._stream.is_active():
+            return
+        if not self._stream.is_stopped():
+            # Flux terminé par le callback (paComplete) : il doit être arrêté avant de repartir
+            self._stream.stop_stream()
+        self._stream.start_stream()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Attendre la fin de la lecture. Retourne False si elle n'est pas finie au bout de timeout secondes."""
+        return self._finished.wait(timeout)
+
+    @property
+    def position(self) -> float:
+        """Position de lecture (secondes)."""
+        return self._position / self.samplerate if self.samplerate else 0
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.samplerate if self.samplerate else 0
+
+    def seek(self, seconds: float):
+        """Aller à une position (secondes) de l'enregistrement."""
+        with self._lock:
+            self._position = min(max(int(seconds * self.samplerate), 0), self.frames)
+
+    def skip(self, seconds: float):
+        """Avancer (ou reculer si seconds est négatif) dans l'enregistrement."""
+        self.seek(self.position + seconds)
+
+    def stop(self):
+        """Arrêter la lecture : le callback termine le flux au tampon suivant."""
+        with self._lock:
+            self._position = self.frames
+        if self._stream is None or not self._stream.is_active():
+            self._finished.set()
+
+    def _release(self):
+        with self._lock:
+            self._data = None
+            reader, self._reader = self._reader, None
+        if reader is not None:
+            reader.close()
+
+    def close(self):
+        self.stop()
+        self.wait(1)
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+        self._release()
+        if self._audio is not None:
+            self._audio.terminate()
+            self._audio = None
+
+
+_engine: Optional[PlaybackEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_playback_engine() -> PlaybackEngine:
+    """Lecteur partagé du processus."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = PlaybackEngine()
+        return _engine
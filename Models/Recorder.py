@@ -0,0 +1,79 @@
+"""
+Enregistrement d'un appel écrit sur le disque au fil de la conversation
+"""
+
+import queue
+import threading
+from typing import Optional
+import numpy as np
+from consts import RECORDING_QUEUE_BLOCKS
+from Models.Codec import RecordingWriter
+from Models.Recordings import write_metadata
+
+
+class CallRecorder:
+    """Enregistrement d'un appel rempli pendant la conversation par un thread d'écriture.
+
+    Le callback audio ne fait que déposer une copie de chaque bloc dans une file
+    bornée : la mémoire utilisée ne dépend pas de la durée de l'appel. Si le disque
+    prend du retard au point de remplir la file, les blocs suivants sont abandonnés
+    (et comptés) plutôt que de bloquer le callback. Le format du fichier est celui
+    de RecordingWriter (consts.RECORDING_CODEC) ; ses métadonnées (durée, temps de
+    parole, niveau) sont écrites à côté à la fermeture.
+    """
+
+    _END = None
+
+    def __init__(self, path: str, samplerate: int, queue_blocks: int = RECORDING_QUEUE_BLOCKS):
+        self.path = path
+        self.samplerate = int(samplerate)
+        self.dropped_frames = 0
+        self._blocks: "queue.Queue[Optional[np.ndarray]]" = queue.Queue(maxsize=queue_blocks)
+        self._file: Optional[RecordingWriter] = None
+        self._error: Optional[BaseException] = None
+        self._writer: Optional[threading.Thread] = None
+
+    @property
+    def frames(self) -> int:
+        """Trames écrites dans le fichier (à sa fréquence, pas à celle du périphérique)."""
+        return self._file.frames if self._file is not None else 0
+
+    def start(self) -> "CallRecorder":
+        self._file = RecordingWriter(self.path, self.samplerate)
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+        return self
+
+    def write(self, block: np.ndarray):
+        """Confier un bloc au thread d'écriture (depuis le callback audio, sans attente)."""
+        try:
+            self._blocks.put_nowait(block.copy())
+        except queue.Full:
+            self.dropped_frames += len(block)
+
+    def close(self) -> int:
+        """Écrire les blocs en attente et finaliser l'en-tête du fichier. Retourne le nombre de trames écrites."""
+        if self._writer is not None:
+            self._blocks.put(self._END)
+            self._writer.join()
+            self._writer = None
+        if self._file is not None:
+            self._file.close()
+        if self._error is not None:
+            raise self._error
+        if self._file is not None:
+            write_metadata(self.path, self._file.metadata())
+        return self.frames
+
+    def _write_loop(self):
+        while True:
+            block = self._blocks.get()
+            if block is self._END:
+                return
+            if self._error is not None:
+                continue
+            try:
+                self._file.write(block)
+            except Exception as e:
+                # Erreur d'écriture (disque plein...) : remontée par close(), la file continue d'être vidée
+                self._error = e
@@ -0,0 +1,312 @@
+"""
+Stockage des enregistrements d'appels : index, quota disque, archivage et suppression
+"""
+
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import time
+import zipfile
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from consts import DATA_DIR, RECORDINGS_ARCHIVE_AFTER, RECORDINGS_QUOTA
+from Models.Backend import StorageBackend, get_backend
+from Models.Codec import RecordingReader, RecordingWriter
+from Models.Locks import file_lock
+
+
+RECORDINGS_DIR = os.path.join(DATA_DIR, "calls")
+
+# Nom donné par make_call : call_<appelant>_<appelé>_<horodatage>.wav
+_RECORDING_NAME = re.compile(r"^call_(\d+)_(\d+)_(\d+)\.wav$")
+
+
+def metadata_path(audio_file: str) -> str:
+    """Fichier de métadonnées (durée, temps de parole, niveau) posé à côté d'un enregistrement."""
+    return os.path.splitext(audio_file)[0] + ".json"
+
+
+def write_metadata(audio_file: str, metadata: Dict):
+    path = metadata_path(audio_file)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(metadata, f)
+    os.replace(tmp_path, path)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    name TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    caller TEXT NOT NULL,
+    callee TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL,
+    state TEXT NOT NULL,
+    bundle TEXT
+);
+CREATE INDEX IF NOT EXISTS recordings_by_access ON recordings (state, accessed);
+CREATE INDEX IF NOT EXISTS recordings_by_bundle ON recordings (bundle);
+CREATE TABLE IF NOT EXISTS bundles (
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL
+);
+"""
+
+
+class RecordingStore:
+    """Index des enregistrements de BD/calls et politique de rétention.
+
+    Un enregistrement est "disk" (fichier WAV dans BD/calls), "archived" (membre
+    d'une archive zip mensuelle de BD/calls/archives) ou "deleted". Il reste désigné
+    par le chemin noté dans l'historique : l'index retrouve les enregistrements
+    archivés, et les suppressions sont reportées dans l'historique des deux abonnés.
+
+    Les enregistrements non écoutés depuis archive_after jours sont archivés ; au-delà
+    du quota (fichiers et archives), les moins récemment écoutés sont supprimés.
+    """
+
+    def __init__(self, directory: str = RECORDINGS_DIR, backend: StorageBackend = None,
+                 quota: int = RECORDINGS_QUOTA, archive_after: float = RECORDINGS_ARCHIVE_AFTER):
+        self.directory = directory
+        self.archive_dir = os.path.join(directory, "archives")
+        self.index_path = os.path.join(directory, "recordings.db")
+        self.backend = backend or get_backend()
+        self.quota = quota
+        self.archive_after = archive_after
+        self._lock = file_lock(os.path.join(directory, "recordings.lock"))
+
+    @contextmanager
+    def _index(self) -> Iterator[sqlite3.Connection]:
+        os.makedirs(self.directory, exist_ok=True)
+        conn = sqlite3.connect(self.index_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                conn.executescript(_SCHEMA)
+                yield conn
+        finally:
+            conn.close()
+
+    # Indexation
+
+    def register(self, path: str, caller: str, callee: str, created: Optional[float] = None):
+        """Indexer un enregistrement qui vient d'être écrit, puis faire respecter le quota si besoin."""
+        created = time.time() if created is None else created
+        with self._index() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO recordings (name, path, caller, callee, size, created, accessed, state, bundle) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, 'disk', NULL)",
+                (os.path.basename(path), path, caller, callee, os.path.getsize(path), created, created),
+            )
+            over_quota = self._usage(conn) > self.quota
+        if over_quota:
+            self.enforce()
+
+    def sync(self) -> int:
+        """Indexer les enregistrements de BD/calls qui ne le sont pas encore (antérieurs à l'index)."""
+        added = 0
+        with self._lock, self._index() as conn:
+            known = {row["name"] for row in conn.execute("SELECT name FROM recordings")}
+            for name in os.listdir(self.directory):
+                match = _RECORDING_NAME.match(name)
+                if not match or name in known:
+                    continue
+                path = os.path.join(self.directory, name)
+                stat = os.stat(path)
+                conn.execute(
+                    "INSERT INTO recordings (name, path, caller, callee, size, created, accessed, state, bundle) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, 'disk', NULL)",
+                    (name, path, match.group(1), match.group(2), stat.st_size, float(match.group(3)), stat.st_mtime),
+                )
+                added += 1
+        return added
+
+    @staticmethod
+    def _usage(conn: sqlite3.Connection) -> int:
+        disk = conn.execute("SELECT COALESCE(SUM(size), 0) FROM recordings WHERE state = 'disk'").fetchone()[0]
+        bundles = conn.execute("SELECT COALESCE(SUM(size), 0) FROM bundles").fetchone()[0]
+        return disk + bundles
+
+    def usage(self) -> Dict[str, int]:
+        """Nombre d'enregistrements par état et place occupée (octets)."""
+        with self._index() as conn:
+            counts = dict(conn.execute("SELECT state, COUNT(*) FROM recordings GROUP BY state").fetchall())
+            return {
+                "disk": counts.get("disk", 0),
+                "archived": counts.get("archived", 0),
+                "deleted": counts.get("deleted", 0),
+                "disk_bytes": conn.execute("SELECT COALESCE(SUM(size), 0) FROM recordings WHERE state = 'disk'").fetchone()[0],
+                "archive_bytes": conn.execute("SELECT COALESCE(SUM(size), 0) FROM bundles").fetchone()[0],
+            }
+
+    # Lecture
+
+    def open(self, audio_file: str) -> RecordingReader:
+        """Ouvrir un enregistrement par le chemin noté dans l'historique, qu'il soit sur disque ou archivé.
+
+        Lève FileNotFoundError si l'enregistrement a été supprimé ou n'existe pas.
+        """
+        name = os.path.basename(audio_file)
+        with self._lock, self._index() as conn:
+            row = conn.execute("SELECT state, bundle FROM recordings WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                # Enregistrement non indexé : lu directement
+                return RecordingReader(audio_file)
+            if row["state"] == "deleted":
+                raise FileNotFoundError(audio_file)
+            conn.execute("UPDATE recordings SET accessed = ? WHERE name = ?", (time.time(), name))
+            if row["state"] == "disk":
+                return RecordingReader(os.path.join(self.directory, name))
+            with zipfile.ZipFile(os.path.join(self.archive_dir, row["bundle"])) as bundle:
+                # Le membre garde l'archive ouverte jusqu'à sa fermeture
+                return RecordingReader(bundle.open(name))
+
+    def metadata(self, audio_file: str) -> Optional[Dict]:
+        """Métadonnées d'un enregistrement sur disque ou archivé, sans lire l'audio (None si absentes)."""
+        name = os.path.basename(audio_file)
+        with self._index() as conn:
+            row = conn.execute("SELECT state, bundle FROM recordings WHERE name = ?", (name,)).fetchone()
+        try:
+            if row is None or row["state"] == "disk":
+                directory = self.directory if row is not None else os.path.dirname(audio_file)
+                with open(metadata_path(os.path.join(directory, name)), "r") as f:
+                    return json.load(f)
+            if row["state"] == "archived":
+                with zipfile.ZipFile(os.path.join(self.archive_dir, row["bundle"])) as bundle:
+                    return json.loads(bundle.read(metadata_path(name)))
+        except (OSError, KeyError, ValueError):
+            pass
+        return None
+
+    # Rétention
+
+    def enforce(self, now: Optional[float] = None) -> Dict[str, int]:
+        """Archiver les enregistrements anciens puis supprimer les moins récemment écoutés au-delà du quota."""
+        now = time.time() if now is None else now
+        with self._lock, self._index() as conn:
+            archived, deleted = self._archive_old(conn, now - self.archive_after * 86400)
+            deleted += self._evict(conn)
+        forgotten = self._forget(deleted)
+        return {"archived": archived, "deleted": len(deleted), "history": forgotten}
+
+    def _archive_old(self, conn: sqlite3.Connection, before: float) -> Tuple[int, List[sqlite3.Row]]:
+        """Archiver les enregistrements non écoutés depuis before. Retourne (archivés, fichiers disparus)."""
+        rows = conn.execute(
+            "SELECT name, path, caller, callee, created FROM recordings WHERE state = 'disk' AND accessed < ? "
+            "ORDER BY created", (before,)
+        ).fetchall()
+        by_bundle = defaultdict(list)
+        missing = []
+        for row in rows:
+            if os.path.exists(os.path.join(self.directory, row["name"])):
+                by_bundle[f"{datetime.fromtimestamp(row['created']):%Y-%m}.zip"].append(row["name"])
+            else:
+                missing.append(row)
+        for row in missing:
+            conn.execute("UPDATE recordings SET state = 'deleted' WHERE name = ?", (row["name"],))
+        for bundle_name, names in by_bundle.items():
+            self._archive(conn, bundle_name, names)
+        return len(rows) - len(missing), missing
+
+    def _archive(self, conn: sqlite3.Connection, bundle_name: str, names: List[str]):
+        """Ajouter des enregistrements à une archive, mettre l'index à jour, puis supprimer les fichiers."""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        bundle_path = os.path.join(self.archive_dir, bundle_name)
+        with zipfile.ZipFile(bundle_path, "a", compression=zipfile.ZIP_DEFLATED) as bundle:
+            members = set(bundle.namelist())
+            for name in names:
+                # Nom déjà présent : archivage interrompu avant la mise à jour de l'index
+                if name not in members:
+                    self._add_to_bundle(bundle, os.path.join(self.directory, name), name)
+                    sidecar = metadata_path(os.path.join(self.directory, name))
+                    if os.path.exists(sidecar):
+                        bundle.write(sidecar, metadata_path(name))
+                conn.execute("UPDATE recordings SET state = 'archived', bundle = ?, size = ? WHERE name = ?",
+                             (bundle_name, bundle.getinfo(name).compress_size, name))
+        conn.execute("INSERT OR REPLACE INTO bundles (name, size) VALUES (?, ?)",
+                     (bundle_name, os.path.getsize(bundle_path)))
+        conn.commit()
+        for name in names:
+            os.remove(os.path.join(self.directory, name))
+            self._remove(metadata_path(os.path.join(self.directory, name)))
+
+    @staticmethod
+    def _add_to_bundle(bundle: zipfile.ZipFile, path: str, name: str):
+        """Les enregistrements en PCM 16 bits (antérieurs au format compressé) sont convertis
+        au format d'enregistrement actuel avant d'être archivés. La conversion est avec perte :
+        rééchantillonnage à RECORDING_SAMPLERATE et, selon RECORDING_CODEC, quantification G.711
+        sur 8 bits ; l'original n'est pas gardé."""
+        with RecordingReader(path) as reader:
+            if reader.codec != "pcm":
+                bundle.write(path, name)
+                return
+            fd, tmp_path = tempfile.mkstemp(suffix=".wav", dir=os.path.dirname(path))
+            os.close(fd)
+            try:
+                # Conversion avec perte (fréquence et codec actuels) ; les silences sont gardés
+                writer = RecordingWriter(tmp_path, reader.samplerate, trim=False)
+                data = reader.read(65536)
+                while data:
+                    writer.write(np.frombuffer(data, dtype="<i2").reshape(-1, reader.channels))
+                    data = reader.read(65536)
+                writer.close()
+                bundle.write(tmp_path, name)
+            finally:
+                os.remove(tmp_path)
+
+    def _evict(self, conn: sqlite3.Connection) -> List[sqlite3.Row]:
+        """Supprimer fichiers et archives, du moins récemment écouté au plus récent, jusqu'au quota."""
+        excess = self._usage(conn) - self.quota
+        if excess <= 0:
+            return []
+        # Une archive est supprimée d'un bloc : sa date d'écoute est celle de son membre le plus récent
+        candidates = conn.execute(
+            "SELECT name AS unit, 0 AS is_bundle, size, accessed FROM recordings WHERE state = 'disk' "
+            "UNION ALL "
+            "SELECT bundles.name, 1, bundles.size, MAX(recordings.accessed) FROM bundles "
+            "JOIN recordings ON recordings.bundle = bundles.name AND recordings.state = 'archived' "
+            "GROUP BY bundles.name "
+            "ORDER BY accessed"
+        ).fetchall()
+        deleted = []
+        for unit in candidates:
+            if excess <= 0:
+                break
+            if unit["is_bundle"]:
+                deleted += conn.execute("SELECT name, path, caller, callee FROM recordings "
+                                        "WHERE bundle = ? AND state = 'archived'", (unit["unit"],)).fetchall()
+                conn.execute("UPDATE recordings SET state = 'deleted' WHERE bundle = ?", (unit["unit"],))
+                conn.execute("DELETE FROM bundles WHERE name = ?", (unit["unit"],))
+                conn.commit()
+                self._remove(os.path.join(self.archive_dir, unit["unit"]))
+            else:
+                deleted += conn.execute("SELECT name, path, caller, callee FROM recordings WHERE name = ?",
+                                        (unit["unit"],)).fetchall()
+                conn.execute("UPDATE recordings SET state = 'deleted' WHERE name = ?", (unit["unit"],))
+                conn.commit()
+                self._remove(os.path.join(self.directory, unit["unit"]))
+                self._remove(metadata_path(os.path.join(self.directory, unit["unit"])))
+            excess -= unit["size"]
+        return deleted
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _forget(self, deleted: List[sqlite3.Row]) -> int:
+        """Reporter les suppressions dans l'historique de l'appelant et de l'appelé."""
+        by_phone = defaultdict(set)
+        for row in deleted:
+            by_phone[row["caller"]].add(row["path"])
+            by_phone[row["callee"]].add(row["path"])
+        return sum(self.backend.forget_recordings(phone, paths) for phone, paths in by_phone.items())
@@ -0,0 +1,44 @@
+"""
+Table de routage des numéros vers leur opérateur, par préfixe
+"""
+
+from typing import Dict, List, Optional
+from Models.Backend import StorageBackend, get_backend
+from Models.Cache import model_cache
+
+
+class PrefixRouter:
+    """Associe chaque index (préfixe de longueur quelconque) à son opérateur."""
+
+    def __init__(self, operators: List[Dict]):
+        self.routes: Dict[str, Dict] = {}
+        for operator in operators:
+            for index in operator["indexes"]:
+                self.routes[index] = operator
+        # Longueurs de préfixe présentes, de la plus longue à la plus courte
+        self.lengths = sorted({len(index) for index in self.routes}, reverse=True)
+
+    def resolve(self, phone: str) -> Optional[Dict]:
+        """Opérateur du numéro (préfixe le plus long), ou None."""
+        for length in self.lengths:
+            operator = self.routes.get(phone[:length])
+            if operator is not None:
+                return operator
+        return None
+
+    def conflict(self, index: str) -> Optional[str]:
+        """Index existant qui chevauche le nouvel index (égal, préfixe de celui-ci ou l'inverse)."""
+        for length in self.lengths:
+            if length <= len(index) and index[:length] in self.routes:
+                return index[:length]
+        for existing in self.routes:
+            if existing.startswith(index):
+                return existing
+        return None
+
+
+def get_router(backend: StorageBackend = None) -> PrefixRouter:
+    """Table de routage du processus, reconstruite seulement si les opérateurs ont changé."""
+    backend = backend or get_backend()
+    return model_cache.get("operators", ("router", id(backend)), backend.operators_signature(),
+                           lambda: PrefixRouter(backend.load_operators()))
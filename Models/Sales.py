@@ -0,0 +1,262 @@
+"""
+Journal des ventes de crédit et cumuls pré-agrégés par jour, mois et année
+"""
+
+import copy
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from consts import SALES_FOLD_SIZE
+from Models.Locks import file_lock
+
+
+def bucket_keys(timestamp: float) -> List[str]:
+    """Compartiments d'une vente : année ("2026"), mois ("2026-10") et jour ("2026-10-18")."""
+    day = datetime.fromtimestamp(timestamp).date()
+    return [f"{day:%Y}", f"{day:%Y-%m}", f"{day:%Y-%m-%d}"]
+
+
+def _next_month(day: date) -> date:
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def period_buckets(start: date, end: date) -> List[str]:
+    """Découpe l'intervalle [start, end] en un minimum de compartiments (années, mois, jours entiers)."""
+    buckets = []
+    day = start
+    while day <= end:
+        if day.month == 1 and day.day == 1 and date(day.year, 12, 31) <= end:
+            buckets.append(f"{day:%Y}")
+            day = date(day.year + 1, 1, 1)
+        elif day.day == 1 and _next_month(day) - timedelta(days=1) <= end:
+            buckets.append(f"{day:%Y-%m}")
+            day = _next_month(day)
+        else:
+            buckets.append(f"{day:%Y-%m-%d}")
+            day += timedelta(days=1)
+    return buckets
+
+
+def new_sale(manager_name: str, operator_name: str, amount: float, phone: str = "",
+             timestamp: Optional[float] = None) -> Dict:
+    """Enregistrement d'une vente de crédit."""
+    return {
+        "timestamp": time.time() if timestamp is None else timestamp,
+        "manager": manager_name,
+        "operator": operator_name,
+        "phone": phone,
+        "amount": amount,
+    }
+
+
+class SalesJournal:
+    """Ventes en ajout seul (une ligne JSON par vente) et cumuls par compartiment.
+
+    Les cumuls sont rangés par période dans rollups/ : un petit fichier par année
+    ("2026.json") et par mois ("2026-10.json", avec les jours du mois), si bien qu'une
+    consultation ne lit que les périodes demandées. Une vente n'est écrite que dans le
+    journal ; les ventes de la fin du journal sont cumulées en mémoire et intégrées aux
+    fichiers de leurs périodes quand elles dépassent fold_size octets.
+
+    state.json mémorise la position du journal déjà intégrée, et chaque fichier de période
+    celle qu'il a lui-même intégrée : une intégration interrompue par un arrêt brutal est
+    reprise sans compter deux fois une vente.
+
+    Les ventes d'un lot (voir JsonBackend.apply_batch) portent le numéro de sa transaction
+    ("batch") : last_batch() indique le dernier lot enregistré.
+    """
+
+    def __init__(self, directory: str, fold_size: int = SALES_FOLD_SIZE):
+        self.directory = directory
+        self.journal_file = os.path.join(directory, "sales.jsonl")
+        self.rollups_dir = os.path.join(directory, "rollups")
+        self.state_file = os.path.join(self.rollups_dir, "state.json")
+        self.fold_size = fold_size
+        self._file_lock = file_lock(os.path.join(directory, "sales.lock"))
+        self._lock = threading.RLock()
+        # Fichiers de cumuls déjà lus : chemin -> (signature, contenu)
+        self._files: Dict[str, Tuple[tuple, Dict]] = {}
+        # Cumuls des ventes du journal pas encore intégrées aux fichiers des périodes
+        self._tail: Optional[Dict] = None
+
+    @contextmanager
+    def locked(self):
+        """Verrou du journal des ventes (threads et processus), réentrant."""
+        with self._lock, self._file_lock:
+            yield
+
+    @staticmethod
+    def _add(buckets: Dict, key: str, sale: Dict):
+        totals = buckets.setdefault(key, {}).setdefault(sale["manager"], {})
+        totals[sale["operator"]] = totals.get(sale["operator"], 0) + sale["amount"]
+
+    def _shard_file(self, bucket: str) -> str:
+        """Fichier de cumuls d'un compartiment : celui de l'année ou celui du mois (pour le mois et ses jours)."""
+        return os.path.join(self.rollups_dir, f"{bucket[:7]}.json")
+
+    def _read(self, path: str) -> Dict:
+        """Contenu d'un fichier de cumuls (relu seulement si un autre processus l'a remplacé)."""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._files.pop(path, None)
+            return {"applied": 0, "batch": 0} if path == self.state_file else {"applied": 0, "total": {}}
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        cached = self._files.get(path)
+        if cached is None or cached[0] != signature:
+            with open(path, "r") as f:
+                cached = (signature, json.load(f))
+            self._files[path] = cached
+        return cached[1]
+
+    def _write(self, path: str, data: Dict):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        stat = os.stat(path)
+        self._files[path] = ((stat.st_ino, stat.st_mtime_ns, stat.st_size), data)
+
+    def _refresh_tail(self) -> Dict:
+        """Cumuls à jour des ventes du journal postérieures à la position intégrée."""
+        applied = self._read(self.state_file)
+        tail = self._tail
+        if tail is None or tail["start"] != applied["applied"]:
+            # Première lecture, ou intégration faite entre-temps par un autre processus
+            tail = self._tail = {"start": applied["applied"], "end": applied["applied"],
+                                 "buckets": {}, "batch": applied["batch"]}
+        if os.path.exists(self.journal_file) and os.path.getsize(self.journal_file) > tail["end"]:
+            with open(self.journal_file, "rb") as f:
+                f.seek(tail["end"])
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # Ligne tronquée par un arrêt brutal, ou en cours d'écriture
+                    self._add_to_tail(tail, json.loads(line))
+                    tail["end"] += len(line)
+        return tail
+
+    def _add_to_tail(self, tail: Dict, sale: Dict):
+        for key in bucket_keys(sale["timestamp"]):
+            self._add(tail["buckets"], key, sale)
+        tail["batch"] = max(tail["batch"], sale.get("batch", 0))
+
+    def _fold(self):
+        """Intégrer la fin du journal aux fichiers des périodes concernées (verrou du journal pris)."""
+        os.makedirs(self.rollups_dir, exist_ok=True)
+        state = dict(self._read(self.state_file))
+        shards: Dict[str, Dict] = {}
+        end = state["applied"]
+        with open(self.journal_file, "rb") as f:
+            f.seek(end)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                end += len(line)
+                sale = json.loads(line)
+                state["batch"] = max(state["batch"], sale.get("batch", 0))
+                for key in bucket_keys(sale["timestamp"]):
+                    path = self._shard_file(key)
+                    if path not in shards:
+                        shards[path] = copy.deepcopy(self._read(path))
+                    shard = shards[path]
+                    if end <= shard["applied"]:
+                        continue  # Déjà intégrée par une intégration interrompue
+                    if len(key) == 10:
+                        self._add(shard.setdefault("days", {}), key, sale)
+                    else:
+                        self._add(shard, "total", sale)
+        # Périodes écrites avant la position globale : un arrêt entre les deux est sans effet
+        for path, shard in shards.items():
+            shard["applied"] = end
+            self._write(path, shard)
+        state["applied"] = end
+        self._write(self.state_file, state)
+        self._tail = None
+        legacy_file = os.path.join(self.directory, "rollups.json")
+        if os.path.exists(legacy_file):
+            os.remove(legacy_file)  # Ancien fichier unique des cumuls, remplacé par les fichiers des périodes
+
+    def record(self, sales: Iterable[Dict], batch: Optional[int] = None):
+        """Ajouter des ventes au journal et aux cumuls.
+
+        batch : numéro de la transaction qui porte ces ventes ; sans effet si ce lot,
+        ou un lot suivant, est déjà enregistré.
+        """
+        sales = list(sales)
+        if not sales:
+            return
+        with self.locked():
+            os.makedirs(self.directory, exist_ok=True)
+            tail = self._refresh_tail()
+            if batch is not None:
+                if batch <= tail["batch"]:
+                    return
+                sales = [dict(sale, batch=batch) for sale in sales]
+            if os.path.exists(self.journal_file) and os.path.getsize(self.journal_file) > tail["end"]:
+                # Ligne tronquée en fin de journal : retirée pour que les ajouts restent lisibles
+                with open(self.journal_file, "r+b") as f:
+                    f.truncate(tail["end"])
+            data = b"".join(json.dumps(sale).encode("utf-8") + b"\n" for sale in sales)
+            with open(self.journal_file, "ab") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            for sale in sales:
+                self._add_to_tail(tail, sale)
+            tail["end"] += len(data)
+            if tail["end"] - tail["start"] >= self.fold_size:
+                self._fold()
+
+    def last_batch(self) -> int:
+        """Numéro de la dernière transaction dont les ventes sont enregistrées (0 : aucune)."""
+        with self.locked():
+            return self._refresh_tail()["batch"]
+
+    def totals(self, buckets: Iterable[str], manager_name: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+        """Somme des compartiments demandés : gestionnaire -> opérateur -> montant."""
+        with self._lock:
+            tail = self._refresh_tail()
+            if tail["end"] - tail["start"] >= self.fold_size:
+                # Fin du journal trop longue (journal d'avant les cumuls par période, ou ventes
+                # d'un autre processus) : intégrée une fois pour toutes
+                with self._file_lock:
+                    self._fold()
+                tail = self._refresh_tail()
+            result = {}
+            for key in buckets:
+                shard = self._read(self._shard_file(key))
+                stored = shard.get("days", {}).get(key, {}) if len(key) == 10 else shard["total"]
+                for source in (stored, tail["buckets"].get(key, {})):
+                    for manager, operators in source.items():
+                        if manager_name is not None and manager != manager_name:
+                            continue
+                        totals = result.setdefault(manager, {})
+                        for operator, amount in operators.items():
+                            totals[operator] = totals.get(operator, 0) + amount
+            return result
+
+    def iter_sales(self, start: Optional[float] = None, end: Optional[float] = None) -> Iterator[Dict]:
+        """Parcourir les ventes (horodatage dans [start, end[), dans l'ordre d'enregistrement."""
+        for sale, _ in self.iter_after():
+            if (start is None or sale["timestamp"] >= start) and (end is None or sale["timestamp"] < end):
+                yield sale
+
+    def iter_after(self, offset: int = 0) -> Iterator[Tuple[Dict, int]]:
+        """Parcourir les ventes écrites après l'octet offset du journal, chacune avec la position qui la suit."""
+        if not os.path.exists(self.journal_file):
+            return
+        with open(self.journal_file, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                sale = json.loads(line)
+                sale.pop("batch", None)  # Numéro de transaction interne au moteur JSON
+                yield sale, offset
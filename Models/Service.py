@@ -0,0 +1,366 @@
+"""
+Service des modèles : un démon garde ClientModel et OperateurModel en mémoire et les sert
+aux sessions (menus, points de vente) par une socket locale
+"""
+
+import asyncio
+import contextlib
+import io
+import json
+import os
+import signal
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+from consts import SERVICE_PORT, SERVICE_SOCKET
+from Models.Backend import chosen_backend, default_backend_kind, set_default_backend
+from Models.Cache import model_cache
+from Models.Client import ClientModel
+from Models.Operateur import OperateurModel
+from Views.Functions import message_sink, print_message
+
+Address = Union[str, Tuple[str, int]]
+
+REQUEST_LIMIT = 16 * 1024 * 1024  # Taille maximale (octets) d'une requête
+
+# Méthodes servies par le démon ; les autres (make_call, réserves de numéros, chargements en masse)
+# restent exécutées par la session
+EXPOSED = {
+    "client": {
+        "create_client", "get_client_by_phone", "client_exists", "get_all_clients", "find_client_with_prefix",
+        "update_credit", "debit_credit", "transfer_credit", "add_call_to_history", "get_call_history",
+        "update_call_status",
+    },
+    "operator": {
+        "create_operator", "get_all_operators", "get_operators_snapshot", "rename_operator",
+        "add_index_to_operator", "remove_index_from_operator", "is_index_unique", "record_credit_sale",
+        "get_sales_totals", "get_bucket_totals", "get_legacy_cashier", "is_number_available_for_operator",
+        "assign_number_to_client",
+    },
+    "service": {"stats", "backend_kind"},
+}
+LOCAL_MODELS = {"client": ClientModel, "operator": OperateurModel}
+
+
+def default_address() -> Address:
+    """Socket Unix SERVICE_SOCKET, ou 127.0.0.1:SERVICE_PORT sans sockets Unix."""
+    return SERVICE_SOCKET if hasattr(socket, "AF_UNIX") else ("127.0.0.1", SERVICE_PORT)
+
+
+class ServiceError(RuntimeError):
+    """Erreur levée par une méthode exécutée dans le démon."""
+
+
+# Encodage : une requête ou une réponse JSON par ligne. Les dates sont marquées,
+# les instantanés en lecture seule du cache deviennent des dictionnaires.
+
+def _default(value: Any) -> Any:
+    if isinstance(value, MappingProxyType):
+        return dict(value)
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    raise TypeError(f"Type non transmissible par le service : {type(value).__name__}")
+
+
+def _object_hook(value: Dict) -> Any:
+    if len(value) == 1:
+        if "__date__" in value:
+            return date.fromisoformat(value["__date__"])
+        if "__datetime__" in value:
+            return datetime.fromisoformat(value["__datetime__"])
+    return value
+
+
+def encode(message: Dict) -> bytes:
+    return json.dumps(message, default=_default, ensure_ascii=False, separators=(",", ":")).encode() + b"\n"
+
+
+def decode(line: bytes) -> Dict:
+    return json.loads(line, object_hook=_object_hook)
+
+
+class ModelService:
+    """Démon des modèles.
+
+    asyncio gère toutes les connexions dans un seul thread ; les méthodes des modèles
+    s'exécutent l'une après l'autre dans un thread de travail, sur des modèles et un
+    cache partagés par toutes les sessions. Une session peut envoyer plusieurs requêtes
+    sans attendre les réponses (pipelining) : elles sont exécutées et répondues dans
+    l'ordre d'arrivée. Les messages des modèles (print_message) sont renvoyés avec la
+    réponse pour que la session les affiche ; la sortie standard du démon n'est pas détournée.
+    """
+
+    def __init__(self, address: Address = None):
+        self.address = address or default_address()
+        self.models = {"client": ClientModel(), "operator": OperateurModel()}
+        self.backend = default_backend_kind()
+        self.requests = 0
+        self.connections = 0
+        self.sessions = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="models")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop: Optional[asyncio.Future] = None
+        self._open: Dict[asyncio.Task, Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = {}
+
+    async def serve(self, ready: Optional[threading.Event] = None):
+        """Servir jusqu'à SIGINT/SIGTERM (ou l'annulation de la tâche)."""
+        if isinstance(self.address, str):
+            self._remove_stale_socket()
+            server = await asyncio.start_unix_server(self._session, path=self.address, limit=REQUEST_LIMIT)
+        else:
+            server = await asyncio.start_server(self._session, *self.address, limit=REQUEST_LIMIT)
+        self._loop = asyncio.get_running_loop()
+        self._stop = self._loop.create_future()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            # Hors du thread principal (démon embarqué), arrêt par stop()
+            with contextlib.suppress(NotImplementedError, RuntimeError, ValueError):
+                self._loop.add_signal_handler(signum, self._request_stop)
+        if ready is not None:
+            ready.set()
+        try:
+            async with server:
+                await self._stop
+                # Sessions encore ouvertes fermées proprement : requêtes en cours terminées et répondues
+                for reader, writer in self._open.values():
+                    writer.transport.pause_reading()
+                    reader.feed_eof()
+                await asyncio.gather(*self._open, return_exceptions=True)
+        finally:
+            self._executor.shutdown(wait=True)
+            if isinstance(self.address, str) and os.path.exists(self.address):
+                os.remove(self.address)
+
+    def _request_stop(self):
+        if not self._stop.done():
+            self._stop.set_result(None)
+
+    def stop(self):
+        """Arrêter le service (depuis n'importe quel thread)."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._request_stop)
+
+    def _remove_stale_socket(self):
+        if not os.path.exists(self.address):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.address)
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.remove(self.address)  # Socket d'un démon arrêté brutalement
+        else:
+            raise RuntimeError(f"Un service écoute déjà sur {self.address}.")
+        finally:
+            probe.close()
+
+    async def _session(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        loop = asyncio.get_running_loop()
+        # Réponses dans l'ordre des requêtes : la lecture continue pendant l'exécution
+        pending: "asyncio.Queue[Optional[asyncio.Future]]" = asyncio.Queue()
+        sender = asyncio.create_task(self._send(pending, writer))
+        self._open[asyncio.current_task()] = (reader, writer)
+        self.connections += 1
+        self.sessions += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                pending.put_nowait(loop.run_in_executor(self._executor, self._execute, line))
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            pending.put_nowait(None)
+            with contextlib.suppress(ConnectionError):
+                await sender
+            writer.close()
+            del self._open[asyncio.current_task()]
+            self.connections -= 1
+
+    @staticmethod
+    async def _send(pending: asyncio.Queue, writer: asyncio.StreamWriter):
+        while True:
+            response = await pending.get()
+            if response is None:
+                return
+            writer.write(await response)
+            # Une seule attente d'écriture par rafale de réponses prêtes
+            if pending.empty():
+                await writer.drain()
+
+    def _execute(self, line: bytes) -> bytes:
+        """Exécuter une requête (thread de travail)."""
+        self.requests += 1
+        request_id = None
+        output = io.StringIO()
+        try:
+            request = decode(line)
+            request_id = request.get("id")
+            model, method = request["model"], request["method"]
+            if method not in EXPOSED.get(model, ()):
+                raise AttributeError(f"Méthode non servie : {model}.{method}")
+            target = self if model == "service" else self.models[model]
+            # Messages de cette requête seulement : les autres threads écrivent toujours sur la console
+            token = message_sink.set(output)
+            try:
+                result = getattr(target, method)(*request.get("args", ()), **request.get("kwargs", {}))
+            finally:
+                message_sink.reset(token)
+            response = {"id": request_id, "result": result}
+        except Exception as e:
+            response = {"id": request_id, "error": f"{type(e).__name__}: {e}"}
+        if output.tell():
+            response["output"] = output.getvalue()
+        try:
+            return encode(response)
+        except TypeError as e:
+            return encode({"id": request_id, "error": str(e), "output": response.get("output", "")})
+
+    def backend_kind(self) -> str:
+        """Moteur de stockage des modèles servis ("json" ou "sqlite")."""
+        return self.backend
+
+    def stats(self) -> Dict:
+        """Requêtes servies, sessions ouvertes et efficacité du cache des modèles."""
+        return {"requests": self.requests, "connections": self.connections, "sessions": self.sessions,
+                "cache": model_cache.stats()}
+
+
+class ServiceClient:
+    """Connexion d'une session au démon.
+
+    call() envoie une requête et attend sa réponse ; pipeline() envoie une série de
+    requêtes d'un coup puis lit toutes les réponses, en un seul aller-retour.
+    """
+
+    def __init__(self, address: Address = None, timeout: Optional[float] = None):
+        self.address = address or default_address()
+        if isinstance(self.address, str):
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        try:
+            self._socket.connect(self.address)
+        except OSError:
+            self._socket.close()
+            raise
+        self._file = self._socket.makefile("rwb")
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    def call(self, model: str, method: str, *args, **kwargs) -> Any:
+        return self.pipeline([(model, method, args, kwargs)])[0]
+
+    def pipeline(self, requests: Sequence[Tuple[str, str, Sequence, Dict]]) -> List[Any]:
+        """Résultats des requêtes (modèle, méthode, args, kwargs), dans l'ordre.
+
+        Lève ServiceError pour la première requête en erreur, une fois toutes les réponses lues.
+        """
+        with self._lock:
+            first_id = self._next_id
+            self._next_id += len(requests)
+            for offset, (model, method, args, kwargs) in enumerate(requests):
+                self._file.write(encode({"id": first_id + offset, "model": model, "method": method,
+                                         "args": list(args), "kwargs": kwargs}))
+            self._file.flush()
+            responses = []
+            for _ in requests:
+                line = self._file.readline()
+                if not line:
+                    raise ConnectionError("Connexion au service perdue.")
+                responses.append(decode(line))
+
+        results = []
+        error = None
+        for response in responses:
+            if response.get("output"):
+                print(response["output"], end="")
+            if "error" in response and error is None:
+                error = ServiceError(response["error"])
+            results.append(response.get("result"))
+        if error is not None:
+            raise error
+        return results
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+
+class RemoteModel:
+    """Modèle d'une session cliente : les méthodes servies sont exécutées par le démon,
+    les autres par un modèle local créé à la première utilisation."""
+
+    def __init__(self, client: ServiceClient, name: str):
+        self._client = client
+        self._name = name
+        self._local = None
+
+    def __getattr__(self, method: str):
+        if method.startswith("__"):
+            raise AttributeError(method)
+        if method in EXPOSED[self._name]:
+            return lambda *args, **kwargs: self._client.call(self._name, method, *args, **kwargs)
+        if self._local is None:
+            self._local = LOCAL_MODELS[self._name]()
+        return getattr(self._local, method)
+
+    def map(self, method: str, arguments: Iterable[Sequence]) -> List[Any]:
+        """method appelée pour chaque jeu d'arguments, en une seule série de requêtes."""
+        return self._client.pipeline([(self._name, method, args, {}) for args in arguments])
+
+
+def call_many(model, method: str, arguments: Iterable[Sequence]) -> List[Any]:
+    """method(*args) pour chaque jeu d'arguments : pipelinée avec le service, appels directs sinon."""
+    if isinstance(model, RemoteModel):
+        return model.map(method, arguments)
+    return [getattr(model, method)(*args) for args in arguments]
+
+
+_client: Optional[ServiceClient] = None
+
+
+def connect_service(address: Address = None) -> bool:
+    """Utiliser le démon pour les modèles de la session s'il est démarré. Retourne True si connecté.
+
+    Les méthodes non servies (make_call, ventes en lot, compteurs de crédit, enregistrements)
+    écrivent directement dans le stockage : la session adopte le moteur du démon, ou refuse
+    la connexion si un autre moteur a été choisi explicitement (set_default_backend).
+    """
+    global _client
+    try:
+        client = ServiceClient(address)
+    except OSError:
+        _client = None
+        return False
+    try:
+        kind = client.call("service", "backend_kind")
+    except (OSError, ServiceError) as e:
+        client.close()
+        print_message(f"Service des modèles ignoré : moteur de stockage inconnu ({e}).", "ERROR")
+        _client = None
+        return False
+    if chosen_backend() not in (None, kind):
+        client.close()
+        print_message(f"Service des modèles ignoré : il utilise le stockage {kind}, "
+                      f"cette session le stockage {chosen_backend()}.", "ERROR")
+        _client = None
+        return False
+    set_default_backend(kind)
+    _client = client
+    return True
+
+
+def get_client_model():
+    """ClientModel de la session : servi par le démon si connect_service() a réussi."""
+    return RemoteModel(_client, "client") if _client is not None else ClientModel()
+
+
+def get_operator_model():
+    """OperateurModel de la session : servi par le démon si connect_service() a réussi."""
+    return RemoteModel(_client, "operator") if _client is not None else OperateurModel()
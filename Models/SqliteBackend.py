@@ -0,0 +1,522 @@
+"""
+Moteur de stockage SQLite embarqué
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from consts import SETTLED_RESERVATIONS_KEPT
+from Models.Backend import StorageBackend
+from Models.Functions import call_timestamp
+from Models.Sales import bucket_keys
+
+
+# Champs stockés à part (ou propres au moteur JSON) ; le reste du client est sérialisé dans "data"
+_CLIENT_COLUMNS = ("phone", "pin", "credit", "call_history", "_seq")
+
+# Compteurs de modifications : nom du compteur -> tables dont les écritures l'incrémentent
+_CHANGE_COUNTERS = {
+    "clients": ("clients", "calls"),
+    "operators": ("operators", "operator_indexes"),
+}
+
+
+class _Conflict(Exception):
+    """Lot à annuler : opérateur modifié par une autre session, crédit insuffisant ou client absent."""
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS clients (
+    phone TEXT PRIMARY KEY,
+    pin TEXT NOT NULL,
+    credit NUMERIC NOT NULL DEFAULT 0,
+    data TEXT NOT NULL DEFAULT '{}'
+);
+CREATE TABLE IF NOT EXISTS calls (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    phone TEXT NOT NULL,
+    timestamp REAL,
+    status TEXT NOT NULL,
+    details TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS calls_by_phone ON calls (phone, id);
+CREATE INDEX IF NOT EXISTS calls_by_date ON calls (timestamp);
+CREATE TABLE IF NOT EXISTS operators (
+    name TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS operator_indexes (
+    prefix TEXT PRIMARY KEY,
+    operator TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS operator_indexes_by_operator ON operator_indexes (operator);
+CREATE TABLE IF NOT EXISTS cashier (
+    manager TEXT NOT NULL,
+    operator TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (manager, operator)
+);
+CREATE TABLE IF NOT EXISTS sales (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp REAL NOT NULL,
+    manager TEXT NOT NULL,
+    operator TEXT NOT NULL,
+    phone TEXT NOT NULL DEFAULT '',
+    amount NUMERIC NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sales_by_date ON sales (timestamp);
+CREATE TABLE IF NOT EXISTS sales_rollups (
+    bucket TEXT NOT NULL,
+    manager TEXT NOT NULL,
+    operator TEXT NOT NULL,
+    amount NUMERIC NOT NULL,
+    PRIMARY KEY (bucket, manager, operator)
+);
+CREATE TABLE IF NOT EXISTS settled_reservations (
+    reservation TEXT PRIMARY KEY,
+    phone TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS settled_reservations_by_phone ON settled_reservations (phone);
+CREATE TABLE IF NOT EXISTS changes (
+    name TEXT PRIMARY KEY,
+    counter INTEGER NOT NULL DEFAULT 0
+);
+""" + "".join(
+    "INSERT OR IGNORE INTO changes (name) VALUES ('{0}');\n".format(name)
+    + "".join(
+        "CREATE TRIGGER IF NOT EXISTS {1}_{2}_bumps_{0} AFTER {3} ON {1} BEGIN "
+        "UPDATE changes SET counter = counter + 1 WHERE name = '{0}'; END;\n".format(name, table, event.lower(), event)
+        for table in tables for event in ("INSERT", "UPDATE", "DELETE")
+    )
+    for name, tables in _CHANGE_COUNTERS.items()
+)
+
+
+class SqliteBackend(StorageBackend):
+    """Clients, historique d'appels, opérateurs et caisses dans une base SQLite indexée."""
+
+    def __init__(self, database: str):
+        directory = os.path.dirname(database)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.database = database
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(database, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _transaction(self):
+        """Transaction en écriture (BEGIN IMMEDIATE ... COMMIT/ROLLBACK)."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    # Clients
+
+    @staticmethod
+    def _client_row(client: Dict) -> tuple:
+        data = {key: value for key, value in client.items() if key not in _CLIENT_COLUMNS}
+        return client["phone"], client["pin"], client.get("credit", 0), json.dumps(data)
+
+    @staticmethod
+    def _call_row(phone: str, call: Dict) -> tuple:
+        return phone, call_timestamp(call), call.get("status", "unread"), json.dumps(call)
+
+    @staticmethod
+    def _client_from_row(row) -> Dict:
+        client = {"phone": row["phone"], "pin": row["pin"], "credit": row["credit"]}
+        client.update(json.loads(row["data"]))
+        return client
+
+    def get_client(self, phone: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM clients WHERE phone = ?", (phone,)).fetchone()
+            return self._client_from_row(row) if row else None
+
+    def client_exists(self, phone: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM clients WHERE phone = ?", (phone,)).fetchone() is not None
+
+    def insert_client(self, client: Dict) -> bool:
+        try:
+            self.insert_clients([client])
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+    def insert_clients(self, clients: Iterable[Dict]):
+        """Ajouter un lot de clients (avec leur historique) dans une seule transaction."""
+        with self._transaction() as conn:
+            self._insert_clients(conn, clients)
+
+    def _insert_clients(self, conn, clients: Iterable[Dict]):
+        for client in clients:
+            conn.execute("INSERT INTO clients (phone, pin, credit, data) VALUES (?, ?, ?, ?)",
+                         self._client_row(client))
+            # L'historique est stocké du plus ancien au plus récent
+            conn.executemany(
+                "INSERT INTO calls (phone, timestamp, status, details) VALUES (?, ?, ?, ?)",
+                [self._call_row(client["phone"], call) for call in reversed(client.get("call_history", []))],
+            )
+
+    def bulk_load(self, clients: Iterable[Dict], batch_size: int = 1000) -> int:
+        count = 0
+        batch = []
+        for client in clients:
+            batch.append(client)
+            if len(batch) >= batch_size:
+                self.insert_clients(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            self.insert_clients(batch)
+            count += len(batch)
+        return count
+
+    def apply_batch(self, clients: List[Dict], credits: List[Tuple[str, float]],
+                    operators: Optional[List[Dict]] = None, sales: Optional[List[Dict]] = None) -> bool:
+        """Le lot entier (clients, recharges, opérateurs, ventes) est validé ou annulé d'un bloc."""
+        try:
+            with self._transaction() as conn:
+                self._insert_clients(conn, clients)
+                conn.executemany("UPDATE clients SET credit = credit + ? WHERE phone = ?",
+                                 [(amount, phone) for phone, amount in credits])
+                for operator in operators or []:
+                    if not self._swap_operator(conn, operator["name"], operator, operator.get("version", 0)):
+                        raise _Conflict
+                self._record_sales(conn, sales or [])
+            return True
+        except (_Conflict, sqlite3.IntegrityError):
+            return False
+
+    def iter_clients(self) -> Iterator[Dict]:
+        # Lecture par pages pour ne pas garder un curseur ouvert entre deux clients
+        last_phone = ""
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT * FROM clients WHERE phone > ? ORDER BY phone LIMIT 500", (last_phone,)
+                ).fetchall()
+                clients = [self._client_from_row(row) for row in rows]
+            if not clients:
+                return
+            yield from clients
+            last_phone = clients[-1]["phone"]
+
+    def iter_phones(self) -> Iterator[str]:
+        last_phone = ""
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT phone FROM clients WHERE phone > ? ORDER BY phone LIMIT 5000", (last_phone,)
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield row["phone"]
+            last_phone = rows[-1]["phone"]
+
+    def find_client_with_prefix(self, prefix: str) -> Optional[str]:
+        # Parcours de la clé primaire à partir du préfixe : une seule ligne lue
+        with self._lock:
+            row = self._conn.execute("SELECT phone FROM clients WHERE phone >= ? ORDER BY phone LIMIT 1",
+                                     (prefix,)).fetchone()
+        return row["phone"] if row is not None and row["phone"].startswith(prefix) else None
+
+    def update_credit(self, phone: str, amount: float) -> bool:
+        with self._transaction() as conn:
+            cursor = conn.execute("UPDATE clients SET credit = credit + ? WHERE phone = ?", (amount, phone))
+            return cursor.rowcount == 1
+
+    def debit_credit(self, phone: str, amount: float) -> Optional[float]:
+        with self._transaction() as conn:
+            row = conn.execute("SELECT credit FROM clients WHERE phone = ?", (phone,)).fetchone()
+            if row is None:
+                return None
+            debit = min(amount, max(row["credit"], 0))
+            conn.execute("UPDATE clients SET credit = credit - ? WHERE phone = ?", (debit, phone))
+            return debit
+
+    def refund_reservation(self, phone: str, reservation: str, amount: float) -> bool:
+        with self._transaction() as conn:
+            if conn.execute("SELECT 1 FROM clients WHERE phone = ?", (phone,)).fetchone() is None:
+                return False
+            cursor = conn.execute("INSERT OR IGNORE INTO settled_reservations (reservation, phone) VALUES (?, ?)",
+                                  (reservation, phone))
+            if cursor.rowcount == 1:
+                conn.execute("UPDATE clients SET credit = credit + ? WHERE phone = ?", (amount, phone))
+                # Seules les dernières réservations du client restent mémorisées
+                conn.execute("DELETE FROM settled_reservations WHERE phone = ? AND rowid NOT IN "
+                             "(SELECT rowid FROM settled_reservations WHERE phone = ? ORDER BY rowid DESC LIMIT ?)",
+                             (phone, phone, SETTLED_RESERVATIONS_KEPT))
+            return True
+
+    def transfer_credit(self, source: str, transfers: List[Tuple[str, float]]) -> bool:
+        total = sum(amount for _, amount in transfers)
+        try:
+            with self._transaction() as conn:
+                cursor = conn.execute("UPDATE clients SET credit = credit - ? WHERE phone = ? AND credit >= ?",
+                                      (total, source, total))
+                if cursor.rowcount != 1:
+                    raise _Conflict
+                cursor = conn.executemany("UPDATE clients SET credit = credit + ? WHERE phone = ?",
+                                          [(amount, phone) for phone, amount in transfers])
+                # Un bénéficiaire inexistant : rien n'est enregistré
+                if cursor.rowcount != len(transfers):
+                    raise _Conflict
+            return True
+        except _Conflict:
+            return False
+
+    def add_call(self, phone: str, call: Dict) -> bool:
+        with self._transaction() as conn:
+            if conn.execute("SELECT 1 FROM clients WHERE phone = ?", (phone,)).fetchone() is None:
+                return False
+            conn.execute("INSERT INTO calls (phone, timestamp, status, details) VALUES (?, ?, ?, ?)",
+                         self._call_row(phone, call))
+            return True
+
+    def get_call_history(self, phone: str, limit: Optional[int] = None) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, details FROM calls WHERE phone = ? ORDER BY id DESC LIMIT ?",
+                (phone, -1 if limit is None else limit),
+            ).fetchall()
+        history = []
+        for row in rows:
+            call = json.loads(row["details"])
+            call["status"] = row["status"]
+            history.append(call)
+        return history
+
+    def iter_call_records(self) -> Iterator[Tuple[str, Dict]]:
+        # Une seule lecture de la table des appels, par pages, au lieu d'une requête par client
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT id, phone, status, details FROM calls WHERE id > ? ORDER BY id LIMIT 5000", (last_id,)
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                call = json.loads(row["details"])
+                call["status"] = row["status"]
+                yield row["phone"], call
+            last_id = rows[-1]["id"]
+
+    def count_calls(self, phone: str) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM calls WHERE phone = ?", (phone,)).fetchone()[0]
+
+    def set_call_status(self, phone: str, call_index: int, status: str) -> bool:
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT id FROM calls WHERE phone = ? ORDER BY id DESC LIMIT 1 OFFSET ?", (phone, call_index)
+            ).fetchone()
+            if row is None:
+                return False
+            conn.execute("UPDATE calls SET status = ? WHERE id = ?", (status, row["id"]))
+            return True
+
+    def forget_recordings(self, phone: str, audio_files: Iterable[str]) -> int:
+        with self._transaction() as conn:
+            cursor = conn.executemany(
+                "UPDATE calls SET details = json_set(details, '$.audio_file', NULL, '$.recording', 'deleted') "
+                "WHERE phone = ? AND json_extract(details, '$.audio_file') = ?",
+                [(phone, audio_file) for audio_file in audio_files],
+            )
+            return cursor.rowcount
+
+    def _change_counter(self, name: str) -> int:
+        # Incrémenté par les déclencheurs à chaque écriture, quelle que soit la connexion
+        with self._lock:
+            return self._conn.execute("SELECT counter FROM changes WHERE name = ?", (name,)).fetchone()[0]
+
+    def clients_signature(self):
+        return self._change_counter("clients")
+
+    # Opérateurs
+
+    def load_operators(self) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute("SELECT data FROM operators ORDER BY position").fetchall()
+        return [json.loads(row["data"]) for row in rows]
+
+    def save_operators(self, operators: List[Dict]):
+        with self._transaction() as conn:
+            self._write_operators(conn, operators)
+
+    @staticmethod
+    def _write_operators(conn, operators: List[Dict]):
+        conn.execute("DELETE FROM operators")
+        conn.execute("DELETE FROM operator_indexes")
+        for position, operator in enumerate(operators):
+            conn.execute("INSERT INTO operators (name, position, data) VALUES (?, ?, ?)",
+                         (operator["name"], position, json.dumps(operator)))
+            conn.executemany("INSERT INTO operator_indexes (prefix, operator) VALUES (?, ?)",
+                             [(index, operator["name"]) for index in operator["indexes"]])
+
+    def insert_operator(self, operator: Dict) -> bool:
+        with self._transaction() as conn:
+            if conn.execute("SELECT 1 FROM operators WHERE lower(name) = lower(?)", (operator["name"],)).fetchone():
+                return False
+            if self._indexes_taken(conn, operator["indexes"]):
+                return False
+            position = conn.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM operators").fetchone()[0]
+            operator = dict(operator, version=1)
+            conn.execute("INSERT INTO operators (name, position, data) VALUES (?, ?, ?)",
+                         (operator["name"], position, json.dumps(operator)))
+            conn.executemany("INSERT INTO operator_indexes (prefix, operator) VALUES (?, ?)",
+                             [(index, operator["name"]) for index in operator["indexes"]])
+            return True
+
+    def replace_operator(self, name: str, operator: Dict, expected_version: int) -> bool:
+        with self._transaction() as conn:
+            return self._swap_operator(conn, name, operator, expected_version)
+
+    def delete_operator(self, name: str, expected_version: int) -> bool:
+        with self._transaction() as conn:
+            if self._operator_version(conn, name) != expected_version:
+                return False
+            conn.execute("DELETE FROM operators WHERE name = ?", (name,))
+            conn.execute("DELETE FROM operator_indexes WHERE operator = ?", (name,))
+            return True
+
+    @staticmethod
+    def _operator_version(conn, name: str) -> Optional[int]:
+        row = conn.execute("SELECT data FROM operators WHERE name = ?", (name,)).fetchone()
+        return json.loads(row["data"]).get("version", 0) if row else None
+
+    @staticmethod
+    def _indexes_taken(conn, indexes: List[str], exclude: Optional[str] = None) -> bool:
+        """Un index chevauche-t-il (égal ou préfixe) celui d'un autre opérateur ?"""
+        for index in indexes:
+            if conn.execute(
+                "SELECT 1 FROM operator_indexes WHERE operator IS NOT ? "
+                "AND (substr(prefix, 1, length(?)) = ? OR substr(?, 1, length(prefix)) = prefix) LIMIT 1",
+                (exclude, index, index, index),
+            ).fetchone():
+                return True
+        return False
+
+    def _swap_operator(self, conn, name: str, operator: Dict, expected_version: int) -> bool:
+        """Remplace un opérateur dans la transaction courante s'il est toujours à la version attendue."""
+        if self._operator_version(conn, name) != expected_version:
+            return False
+        if self._indexes_taken(conn, operator["indexes"], exclude=name):
+            return False
+        operator = dict(operator, version=expected_version + 1)
+        conn.execute("UPDATE operators SET name = ?, data = ? WHERE name = ?",
+                     (operator["name"], json.dumps(operator), name))
+        conn.execute("DELETE FROM operator_indexes WHERE operator = ?", (name,))
+        conn.executemany("INSERT INTO operator_indexes (prefix, operator) VALUES (?, ?)",
+                         [(index, operator["name"]) for index in operator["indexes"]])
+        return True
+
+    def operators_signature(self):
+        return self._change_counter("operators")
+
+    # Caisses
+
+    def load_cashier(self) -> Dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT manager, operator, data FROM cashier").fetchall()
+        cashier_data = {}
+        for row in rows:
+            cashier_data.setdefault(row["manager"], {})[row["operator"]] = json.loads(row["data"])
+        return cashier_data
+
+    def save_cashier(self, cashier_data: Dict):
+        with self._transaction() as conn:
+            self._write_cashier(conn, cashier_data)
+
+    @staticmethod
+    def _write_cashier(conn, cashier_data: Dict):
+        conn.execute("DELETE FROM cashier")
+        conn.executemany(
+            "INSERT INTO cashier (manager, operator, data) VALUES (?, ?, ?)",
+            [(manager, operator, json.dumps(data))
+             for manager, operators in cashier_data.items()
+             for operator, data in operators.items()],
+        )
+
+    def record_sales(self, sales: List[Dict]):
+        with self._transaction() as conn:
+            self._record_sales(conn, sales)
+
+    @staticmethod
+    def _record_sales(conn, sales: List[Dict]):
+        """Ventes et cumuls mis à jour dans la même transaction."""
+        conn.executemany(
+            "INSERT INTO sales (timestamp, manager, operator, phone, amount) VALUES (?, ?, ?, ?, ?)",
+            [(sale["timestamp"], sale["manager"], sale["operator"], sale.get("phone", ""), sale["amount"])
+             for sale in sales],
+        )
+        conn.executemany(
+            "INSERT INTO sales_rollups (bucket, manager, operator, amount) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (bucket, manager, operator) DO UPDATE SET amount = amount + excluded.amount",
+            [(bucket, sale["manager"], sale["operator"], sale["amount"])
+             for sale in sales for bucket in bucket_keys(sale["timestamp"])],
+        )
+
+    def sales_totals(self, buckets: Iterable[str], manager_name: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+        buckets = list(buckets)
+        totals = {}
+        # Lots de 500 compartiments pour rester sous la limite de paramètres de SQLite
+        for start in range(0, len(buckets), 500):
+            batch = buckets[start:start + 500]
+            query = (f"SELECT manager, operator, SUM(amount) AS amount FROM sales_rollups "
+                     f"WHERE bucket IN ({','.join('?' * len(batch))})")
+            params = list(batch)
+            if manager_name is not None:
+                query += " AND manager = ?"
+                params.append(manager_name)
+            with self._lock:
+                rows = self._conn.execute(query + " GROUP BY manager, operator", params).fetchall()
+            for row in rows:
+                operators = totals.setdefault(row["manager"], {})
+                operators[row["operator"]] = operators.get(row["operator"], 0) + row["amount"]
+        return totals
+
+    def iter_sales(self, start: Optional[float] = None, end: Optional[float] = None) -> Iterator[Dict]:
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT * FROM sales WHERE id > ? AND timestamp >= ? AND timestamp < ? ORDER BY id LIMIT 500",
+                    (last_id, float("-inf") if start is None else start, float("inf") if end is None else end),
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield {key: row[key] for key in ("timestamp", "manager", "operator", "phone", "amount")}
+            last_id = rows[-1]["id"]
+
+    def iter_sales_after(self, position: int = 0) -> Iterator[Tuple[Dict, int]]:
+        # Position : identifiant de la dernière vente lue
+        while True:
+            with self._lock:
+                rows = self._conn.execute("SELECT * FROM sales WHERE id > ? ORDER BY id LIMIT 500", (position,)).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield {key: row[key] for key in ("timestamp", "manager", "operator", "phone", "amount")}, row["id"]
+            position = rows[-1]["id"]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,119 @@
+"""
+Sonneries d'appel : mixeur ouvert une fois, sons de BD/sounds décodés une fois et gardés en mémoire
+"""
+
+import atexit
+import os
+import threading
+import time
+from typing import Dict, Optional
+import pygame
+from consts import DATA_DIR
+
+SOUNDS_DIR = os.path.join(DATA_DIR, "sounds")
+
+
+class ToneEngine:
+    """Lecture des sonneries sans ouvrir le mixeur ni décoder de fichier au moment de l'appel.
+
+    start() ouvre le mixeur pygame et décode en PCM, dans un thread à part, tous les
+    sons de BD/sounds. play() démarre un son aussitôt (il est décodé sur place s'il ne
+    l'est pas encore) et stop() l'arrête aussitôt. timings garde les durées (ms) de
+    l'ouverture du mixeur, de chaque décodage et du dernier démarrage de chaque son.
+    Sans périphérique audio, les sons sont ignorés.
+    """
+
+    def __init__(self, directory: str = SOUNDS_DIR):
+        self.directory = directory
+        self.available = False
+        self.timings: Dict[str, float] = {}
+        self._sounds: Dict[str, pygame.mixer.Sound] = {}
+        self._lock = threading.RLock()
+        self._stopped = threading.Event()
+        self._channel: Optional[pygame.mixer.Channel] = None
+        self._preload: Optional[threading.Thread] = None
+
+    def start(self) -> "ToneEngine":
+        with self._lock:
+            if self.available or self._preload is not None:
+                return self
+            started = time.perf_counter()
+            try:
+                pygame.mixer.init()
+            except pygame.error:
+                return self
+            self.timings["mixer_init"] = (time.perf_counter() - started) * 1000
+            self.available = True
+            atexit.register(self.close)
+            self._preload = threading.Thread(target=self._load_all, daemon=True)
+            self._preload.start()
+        return self
+
+    def _load_all(self):
+        if not os.path.isdir(self.directory):
+            return
+        for sound_file in sorted(os.listdir(self.directory)):
+            self._sound(sound_file)
+
+    def _sound(self, sound_file: str) -> Optional[pygame.mixer.Sound]:
+        with self._lock:
+            if sound_file not in self._sounds:
+                sound_path = os.path.join(self.directory, sound_file)
+                if not os.path.exists(sound_path):
+                    return None
+                started = time.perf_counter()
+                try:
+                    self._sounds[sound_file] = pygame.mixer.Sound(sound_path)
+                except pygame.error:
+                    return None
+                self.timings[f"decode:{sound_file}"] = (time.perf_counter() - started) * 1000
+            return self._sounds[sound_file]
+
+    def play(self, sound_file: str) -> float:
+        """Démarrer un son (en arrêtant le précédent). Retourne sa durée en secondes, 0 s'il n'est pas joué."""
+        started = time.perf_counter()
+        if not self.available:
+            return 0
+        sound = self._sound(sound_file)
+        if sound is None:
+            return 0
+        with self._lock:
+            self.stop()
+            self._stopped.clear()
+            self._channel = sound.play()
+        self.timings[f"start:{sound_file}"] = (time.perf_counter() - started) * 1000
+        return sound.get_length()
+
+    def play_and_wait(self, sound_file: str):
+        """Jouer un son jusqu'au bout (ou jusqu'à stop() depuis un autre thread)."""
+        length = self.play(sound_file)
+        if length:
+            self._stopped.wait(length)
+
+    def stop(self):
+        """Arrêter immédiatement le son en cours."""
+        with self._lock:
+            if self._channel is not None:
+                self._channel.stop()
+                self._channel = None
+            self._stopped.set()
+
+    def close(self):
+        with self._lock:
+            if self.available:
+                self.stop()
+                pygame.mixer.quit()
+                self.available = False
+
+
+_engine: Optional[ToneEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_tone_engine() -> ToneEngine:
+    """Moteur de sonneries partagé du processus, démarré à la première utilisation."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = ToneEngine().start()
+        return _engine
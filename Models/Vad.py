@@ -0,0 +1,93 @@
+"""
+Détection de la parole dans les enregistrements : silences retirés et statistiques de l'appel
+"""
+
+import math
+from collections import deque
+from typing import Dict, List, Optional
+import numpy as np
+from consts import VAD_FRAME_MS, VAD_HANGOVER, VAD_MAX_PAUSE, VAD_THRESHOLD_DB
+
+
+class SilenceTrimmer:
+    """Découpe un flux mono 16 bits en fenêtres de VAD_FRAME_MS et ne garde que la parole.
+
+    Le niveau (RMS, en dBFS) de toutes les fenêtres d'un bloc est calculé d'un coup ;
+    une fenêtre est parlée au-dessus de threshold_db. Le silence du début est retiré
+    (sauf les hangover secondes qui précèdent la parole) ; une pause n'est gardée
+    que sur ses max_pause premières secondes (None : pauses gardées entières).
+    Le silence de fin est écrit mais ne compte pas dans keep_frames : l'écrivain
+    tronque le fichier à la fermeture. La mémoire utilisée reste bornée.
+
+    Avec trim=False, rien n'est retiré : seules les statistiques sont calculées.
+    """
+
+    def __init__(self, samplerate: int, trim: bool = True, threshold_db: float = VAD_THRESHOLD_DB,
+                 hangover: float = VAD_HANGOVER, max_pause: Optional[float] = VAD_MAX_PAUSE):
+        self.samplerate = samplerate
+        self.trim = trim
+        self.threshold_db = threshold_db
+        self.window = max(1, samplerate * VAD_FRAME_MS // 1000)
+        hangover_windows = math.ceil(hangover * 1000 / VAD_FRAME_MS)
+        self.hangover = hangover_windows * self.window
+        self.max_pause = None if max_pause is None else max(hangover_windows, round(max_pause * 1000 / VAD_FRAME_MS))
+        self._pending = np.zeros(0, dtype=np.int16)
+        self._dropped = deque(maxlen=hangover_windows)  # Silence retiré juste avant la parole
+        self._since_voice: Optional[int] = None  # Fenêtres depuis la dernière fenêtre parlée ; None avant la parole
+        self.input_frames = 0
+        self.output_frames = 0
+        self.voice_end = 0  # Fin (en trames de sortie) de la dernière fenêtre parlée
+        self.voiced = 0  # Fenêtres parlées
+        self._voiced_energy = 0.0
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        """Échantillons à écrire pour ce bloc (dans l'ordre)."""
+        self.input_frames += len(samples)
+        data = np.concatenate((self._pending, samples)) if len(self._pending) else samples
+        count = len(data) // self.window
+        self._pending = data[count * self.window:]
+        windows = data[:count * self.window].reshape(count, self.window)
+        energy = np.mean(windows.astype(np.float64) ** 2, axis=1)
+        voiced = 10 * np.log10(np.maximum(energy, 1.0) / 32768.0 ** 2) > self.threshold_db
+        self.voiced += int(voiced.sum())
+        self._voiced_energy += float(energy[voiced].sum())
+        if not self.trim:
+            self.output_frames += len(samples)
+            return samples
+
+        output: List[np.ndarray] = []
+        for window, is_voiced in zip(windows, voiced):
+            if is_voiced:
+                output.extend(self._dropped)
+                self._dropped.clear()
+                output.append(window)
+                self._since_voice = 0
+                self.voice_end = self.output_frames + len(output) * self.window
+            elif self._since_voice is None:
+                self._dropped.append(window)
+            else:
+                self._since_voice += 1
+                if self.max_pause is None or self._since_voice <= self.max_pause:
+                    output.append(window)
+                else:
+                    self._dropped.append(window)
+        self.output_frames += len(output) * self.window
+        return np.concatenate(output) if output else np.zeros(0, dtype=np.int16)
+
+    @property
+    def keep_frames(self) -> int:
+        """Trames de sortie à garder : jusqu'à hangover après la dernière parole (tout sans trim)."""
+        if not self.trim:
+            return self.output_frames
+        return min(self.output_frames, self.voice_end + self.hangover) if self.voiced else 0
+
+    def metadata(self) -> Dict:
+        """Durée gardée, temps de parole et niveau moyen de la parole."""
+        voiced_samples = self.voiced * self.window
+        rms = math.sqrt(self._voiced_energy / self.voiced) if self.voiced else 0
+        return {
+            "duration": round(self.keep_frames / self.samplerate, 2),
+            "talk_time": round(voiced_samples / self.samplerate, 2),
+            "rms_dbfs": round(20 * math.log10(rms / 32768), 1) if rms else None,
+            "original_duration": round(self.input_frames / self.samplerate, 2),
+        }
@@ -3,7 +3,8 @@ Fonctions d'affichage pour les clients
 """
 
 from Views.Functions import print_header, print_menu, print_message, play_audio
-from Models.Client import ClientModel
+from Models.Service import get_client_model
+from Models.Recordings import RecordingStore
 from prettytable import PrettyTable
 
 
@@ -21,10 +22,9 @@ def display_client_menu():
 
 def display_call_history(client):
     """Afficher l'historique des appels du client."""
+    client_model = get_client_model()
     while True:  # Ajout d'une boucle pour maintenir la vue de l'historique active
-        client_model = ClientModel()
-        client = client_model.get_client_by_phone(client["phone"])
-        call_history = client["call_history"]
+        call_history = client_model.get_call_history(client["phone"])
 
         # Affichage de l'historique dans un tableau avec PrettyTable
         table = PrettyTable()
@@ -105,9 +105,22 @@ def display_call_details(call, client, call_index):
             print(f"Status : \033[41m\033[30m Non lu \033[0m")
         else:
             print(f"Status : \033[42m\033[30m Lu \033[0m")
+        if call.get("recording") == "deleted":
+            print("Enregistrement : supprimé (quota de stockage)")
+        elif not call.get("audio_file"):
+            print("Enregistrement : non enregistré")
+        else:
+            # Durée du message lue dans ses métadonnées, sans ouvrir l'enregistrement
+            metadata = RecordingStore().metadata(call["audio_file"])
+            if metadata:
+                print(f"Message : {metadata['duration']} secondes (parole : {metadata['talk_time']} secondes)")
         print("-" * 40)
         print("")
 
+        if not call.get("audio_file"):
+            input("Appuyez sur [Entrée] pour revenir à l'historique.")
+            return
+
         choix = input("Que souhaitez-vous faire ?\n"
                       "- [o] Écouter le message vocal\n"
                       "- [Entrée] Revenir à l'historique\n"
@@ -115,7 +128,7 @@ def display_call_details(call, client, call_index):
         if choix.lower() == 'o':
             if play_audio(call['audio_file']):
                 call["status"] = "read"
-                client_model = ClientModel()
+                client_model = get_client_model()
                 client_model.update_call_status(client["phone"], call_index, "read")
                 print(f"Statut de l'appel mis à jour à : Lu")
         elif choix == '':
@@ -123,3 +136,15 @@ def display_call_details(call, client, call_index):
         else:
             print_message("Veuillez entrer 'o', ou 'Entrée'.", "ERROR")
 
+
+
+def display_transfer_results(results: list):
+    """Affiche les lignes rejetées d'un transfert en masse et le bilan."""
+    print_header("Résultat des transferts de crédit")
+    for result in results:
+        if not result["ok"]:
+            print(f"Ligne {result['line']} ({result['phone'] or '-'}) : {result['message']}")
+    accepted = sum(1 for result in results if result["ok"])
+    print("-" * 30)
+    print_message(f"{accepted} transfert(s) enregistré(s), {len(results) - accepted} rejeté(s).",
+                  "SUCCESS" if accepted == len(results) else "INFO")
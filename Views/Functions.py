@@ -3,7 +3,11 @@ Fonctions d'affichage communes
 """
 
 import wave
-import pyaudio
+from contextvars import ContextVar
+from typing import Optional, TextIO
+from consts import PLAYBACK_SKIP_SECONDS
+from Models.Devices import get_devices
+from Models.Recordings import RecordingStore
 
 
 def print_header(title: str):
@@ -20,6 +24,10 @@ def print_menu(options: list, zero_option_text: str = "Quitter"):
     print(f"0. {zero_option_text}")
 
 
+# Destination des messages de la requête en cours (service des modèles) ; None : la console
+message_sink: ContextVar[Optional[TextIO]] = ContextVar("message_sink", default=None)
+
+
 def print_message(message: str, message_type: str = "INFO"):
     """Affiche un message de type spécifié."""
     colors = {
@@ -28,47 +36,52 @@ def print_message(message: str, message_type: str = "INFO"):
         "INFO": "\033[94m"
     }
     color = colors.get(message_type.upper(), "\033[94m")
-    print(f"\n{color}[{message_type.upper()}] {message}\033[0m\n")
+    print(f"\n{color}[{message_type.upper()}] {message}\033[0m\n", file=message_sink.get())
+
+
+def read_command(timeout: float) -> Optional[str]:
+    """Ligne saisie dans le délai (sans le retour à la ligne), None sinon."""
+    # Clavier lu par les périphériques du poste, comme pendant un appel
+    kind, value = get_devices().next_event(timeout)
+    return value if kind == "key" else None
 
 
 def play_audio(file_path):
-    # Ouvrir le fichier audio en mode lecture
+    """Écouter un enregistrement ; la lecture peut être déplacée ou arrêtée au clavier."""
+    # PyAudio importé à la première écoute : les modèles se chargent sans carte son
+    from Models.Playback import get_playback_engine
     try:
-        # Ouvrir le fichier audio en mode lecture
-        with wave.open(file_path, 'rb') as wf:
-            # Initialiser PyAudio
-            p = pyaudio.PyAudio()
-
-            # Ouvrir un flux de lecture avec PyAudio
-            stream = p.open(format=pyaudio.paInt16,
-                            channels=wf.getnchannels(),
-                            rate=wf.getframerate(),
-                            output=True)
-
-            duration = wf.getnframes() / wf.getframerate()
-            duration = int(duration)
-            print("")
-            print_message(f"Durée du fichier : {duration} seconde(s)", "INFO")
-            print("Lecture en cours...")
-
-            # Lire et jouer le fichier audio
-            data = wf.readframes(1024)
-            while data:
-                stream.write(data)
-                data = wf.readframes(1024)
-
-            # Fermer le flux après la lecture
-            stream.stop_stream()
-            stream.close()
-
-            # Terminer PyAudio
-            p.terminate()
-
-            # Message après la lecture
-            print("")
-            print_message("Lecture terminée.", "INFO")
-            print("")
-            return True
+        # Enregistrement sur disque ou archivé, lu par le lecteur partagé de la session
+        store = RecordingStore()
+        engine = get_playback_engine()
+        engine.load(store.open(file_path))
+
+        print("")
+        metadata = store.metadata(file_path)
+        talk_time = f" dont {int(metadata['talk_time'])} de parole" if metadata else ""
+        print_message(f"Durée du fichier : {int(engine.duration)} seconde(s){talk_time}", "INFO")
+        print(f"Lecture en cours... [+] / [-] avancer / reculer de {PLAYBACK_SKIP_SECONDS} s, "
+              "[nombre] aller à la seconde, [Entrée] arrêter.")
+        engine.play()
+
+        while not engine.wait(0):
+            command = read_command(0.2)
+            if command is None:
+                continue
+            if command == "":
+                engine.stop()
+            elif command == "+":
+                engine.skip(PLAYBACK_SKIP_SECONDS)
+            elif command == "-":
+                engine.skip(-PLAYBACK_SKIP_SECONDS)
+            elif command.isdigit():
+                engine.seek(int(command))
+
+        # Message après la lecture
+        print("")
+        print_message("Lecture terminée.", "INFO")
+        print("")
+        return True
     except FileNotFoundError:
         print_message("Le fichier audio est introuvable.", "ERROR")
     except wave.Error:
@@ -17,6 +17,7 @@ def display_operator_menu():
         "Vendre un numéro",
         "Vendre du crédit",
         "État de la caisse",
+        "Ventes en masse (CSV)",
     ]
     return options
 
@@ -48,3 +49,39 @@ def display_index_menu():
     print_menu(options)
     return options
 
+
+def display_provisioning_results(results: list):
+    """Affiche les lignes rejetées d'un lot de ventes et le bilan."""
+    print_header("Résultat des ventes en masse")
+    for result in results:
+        if not result["ok"]:
+            print(f"Ligne {result['line']} ({result['phone'] or '-'}) : {result['message']}")
+    accepted = sum(1 for result in results if result["ok"])
+    print("-" * 30)
+    print_message(f"{accepted} ligne(s) enregistrée(s), {len(results) - accepted} rejetée(s).",
+                  "SUCCESS" if accepted == len(results) else "INFO")
+
+
+def display_rating_totals(rows: list, total: dict):
+    """Affiche les cumuls par opérateur d'une re-tarification."""
+    print_header("Re-tarification des appels")
+    print(f"{'Opérateur':<16}{'Appels':>10}{'Durée (s)':>12}{'Facturé':>14}{'Recalculé':>14}{'Écart':>14}")
+    for row in rows:
+        print(f"{row['operator']:<16}{row['calls']:>10}{row['duration']:>12}{row['billed']:>14}"
+              f"{row['rated']:>14}{row['difference']:>14}")
+    print("-" * 80)
+    print_message(f"{total['calls']} appel(s) : {total['billed']}F facturés, {total['rated']}F avec le tarif proposé.", "INFO")
+
+
+def display_report(title: str, totals: dict):
+    """Affiche un rapport de cumuls : une ligne par clé (opérateur, jour, sens...), une colonne par cumul."""
+    print_header(title)
+    if not totals:
+        print_message("Aucune donnée pour cette période.", "INFO")
+        return
+    columns = list(next(iter(totals.values())))
+    print(f"{'':<16}" + "".join(f"{column:>16}" for column in columns))
+    for key, values in totals.items():
+        cells = [int(values[column]) if float(values[column]).is_integer() else round(values[column], 2)
+                 for column in columns]
+        print(f"{str(key):<16}" + "".join(f"{cell:>16}" for cell in cells))
@@ -0,0 +1,34 @@
+"""
+Ventes en masse de numéros et de crédit à partir d'un fichier CSV
+"""
+
+import argparse
+from Controllers.Provisioning import ProvisioningController
+from Models.Service import connect_service
+from Views.Functions import print_message
+from Views.Operateur import display_provisioning_results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vendre des numéros (opérateur,numéro,PIN) et du crédit (numéro,montant) en un seul lot.")
+    parser.add_argument("csv_file", help="Fichier CSV des ventes")
+    parser.add_argument("--manager", help="Gestionnaire à qui attribuer les ventes de crédit")
+    parser.add_argument("--strict", action="store_true", help="Ne rien enregistrer si une ligne est invalide")
+    parser.add_argument("--dry-run", action="store_true", help="Valider le fichier sans rien enregistrer")
+    parser.add_argument("--report", help="Écrire le résultat de chaque ligne dans ce fichier CSV")
+    args = parser.parse_args()
+
+    # Modèles servis par le démon (python service.py) s'il est démarré
+    connect_service()
+    controller = ProvisioningController()
+    results = controller.provision(args.csv_file, args.manager, strict=args.strict, dry_run=args.dry_run)
+    display_provisioning_results(results)
+    if args.dry_run:
+        print_message("Vérification seule : aucune vente n'a été enregistrée.", "INFO")
+    if args.report:
+        controller.write_report(results, args.report)
+    return 0 if all(result["ok"] for result in results) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,17 +1,49 @@
-"""
-Fichier de configuration contenant toutes les constantes de l'application
-"""
-
-# Configuration des opérateurs
-MIN_OPERATOR_NAME_LENGTH = 3
-MAX_OPERATOR_NAME_LENGTH = 15
-MAX_INDEX_NUMBERS = 3
-INDEX_LENGTH = 2
-PHONE_NUMBER_LENGTH = 9
-
-# Configuration des transactions
-MIN_CREDIT_AMOUNT = 100
-
-# Configuration de l'authentification
-PIN_LENGTH = 4
-
+"""
+Fichier de configuration contenant toutes les constantes de l'application
+"""
+
+# Configuration des opérateurs
+MIN_OPERATOR_NAME_LENGTH = 3
+MAX_OPERATOR_NAME_LENGTH = 15
+MAX_INDEX_NUMBERS = 3
+MIN_INDEX_LENGTH = 2  # Longueur minimale (chiffres) d'un index (préfixe des numéros de l'opérateur)
+MAX_INDEX_LENGTH = 4  # Longueur maximale (chiffres) d'un index
+PHONE_NUMBER_LENGTH = 9
+POOL_SIZE = 100  # Nombre de numéros générés pour chaque index
+
+# Configuration des transactions
+MIN_CREDIT_AMOUNT = 100
+DEFAULT_CALL_RATE = 2  # Tarif (F/s) d'un appel dont l'un des numéros n'appartient à aucun opérateur
+CREDIT_CHECKPOINT_INTERVAL = 10  # Secondes entre deux enregistrements du crédit consommé pendant un appel
+SETTLED_RESERVATIONS_KEPT = 16  # Réservations de crédit réglées mémorisées par client (remboursement unique après un arrêt brutal)
+CALL_RING_TIMEOUT = 20  # Durée (secondes) de la sonnerie avant l'abandon d'un appel sans réponse
+RECORDING_CODEC = "mulaw"  # Format des enregistrements d'appels : "mulaw", "alaw" (G.711, 8 bits) ou "pcm" (16 bits)
+RECORDING_SAMPLERATE = 8000  # Fréquence (Hz) des enregistrements ; None garde celle du périphérique
+RECORDING_TRIM_SILENCE = True  # Retirer des enregistrements le silence du début et de la fin et raccourcir les longues pauses
+VAD_THRESHOLD_DB = -45  # Niveau (dBFS) au-dessus duquel une fenêtre d'enregistrement contient de la parole
+VAD_FRAME_MS = 20  # Durée (ms) des fenêtres analysées par la détection de parole
+VAD_HANGOVER = 0.3  # Silence (secondes) gardé avant et après la parole
+VAD_MAX_PAUSE = 1.5  # Durée maximale (secondes) gardée d'une pause ; None garde les pauses entières
+RECORDING_QUEUE_BLOCKS = 256  # Blocs audio en attente d'écriture au maximum pendant l'enregistrement d'un appel
+PLAYBACK_BUFFER_FRAMES = 4096  # Trames par tampon du flux de lecture des messages vocaux
+PLAYBACK_SKIP_SECONDS = 10  # Saut (secondes) des commandes [+] et [-] pendant l'écoute d'un message
+RECORDINGS_QUOTA = 2 * 1024 ** 3  # Place (octets) des enregistrements et de leurs archives au-delà de laquelle les plus anciens sont supprimés
+RECORDINGS_ARCHIVE_AFTER = 30  # Jours sans écoute avant l'archivage d'un enregistrement
+
+# Configuration de l'authentification
+PIN_LENGTH = 4
+
+
+# Configuration du stockage
+DATA_DIR = "BD"
+STORAGE_BACKEND = "json"  # "json" (petites installations) ou "sqlite"
+JOURNAL_COMPACTION_SIZE = 1024 * 1024  # Taille du journal (octets) déclenchant une compaction
+HISTORY_SEGMENT_SIZE = 256  # Nombre d'appels par segment d'historique
+MODEL_CACHE_SIZE = 10000  # Nombre maximal d'instantanés gardés par le cache des modèles
+RECORD_LOCK_STRIPES = 4096  # Nombre de verrous par enregistrement (plages du fichier de verrous)
+OPERATOR_UPDATE_RETRIES = 5  # Tentatives d'une modification d'opérateur en conflit avec une autre session
+SALES_FOLD_SIZE = 64 * 1024  # Ventes récentes (octets du journal des ventes) cumulées en mémoire avant leur intégration aux cumuls par période
+
+# Configuration du service des modèles (python service.py)
+SERVICE_SOCKET = "BD/service.sock"  # Socket Unix du service, partagé par les sessions du poste
+SERVICE_PORT = 8765  # Port local (127.0.0.1) du service quand les sockets Unix ne sont pas disponibles (Windows)
@@ -0,0 +1,46 @@
+"""
+Export en colonnes des appels et des ventes, et rapports sur les données exportées
+"""
+
+import argparse
+import os
+from datetime import date
+from consts import DATA_DIR
+from Models.Analytics import AnalyticsExport
+from Views.Functions import print_message
+from Views.Operateur import display_report
+
+
+# Rapport -> (titre, méthode de AnalyticsExport)
+REPORTS = {
+    "calls-operator": ("Appels par opérateur", "calls_by_operator"),
+    "calls-day": ("Appels par jour", "calls_by_day"),
+    "calls-direction": ("Appels par sens", "calls_by_direction"),
+    "sales-operator": ("Ventes par opérateur", "sales_by_operator"),
+    "sales-manager": ("Ventes par gestionnaire", "sales_by_manager"),
+    "sales-day": ("Ventes par jour", "sales_by_day"),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporter les appels et les ventes en colonnes, puis afficher des rapports.")
+    parser.add_argument("--output", default=os.path.join(DATA_DIR, "analytics"), help="Répertoire de l'export")
+    parser.add_argument("--no-export", action="store_true", help="Ne pas ajouter les nouvelles données avant les rapports")
+    parser.add_argument("--report", choices=sorted(REPORTS), action="append", default=[], help="Rapport à afficher ; répétable")
+    parser.add_argument("--from", dest="start", type=date.fromisoformat, help="Premier jour des rapports (AAAA-MM-JJ)")
+    parser.add_argument("--to", dest="end", type=date.fromisoformat, help="Dernier jour inclus des rapports (AAAA-MM-JJ)")
+    args = parser.parse_args()
+
+    analytics = AnalyticsExport(args.output)
+    if not args.no_export:
+        added = analytics.export()
+        print_message(f"{added['calls']} appel(s) et {added['sales']} vente(s) ajoutés à l'export {args.output}.", "SUCCESS")
+        if added["undated"]:
+            print_message(f"{added['undated']} appel(s) sans date exploitable : comptés seulement dans les rapports sans période.", "INFO")
+    for report in args.report:
+        title, method = REPORTS[report]
+        display_report(title, getattr(analytics, method)(args.start, args.end))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,13 +3,27 @@ Point d'entrée principal de l'application
 """
 
 from Controllers.Functions import get_user_choice, handle_operator_menu, handle_client_menu
-from Views.Functions import print_header, print_menu
+from Views.Functions import print_header, print_menu, print_message
 from Controllers.Client import ClientController
 from Controllers.Operateur import OperateurController
+from Models.CreditMeter import recover_reservations
+from Models.Devices import stdin_lines
+from Models.Service import connect_service
+from Models.Tones import get_tone_engine
 
 
 def main():
     try:
+        # Entrée standard lue par un seul tampon avant le premier input() (menus, appels, écoute)
+        stdin_lines()
+        # Données servies par le démon (python service.py) s'il est démarré, lues localement sinon
+        if connect_service():
+            print_message("Connecté au service des modèles.", "INFO")
+        # Appels interrompus par un arrêt brutal : crédit réservé non consommé rendu aux clients,
+        # dans le stockage du démon s'il est connecté
+        recover_reservations()
+        # Mixeur ouvert et sonneries décodées en arrière-plan pendant la navigation dans les menus
+        get_tone_engine()
         while True:
             print_header("Système de Gestion Télécom")
 
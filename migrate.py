@@ -0,0 +1,80 @@
+"""
+Migration ponctuelle des fichiers JSON (BD/*.txt) vers la base SQLite
+"""
+
+import argparse
+import os
+from typing import Dict
+from consts import DATA_DIR
+from Models.JsonBackend import JsonBackend
+from Models.SqliteBackend import SqliteBackend
+from Views.Functions import print_message
+
+
+def migrate(data_dir: str, database: str, batch_size: int = 1000) -> Dict[str, int]:
+    """Copie clients, historiques, opérateurs, caisses et ventes dans une nouvelle base SQLite."""
+    source = JsonBackend(data_dir)
+    # La base est construite à côté puis mise en place d'un seul coup
+    tmp_database = f"{database}.tmp"
+    for path in (tmp_database, f"{tmp_database}-wal", f"{tmp_database}-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+
+    target = SqliteBackend(tmp_database)
+    counts = {"clients": 0, "calls": 0, "operators": 0, "sales": 0}
+    batch = []
+    # Les clients sont lus en flux et insérés par lots : la mémoire reste bornée
+    for client in source.iter_clients():
+        client["call_history"] = source.get_call_history(client["phone"])
+        batch.append(client)
+        counts["clients"] += 1
+        counts["calls"] += len(client["call_history"])
+        if len(batch) >= batch_size:
+            target.insert_clients(batch)
+            batch = []
+    if batch:
+        target.insert_clients(batch)
+
+    operators = source.load_operators()
+    target.save_operators(operators)
+    counts["operators"] = len(operators)
+    target.save_cashier(source.load_cashier())
+    # Les cumuls par compartiment sont recalculés à l'insertion
+    batch = []
+    for sale in source.iter_sales():
+        batch.append(sale)
+        counts["sales"] += 1
+        if len(batch) >= batch_size:
+            target.record_sales(batch)
+            batch = []
+    if batch:
+        target.record_sales(batch)
+    target.close()
+
+    # Fichiers WAL d'une éventuelle ancienne base : ils ne doivent pas être rejoués sur la nouvelle
+    for path in (f"{database}-wal", f"{database}-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    os.replace(tmp_database, database)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrer les données JSON vers SQLite.")
+    parser.add_argument("--source", default=DATA_DIR, help="Répertoire des fichiers JSON")
+    parser.add_argument("--database", default=os.path.join(DATA_DIR, "gota.db"), help="Base SQLite à créer")
+    parser.add_argument("--force", action="store_true", help="Remplacer une base existante")
+    args = parser.parse_args()
+
+    if os.path.exists(args.database) and not args.force:
+        print_message(f"La base {args.database} existe déjà (utilisez --force pour la remplacer).", "ERROR")
+        return
+
+    counts = migrate(args.source, args.database)
+    print_message(f"{counts['clients']} client(s), {counts['calls']} appel(s) et "
+                  f"{counts['operators']} opérateur(s) et {counts['sales']} vente(s) migrés vers {args.database}.", "SUCCESS")
+    print_message("Pour utiliser la base, définissez STORAGE_BACKEND = \"sqlite\" dans consts.py.", "INFO")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Rétention des enregistrements d'appels : archivage des anciens et respect du quota disque
+"""
+
+import argparse
+from consts import RECORDINGS_ARCHIVE_AFTER, RECORDINGS_QUOTA
+from Models.Recordings import RecordingStore
+from Views.Functions import print_message
+
+
+def _megabytes(size: int) -> str:
+    return f"{size / (1024 * 1024):.1f} Mo"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archiver les enregistrements d'appels anciens et supprimer les moins écoutés au-delà du quota.")
+    parser.add_argument("--quota", type=int, default=RECORDINGS_QUOTA // (1024 * 1024), help="Place maximale des enregistrements et archives (Mo)")
+    parser.add_argument("--archive-after", type=float, default=RECORDINGS_ARCHIVE_AFTER, help="Jours sans écoute avant archivage")
+    parser.add_argument("--no-sync", action="store_true", help="Ne pas indexer les fichiers de BD/calls absents de l'index")
+    args = parser.parse_args()
+
+    store = RecordingStore(quota=args.quota * 1024 * 1024, archive_after=args.archive_after)
+    if not args.no_sync:
+        added = store.sync()
+        if added:
+            print_message(f"{added} enregistrement(s) ajouté(s) à l'index.", "INFO")
+    result = store.enforce()
+    print_message(f"{result['archived']} enregistrement(s) archivé(s), {result['deleted']} supprimé(s) "
+                  f"({result['history']} appel(s) mis à jour dans les historiques).", "SUCCESS")
+    usage = store.usage()
+    print_message(f"Sur disque : {usage['disk']} ({_megabytes(usage['disk_bytes'])}). "
+                  f"Archivés : {usage['archived']} ({_megabytes(usage['archive_bytes'])}). "
+                  f"Supprimés : {usage['deleted']}.", "INFO")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Re-tarification des appels passés avec un tarif proposé
+"""
+
+import argparse
+from datetime import date, datetime, timedelta
+from Models.Operateur import OperateurModel
+from Models.Rating import CallRecords, RatingEngine, RatingResult
+from Views.Functions import print_message
+from Views.Operateur import display_rating_totals
+
+
+def parse_rate(value: str) -> tuple:
+    """NOM=MEME,AUTRE -> (nom, rates)."""
+    try:
+        name, rates = value.split("=", 1)
+        same, different = (float(rate) for rate in rates.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Tarif invalide : {value} (attendu NOM=MEME,AUTRE)")
+    return name, {"same_operator": same, "different_operator": different}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recalculer le coût des appels passés avec un tarif proposé.")
+    parser.add_argument("--rate", type=parse_rate, action="append", default=[], metavar="NOM=MEME,AUTRE",
+                        help="Tarif proposé pour un opérateur (même opérateur, autre opérateur) ; répétable")
+    parser.add_argument("--from", dest="start", type=date.fromisoformat, help="Premier jour (AAAA-MM-JJ)")
+    parser.add_argument("--to", dest="end", type=date.fromisoformat, help="Dernier jour inclus (AAAA-MM-JJ)")
+    parser.add_argument("--operators-report", help="Écrire les cumuls par opérateur dans ce fichier CSV")
+    parser.add_argument("--subscribers-report", help="Écrire les cumuls par abonné dans ce fichier CSV")
+    args = parser.parse_args()
+
+    operators = OperateurModel().get_all_operators()
+    names = {operator["name"].lower(): operator["name"] for operator in operators}
+    overrides = {}
+    for name, rates in args.rate:
+        if name.lower() not in names:
+            print_message(f"L'opérateur {name} n'existe pas.", "ERROR")
+            return 1
+        overrides[names[name.lower()]] = rates
+
+    start = datetime.combine(args.start, datetime.min.time()).timestamp() if args.start else None
+    end = datetime.combine(args.end + timedelta(days=1), datetime.min.time()).timestamp() if args.end else None
+    records = CallRecords.load(start=start, end=end)
+    if records.undated:
+        if start is not None or end is not None:
+            print_message(f"{records.undated} appel(s) sans date exploitable ignoré(s) par --from/--to.", "INFO")
+        else:
+            print_message(f"{records.undated} appel(s) sans date exploitable inclus dans les cumuls.", "INFO")
+    result = RatingEngine(records, operators).rerate(overrides)
+
+    display_rating_totals(result.by_operator(), result.total())
+    if args.operators_report:
+        RatingResult.write_csv(result.by_operator(), args.operators_report)
+    if args.subscribers_report:
+        RatingResult.write_csv(result.by_subscriber(), args.subscribers_report)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,38 @@
+"""
+Démon des modèles : données des clients et des opérateurs gardées en mémoire et servies
+aux sessions (python main.py) par une socket locale
+"""
+
+import argparse
+import asyncio
+from consts import SERVICE_PORT
+from Models.Backend import set_default_backend
+from Models.CreditMeter import recover_reservations
+from Models.Service import ModelService, default_address
+from Views.Functions import print_message
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servir les modèles aux sessions du poste (menus, points de vente).")
+    parser.add_argument("--socket", help="Socket Unix du service (par défaut BD/service.sock)")
+    parser.add_argument("--port", type=int, help=f"Écouter sur 127.0.0.1 et ce port plutôt que sur une socket Unix (ex. {SERVICE_PORT})")
+    parser.add_argument("--backend", choices=("json", "sqlite"), help="Moteur de stockage (par défaut STORAGE_BACKEND)")
+    args = parser.parse_args()
+
+    if args.backend:
+        set_default_backend(args.backend)
+    address = ("127.0.0.1", args.port) if args.port else args.socket or default_address()
+    # Appels interrompus par un arrêt brutal : crédit réservé non consommé rendu aux clients
+    recover_reservations()
+    service = ModelService(address)
+    print_message(f"Service démarré sur {address}. Ctrl+C pour l'arrêter.", "INFO")
+    try:
+        asyncio.run(service.serve())
+    except RuntimeError as e:
+        print_message(str(e), "ERROR")
+        return
+    print_message(f"Service arrêté après {service.requests} requête(s).", "INFO")
+
+
+if __name__ == "__main__":
+    main()
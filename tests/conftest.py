@@ -0,0 +1,36 @@
+"""
+Fixtures communes : chaque test travaille dans un répertoire vide (les modèles utilisent BD/ en relatif)
+"""
+
+import pytest
+from Models import Journal
+from Models.Backend import create_backend
+from Models.JsonBackend import JsonBackend
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def backend(request, workdir):
+    backend = create_backend(request.param)
+    yield backend
+    backend.close()
+
+
+@pytest.fixture
+def json_backend(workdir):
+    return JsonBackend()
+
+
+def restart() -> JsonBackend:
+    """Moteur JSON rouvert comme par un nouveau processus : état en mémoire des journaux oublié."""
+    Journal._states.clear()
+    return JsonBackend()
+
+
+def new_client(phone: str, credit: float = 0) -> dict:
+    return {"phone": phone, "pin": "1234", "credit": credit, "contacts": [], "blocked_contacts": []}
@@ -0,0 +1,116 @@
+"""
+Export en colonnes des appels et des ventes : cumuls, export incrémental et reprise
+"""
+
+import random
+from datetime import date, datetime
+import pytest
+from Models import Analytics
+from Models.Analytics import AnalyticsExport
+from Models.Backend import create_backend
+from Models.Sales import new_sale
+from conftest import new_client
+
+DAY = datetime(2026, 3, 14, 10, 0)
+
+
+def operator(name: str, index: str) -> dict:
+    return {"name": name, "indexes": [index], "pools": {}, "rates": {"same_operator": 1, "different_operator": 2}}
+
+
+def call(direction: str, duration: int, day: int = 14, **fields) -> dict:
+    when = DAY.replace(day=day)
+    return dict({"direction": direction, "number": "780000001", "status": "read", "duration": duration,
+                 "cost": duration * 2, "timestamp": int(when.timestamp())}, **fields)
+
+
+@pytest.fixture
+def backend(backend):
+    backend.insert_operator(operator("Orange", "77"))
+    backend.insert_operator(operator("Free", "78"))
+    for phone in ("771000001", "781000001"):
+        backend.insert_client(new_client(phone))
+    return backend
+
+
+def sales(count: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    return [new_sale(f"gestionnaire{rng.randrange(2)}", rng.choice(("Orange", "Free")), rng.randrange(100, 1000, 100),
+                     "771000001", DAY.replace(day=1 + rng.randrange(28)).timestamp()) for _ in range(count)]
+
+
+def amounts_by_operator(sales_list) -> dict:
+    totals = {}
+    for sale in sales_list:
+        total = totals.setdefault(sale["operator"], {"count": 0, "amount": 0})
+        total["count"] += 1
+        total["amount"] += sale["amount"]
+    return totals
+
+
+def test_call_aggregates(backend):
+    backend.add_call("771000001", call("outgoing", 10))
+    backend.add_call("771000001", call("incoming", 20, day=15))
+    backend.add_call("781000001", call("outgoing", 30))
+    backend.add_call("781000001", {"direction": "outgoing", "number": "771000001", "duration": 5, "cost": 10,
+                                   "date": "illisible"})
+    export = AnalyticsExport(backend=backend)
+    assert export.export() == {"calls": 4, "sales": 0, "undated": 1}
+    assert export.calls_by_operator() == {"Orange": {"count": 2, "duration": 30, "cost": 60},
+                                          "Free": {"count": 2, "duration": 35, "cost": 70}}
+    assert export.calls_by_operator(direction="incoming") == {"Orange": {"count": 1, "duration": 20, "cost": 40}}
+    # L'appel sans date n'entre dans aucune période
+    assert export.calls_by_day(date(2026, 3, 1), date(2026, 3, 31)) == {
+        date(2026, 3, 14): {"count": 2, "duration": 40, "cost": 80},
+        date(2026, 3, 15): {"count": 1, "duration": 20, "cost": 40},
+    }
+    assert export.calls_by_direction()["outgoing"]["count"] == 3
+
+
+def test_export_only_adds_what_is_new(backend):
+    backend.add_call("771000001", call("outgoing", 10))
+    backend.record_sales(sales(5))
+    export = AnalyticsExport(backend=backend)
+    assert export.export() == {"calls": 1, "sales": 5, "undated": 0}
+    assert export.export() == {"calls": 0, "sales": 0, "undated": 0}
+    backend.add_call("771000001", call("outgoing", 20))
+    backend.record_sales(sales(3, seed=2))
+    assert AnalyticsExport(backend=backend).export() == {"calls": 1, "sales": 3, "undated": 0}
+    assert export.calls_by_operator()["Orange"] == {"count": 2, "duration": 30, "cost": 60}
+    assert export.sales_by_operator() == amounts_by_operator(sales(5) + sales(3, seed=2))
+
+
+def test_interrupted_export_resumes_without_duplicates(backend, monkeypatch):
+    recorded = sales(25)
+    backend.record_sales(recorded)
+    monkeypatch.setattr(Analytics, "EXPORT_CHUNK", 4)
+    iter_sales_after = backend.iter_sales_after
+
+    def interrupted(position):
+        for count, item in enumerate(iter_sales_after(position)):
+            if count == 10:
+                raise KeyboardInterrupt
+            yield item
+
+    export = AnalyticsExport(backend=backend)
+    with monkeypatch.context() as patch, pytest.raises(KeyboardInterrupt):
+        patch.setattr(backend, "iter_sales_after", interrupted)
+        export.export()
+    assert export.sales_file.read_header()["count"] == 8  # Deux blocs enregistrés avant l'arrêt
+    assert export.export()["sales"] == 17
+    assert export.sales_by_operator() == amounts_by_operator(recorded)
+
+
+def test_sales_exported_from_another_backend_are_not_counted_twice(workdir):
+    recorded = sales(12)
+    json_backend, sqlite_backend = create_backend("json"), create_backend("sqlite")
+    for backend in (json_backend, sqlite_backend):
+        backend.record_sales(recorded)
+    assert AnalyticsExport(backend=json_backend).export()["sales"] == 12
+    # Données migrées vers SQLite : les ventes déjà exportées sont sautées une fois
+    export = AnalyticsExport(backend=sqlite_backend)
+    assert export.export()["sales"] == 0
+    sqlite_backend.record_sales(sales(2, seed=3))
+    assert export.export()["sales"] == 2
+    assert export.sales_by_operator() == amounts_by_operator(recorded + sales(2, seed=3))
+    sqlite_backend.close()
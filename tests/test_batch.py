@@ -0,0 +1,76 @@
+"""
+Lots de ventes (apply_batch) : tout le lot est enregistré, ou rien
+"""
+
+from datetime import datetime
+from Models.Sales import bucket_keys, new_sale
+from conftest import new_client, restart
+
+TIMESTAMP = datetime(2026, 3, 14, 10, 0).timestamp()
+DAY = bucket_keys(TIMESTAMP)[2]
+
+
+def operator(name: str = "Orange", index: str = "77") -> dict:
+    return {"name": name, "indexes": [index], "pools": {}, "rates": {"same_operator": 1, "different_operator": 2}}
+
+
+def sale(phone: str, amount: float) -> dict:
+    return new_sale("gestionnaire", "Orange", amount, phone, TIMESTAMP)
+
+
+def test_batch_is_applied(backend):
+    backend.insert_client(new_client("771000001", 100))
+    backend.insert_operator(operator())
+    current = backend.load_operators()[0]
+
+    assert backend.apply_batch([new_client("771000002")], [("771000001", 500), ("771000002", 200)],
+                               [dict(current, rates={"same_operator": 3, "different_operator": 4})],
+                               [sale("771000001", 500), sale("771000002", 200)])
+
+    assert backend.get_client("771000001")["credit"] == 600
+    assert backend.get_client("771000002")["credit"] == 200
+    assert backend.load_operators()[0]["rates"]["same_operator"] == 3
+    assert backend.sales_totals([DAY]) == {"gestionnaire": {"Orange": 700}}
+
+
+def test_existing_client_rejects_the_whole_batch(backend):
+    backend.insert_client(new_client("771000001", 100))
+
+    assert not backend.apply_batch([new_client("771000002"), new_client("771000001")], [("771000001", 500)],
+                                   None, [sale("771000001", 500)])
+
+    assert not backend.client_exists("771000002")
+    assert backend.get_client("771000001")["credit"] == 100
+    assert backend.sales_totals([DAY]) == {}
+
+
+def test_operator_conflict_rejects_the_whole_batch(backend):
+    backend.insert_client(new_client("771000001", 100))
+    backend.insert_operator(operator())
+    stale = backend.load_operators()[0]
+    # Modification par une autre session après la lecture
+    backend.replace_operator("Orange", dict(stale, rates={"same_operator": 5, "different_operator": 5}),
+                             stale["version"])
+
+    assert not backend.apply_batch([new_client("771000002")], [("771000001", 500)], [stale],
+                                   [sale("771000001", 500)])
+
+    assert not backend.client_exists("771000002")
+    assert backend.get_client("771000001")["credit"] == 100
+    assert backend.load_operators()[0]["rates"]["same_operator"] == 5
+    assert backend.sales_totals([DAY]) == {}
+
+
+def test_batch_sales_are_restored_after_a_crash(json_backend):
+    json_backend.insert_client(new_client("771000001"))
+    assert json_backend.apply_batch([], [("771000001", 300)], None, [sale("771000001", 300)])
+    # Arrêt brutal : lot écrit dans le journal des mutations, ventes jamais enregistrées
+    json_backend.journal.append([{"op": "credit", "phone": "771000001", "amount": 200}], [sale("771000001", 200)])
+
+    backend = restart()
+    assert backend.get_client("771000001")["credit"] == 500
+    assert backend.sales_totals([DAY]) == {"gestionnaire": {"Orange": 500}}
+    # Ventes enregistrées une seule fois, même après la compaction
+    backend.compact()
+    assert restart().sales_totals([DAY]) == {"gestionnaire": {"Orange": 500}}
+    assert len(list(backend.iter_sales())) == 2
@@ -0,0 +1,101 @@
+"""
+Cache partagé des modèles : lecture à travers le cache, invalidation par signature et par écriture
+"""
+
+import pytest
+from Models.Backend import create_backend
+from Models.Cache import ModelCache, freeze, thaw
+from Models.Client import ClientModel
+from Models.Operateur import OperateurModel
+from Models.Routing import get_router
+from conftest import new_client
+
+
+class Loader:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return {"calls": self.calls, "items": [1, 2]}
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def sessions(request, workdir):
+    # Deux sessions sur le même répertoire, comme deux terminaux
+    first, second = create_backend(request.param), create_backend(request.param)
+    yield first, second
+    first.close()
+    second.close()
+
+
+def test_entries_are_reloaded_when_the_signature_changes():
+    cache, loader = ModelCache(), Loader()
+    assert cache.get("clients", "a", 1, loader)["calls"] == 1
+    assert cache.get("clients", "a", 1, loader)["calls"] == 1
+    assert cache.get("clients", "a", 2, loader)["calls"] == 2
+    assert cache.stats()["clients"] == {"hits": 1, "misses": 2, "entries": 1}
+
+
+def test_invalidate_only_affects_its_namespace():
+    cache, clients, operators = ModelCache(), Loader(), Loader()
+    cache.get("clients", "a", None, clients)
+    cache.get("operators", "a", None, operators)
+    cache.invalidate("clients")
+    cache.get("clients", "a", None, clients)
+    cache.get("operators", "a", None, operators)
+    assert (clients.calls, operators.calls) == (2, 1)
+
+
+def test_write_during_a_load_is_not_hidden():
+    cache = ModelCache()
+
+    def loader():
+        cache.invalidate("clients")  # Écriture d'un autre fil pendant le chargement
+        return "périmé"
+
+    assert cache.get("clients", "a", None, loader) == "périmé"
+    assert cache.get("clients", "a", None, lambda: "à jour") == "à jour"
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache, loader = ModelCache(max_entries=2), Loader()
+    for key in ("a", "b", "a", "c"):
+        cache.get("clients", key, None, loader)
+    assert loader.calls == 3
+    cache.get("clients", "a", None, loader)
+    assert loader.calls == 3
+    cache.get("clients", "b", None, loader)
+    assert loader.calls == 4
+
+
+def test_snapshots_are_read_only():
+    snapshot = freeze({"indexes": ["77"], "rates": {"same_operator": 1}})
+    with pytest.raises(TypeError):
+        snapshot["rates"]["same_operator"] = 0
+    assert isinstance(snapshot["indexes"], tuple)
+    copy = thaw(snapshot)
+    copy["indexes"].append("78")
+    assert copy == {"indexes": ["77", "78"], "rates": {"same_operator": 1}}
+
+
+def test_clients_written_by_another_session_are_reloaded(sessions):
+    first, second = sessions
+    first.insert_client(new_client("771000001", 100))
+    model = ClientModel()
+    model.backend = first
+    assert model.get_client_by_phone("771000001")["credit"] == 100
+    second.update_credit("771000001", 50)
+    assert model.get_client_by_phone("771000001")["credit"] == 150
+
+
+def test_operators_written_by_another_session_are_reloaded(sessions):
+    first, second = sessions
+    model = OperateurModel()
+    model.backend = first
+    assert model.create_operator("Orange", "77")
+    assert get_router(first).resolve("770000001")["name"] == "Orange"
+    operator = second.load_operators()[0]
+    assert second.replace_operator("Orange", dict(operator, indexes=["77", "78"]), operator.get("version", 0))
+    assert [o["indexes"] for o in model.get_operators_snapshot()] == [("77", "78")]
+    assert get_router(first).resolve("780000001")["name"] == "Orange"
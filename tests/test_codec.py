@@ -0,0 +1,61 @@
+"""
+Compression G.711 des enregistrements : valeurs de référence et aller-retour
+"""
+
+import numpy as np
+import pytest
+from Models.Codec import RecordingReader, RecordingWriter, alaw_encode, decode, ulaw_encode
+
+# Valeurs de référence G.711 (UIT-T), identiques à celles du module audioop : échantillon 16 bits -> octet
+ULAW_ENCODED = {0: 0xFF, 1: 0xFF, -1: 0x7E, 8: 0xFE, 1000: 0xCE, -1000: 0x4E, 4000: 0xAF, 32767: 0x80, -32768: 0x00}
+ALAW_ENCODED = {0: 0xD5, 1: 0xD5, -1: 0x55, 8: 0xD5, 1000: 0xFA, -1000: 0x7A, 4000: 0x9A, 32767: 0xAA, -32768: 0x2A}
+# Octet -> échantillon 16 bits
+ULAW_DECODED = {0x00: -32124, 0x80: 32124, 0xFF: 0, 0x7F: 0, 0xD5: 716, 0x55: -716, 0xAA: 5372, 0x2A: -5372}
+ALAW_DECODED = {0x00: -5504, 0x80: 5504, 0xFF: 848, 0x7F: -848, 0xD5: 8, 0x55: -8, 0xAA: 32256, 0x2A: -32256}
+
+ENCODERS = {"mulaw": ulaw_encode, "alaw": alaw_encode}
+
+
+@pytest.mark.parametrize("codec, reference", [("mulaw", ULAW_ENCODED), ("alaw", ALAW_ENCODED)])
+def test_encode_reference_values(codec, reference):
+    samples = np.array(list(reference), dtype=np.int16)
+    assert ENCODERS[codec](samples).tolist() == list(reference.values())
+
+
+@pytest.mark.parametrize("codec, reference", [("mulaw", ULAW_DECODED), ("alaw", ALAW_DECODED)])
+def test_decode_reference_values(codec, reference):
+    assert decode(bytes(reference), codec).tolist() == list(reference.values())
+
+
+@pytest.mark.parametrize("codec", ["mulaw", "alaw"])
+def test_codes_survive_a_round_trip(codec):
+    codes = np.arange(256, dtype=np.uint8)
+    encoded = ENCODERS[codec](decode(codes.tobytes(), codec))
+    if codec == "mulaw":
+        # Zéro négatif (0x7F) ré-encodé en zéro positif (0xFF)
+        codes[0x7F] = 0xFF
+    assert encoded.tolist() == codes.tolist()
+
+
+@pytest.mark.parametrize("codec", ["mulaw", "alaw"])
+def test_quantization_error_is_bounded(codec):
+    samples = np.arange(-32768, 32768)
+    error = np.abs(decode(ENCODERS[codec](samples).tobytes(), codec).astype(int) - samples)
+    # Pas de quantification logarithmique : erreur relative d'environ 3 % au plus
+    assert (error <= np.maximum(16, np.abs(samples) / 16)).all()
+
+
+@pytest.mark.parametrize("codec", ["pcm", "mulaw", "alaw"])
+def test_recording_round_trip(workdir, codec):
+    t = np.arange(8000) / 8000
+    samples = np.rint(12000 * np.sin(2 * np.pi * 440 * t)).astype(np.int16)
+    writer = RecordingWriter("call.wav", 8000, samplerate=8000, codec=codec, trim=False)
+    for block in np.split(samples.reshape(-1, 1), 10):
+        writer.write(block)
+    writer.close()
+
+    with RecordingReader("call.wav") as reader:
+        assert (reader.codec, reader.samplerate, reader.frames) == (codec, 8000, len(samples))
+        restored = np.frombuffer(reader.read(reader.frames), dtype="<i2")
+    expected = samples if codec == "pcm" else decode(ENCODERS[codec](samples).tobytes(), codec)
+    assert restored.tolist() == expected.tolist()
@@ -0,0 +1,94 @@
+"""
+Sessions concurrentes sur le même répertoire : verrous de fichiers et versions des opérateurs
+"""
+
+import multiprocessing
+import pytest
+from Models import Journal, Locks
+from Models.Backend import create_backend
+from Models.Operateur import OperateurModel
+from conftest import new_client
+
+PHONE = "771000001"
+
+
+def operator(name: str = "Orange", index: str = "77") -> dict:
+    return {"name": name, "indexes": [index], "pools": {}, "rates": {"same_operator": 1, "different_operator": 2}}
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def kind(request, workdir):
+    return request.param
+
+
+def test_stale_operator_versions_are_rejected(kind):
+    first, second = create_backend(kind), create_backend(kind)
+    assert first.insert_operator(operator())
+    read = first.load_operators()[0]
+    version = read.get("version", 0)
+    assert second.replace_operator("Orange", dict(read, name="Orange SN"), version)
+    assert not first.replace_operator("Orange", dict(read, indexes=["77", "78"]), version)
+    assert not first.delete_operator("Orange SN", version)
+    assert [o["name"] for o in first.load_operators()] == ["Orange SN"]
+    first.close()
+    second.close()
+
+
+def test_overlapping_operators_are_rejected(kind):
+    backend = create_backend(kind)
+    assert backend.insert_operator(operator())
+    assert not backend.insert_operator(operator("Free", "77"))
+    assert not backend.insert_operator(operator("Free", "771"))
+    assert not backend.insert_operator(operator("Orange", "78"))
+    assert backend.insert_operator(operator("Free", "76"))
+    backend.close()
+
+
+def test_operator_update_is_replayed_after_a_conflict(kind):
+    model = OperateurModel()
+    model.backend = create_backend(kind)
+    other = create_backend(kind)
+    model.create_operator("Orange", "77")
+    attempts = []
+
+    def add_index(current):
+        attempts.append(current.get("version", 0))
+        if len(attempts) == 1:
+            # Une autre session renomme l'opérateur entre la lecture et l'écriture
+            read = other.load_operators()[0]
+            other.replace_operator("Orange", dict(read, rates={"same_operator": 3, "different_operator": 4}),
+                                   read.get("version", 0))
+        current["indexes"].append("78")
+
+    assert model._update_operator("Orange", add_index)
+    assert len(attempts) == 2 and attempts[1] > attempts[0]
+    saved = other.load_operators()[0]
+    assert saved["indexes"] == ["77", "78"]
+    assert saved["rates"]["same_operator"] == 3
+    model.backend.close()
+    other.close()
+
+
+def _debit_session(kind: str, count: int, results):
+    # Nouveau processus : rien de l'état en mémoire du parent n'est repris
+    Journal._states.clear()
+    Locks._instances.clear()
+    backend = create_backend(kind)
+    results.put(sum(backend.debit_credit(PHONE, 1) or 0 for _ in range(count)))
+    backend.close()
+
+
+def test_concurrent_debits_never_overdraw(kind):
+    backend = create_backend(kind)
+    backend.insert_client(new_client(PHONE, 100))
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    processes = [context.Process(target=_debit_session, args=(kind, 40, results)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    debited = sum(results.get(timeout=30) for _ in processes)
+    for process in processes:
+        process.join()
+    assert debited == 100
+    assert create_backend(kind).get_client(PHONE)["credit"] == 0
+    backend.close()
@@ -0,0 +1,145 @@
+"""
+Crédit réservé pendant un appel : règlement au raccroché et reprise après un arrêt brutal
+"""
+
+import json
+import multiprocessing
+import os
+import pytest
+from Models import CreditMeter as credit_meter, Journal, Locks
+from Models.Backend import create_backend
+from Models.CreditMeter import CreditMeter, recover_reservations
+from Models.Locks import unlock_file
+from conftest import new_client
+
+PHONE = "771000001"
+
+
+class Crash(Exception):
+    """Arrêt brutal simulé au milieu du règlement."""
+
+
+@pytest.fixture
+def backend(backend):
+    backend.insert_client(new_client(PHONE, 100))
+    return backend
+
+
+def credit(backend, phone: str = PHONE) -> float:
+    return backend.get_client(phone)["credit"]
+
+
+def call(backend, seconds: float, phone: str = PHONE) -> CreditMeter:
+    """Appel de seconds secondes au tarif de 1F/s, dont la consommation est enregistrée."""
+    meter = CreditMeter(phone, 1, backend, checkpoint_interval=3600)
+    meter.start()
+    meter.consume(seconds)
+    meter._write_checkpoint()
+    return meter
+
+
+def crash(meter: CreditMeter):
+    """Fin du processus : le thread des points de contrôle s'arrête et le verrou est relâché."""
+    meter._stop.set()
+    meter._checkpoints.join()
+    unlock_file(meter._lock_fd)
+
+
+def leftovers() -> list:
+    return sorted(os.listdir(credit_meter.RESERVATIONS_DIR))
+
+
+def test_settle_refunds_the_unused_credit(backend):
+    meter = call(backend, 30.5)
+    assert credit(backend) == 0
+    assert meter.settle() == 30
+    assert credit(backend) == 70
+    assert leftovers() == []
+    assert recover_reservations(backend) == 0
+
+
+def test_calls_in_progress_are_not_recovered(backend):
+    meter = call(backend, 10)
+    assert recover_reservations(backend) == 0
+    meter.settle()
+    assert credit(backend) == 90
+
+
+def test_crash_before_settle(backend):
+    meter = call(backend, 10)
+    meter.consume(5)  # Perdu : après le dernier point de contrôle
+    crash(meter)
+    assert recover_reservations(backend) == 1
+    assert credit(backend) == 90
+    assert leftovers() == []
+
+
+def test_crash_before_the_refund(backend, monkeypatch):
+    meter = call(backend, 10)
+    meter.consume(5)
+
+    def refund(*args):
+        raise Crash()
+    with monkeypatch.context() as patch, pytest.raises(Crash):
+        patch.setattr(backend, "refund_reservation", refund)
+        meter.settle()
+    crash(meter)
+    with open(meter.path) as f:
+        assert json.load(f)["settled"]
+    assert recover_reservations(backend) == 1
+    assert credit(backend) == 85
+
+
+def test_crash_between_refund_and_removal(backend, monkeypatch):
+    meter = call(backend, 10)
+    original = backend.refund_reservation
+
+    def refund(*args):
+        original(*args)
+        raise Crash()
+    with monkeypatch.context() as patch, pytest.raises(Crash):
+        patch.setattr(backend, "refund_reservation", refund)
+        meter.settle()
+    crash(meter)
+    assert credit(backend) == 90
+    assert recover_reservations(backend) == 1
+    assert credit(backend) == 90
+    assert leftovers() == []
+
+
+def test_claims_of_an_earlier_version_are_taken_over(backend):
+    os.makedirs(credit_meter.RESERVATIONS_DIR)
+    backend.update_credit(PHONE, -100)
+    path = os.path.join(credit_meter.RESERVATIONS_DIR, f"4242-{PHONE}.json.4343")
+    with open(path, "w") as f:
+        json.dump({"phone": PHONE, "rate": 1, "reserved": 100, "consumed": 40, "updated": 0}, f)
+    assert recover_reservations(backend) == 1
+    assert credit(backend) == 60
+    assert leftovers() == []
+
+
+def _recover(kind: str, results):
+    Journal._states.clear()
+    Locks._instances.clear()
+    backend = create_backend(kind)
+    results.put(recover_reservations(backend))
+    backend.close()
+
+
+def test_concurrent_recovery_settles_each_call_once(backend):
+    kind = "json" if type(backend).__name__ == "JsonBackend" else "sqlite"
+    phones = [f"7720000{i:02d}" for i in range(20)]
+    for phone in phones:
+        backend.insert_client(new_client(phone, 100))
+        crash(call(backend, 25, phone))
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    processes = [context.Process(target=_recover, args=(kind, results)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    recovered = sum(results.get(timeout=30) for _ in processes)
+    for process in processes:
+        process.join()
+    assert recovered == 20
+    assert [credit(backend, phone) for phone in phones] == [75] * 20
+    assert leftovers() == []
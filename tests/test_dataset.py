@@ -0,0 +1,74 @@
+"""
+Générateur de jeux de données et suite de mesures (Benchmarks/)
+"""
+
+import pytest
+from Benchmarks.Dataset import DatasetGenerator, SALES_PER_MANAGER
+from Benchmarks.Run import percentile, run_benchmarks
+from Models.Backend import get_backend
+from Models.NumberPool import NumberPool
+from Models.Routing import PrefixRouter
+
+PARAMS = {"operators": 3, "indexes_per_operator": 2, "subscribers": 40, "max_calls": 4, "managers": 2}
+
+
+def pool_of(dataset: DatasetGenerator, operator: dict, phone: str) -> NumberPool:
+    index = phone[:dataset.index_length]
+    return NumberPool.from_dict(index, operator["pools"][index])
+
+
+@pytest.fixture
+def dataset():
+    return DatasetGenerator(**PARAMS, seed=7)
+
+
+def test_generation_is_reproducible(dataset):
+    again = DatasetGenerator(**PARAMS, seed=7)
+    assert list(dataset.clients()) == list(again.clients())
+    assert dataset.sales() == again.sales()
+    assert list(DatasetGenerator(**PARAMS, seed=8).clients()) != list(dataset.clients())
+
+
+def test_indexes_do_not_overlap(dataset):
+    router = PrefixRouter(dataset.operators())
+    for index in dataset.spare_indexes:
+        assert router.conflict(index) is None
+    assert len(set(dataset.indexes + dataset.spare_indexes)) == 2 * len(dataset.indexes)
+
+
+def test_pools_match_the_subscribers(dataset):
+    router = PrefixRouter(dataset.operators())
+    phones = [client["phone"] for client in dataset.clients()]
+    assert phones == [dataset.phone(i) for i in range(dataset.subscribers)]
+    assert len(set(phones)) == dataset.subscribers
+    for i, phone in enumerate(phones):
+        operator = router.resolve(phone)
+        assert operator["name"] == dataset.operator_of_index(i % len(dataset.indexes))
+        pool = pool_of(dataset, operator, phone)
+        assert pool.position(phone) is not None and not pool.is_available(phone)
+    for sale in range(10):
+        phone = dataset.free_phone(sale)
+        assert pool_of(dataset, router.resolve(phone), phone).is_available(phone)
+
+
+def test_histories_are_newest_first(dataset):
+    for client in dataset.clients():
+        timestamps = [call["timestamp"] for call in client["call_history"]]
+        assert timestamps == sorted(timestamps, reverse=True)
+        assert len(timestamps) <= dataset.max_calls
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert (percentile(values, 0.5), percentile(values, 0.99), percentile(values, 0)) == (50, 99, 1)
+
+
+def test_written_dataset_and_benchmark_run(workdir, dataset):
+    backend = get_backend()
+    volumes = dataset.write(backend)
+    assert volumes["clients"] == dataset.subscribers
+    assert volumes["sales"] == PARAMS["managers"] * SALES_PER_MANAGER
+    assert volumes["calls"] == sum(backend.count_calls(phone) for phone in backend.iter_phones())
+    results = run_benchmarks(dataset, iterations=5, scan_iterations=1, seed=1)
+    assert {"login_lookup", "history_append", "number_sale", "index_removal", "rerate"} <= set(results)
+    assert all(result["p50_us"] <= result["max_us"] for result in results.values())
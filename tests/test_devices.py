@@ -0,0 +1,69 @@
+"""
+Clavier du poste local : lignes arrivées ensemble, input() des menus, fin de l'entrée et réveil par le micro
+"""
+
+import os
+import sys
+import threading
+import pytest
+import Models.Devices as Devices
+from Models.Devices import LocalDevices
+
+pytestmark = pytest.mark.skipif(Devices.msvcrt is not None, reason="sélecteur sur l'entrée standard hors Windows")
+
+
+@pytest.fixture
+def keyboard(monkeypatch):
+    """Entrée standard remplacée par un tube ; retourne son extrémité d'écriture."""
+    read_end, write_end = os.pipe()
+    # Référence gardée : stdin_lines() remplace sys.stdin, le tube ne doit pas être fermé avant la fin
+    with os.fdopen(read_end, "r") as stdin, os.fdopen(write_end, "wb", buffering=0) as writer:
+        monkeypatch.setattr(sys, "stdin", stdin)
+        monkeypatch.setattr(Devices, "_stdin", None)
+        yield writer
+
+
+def test_lines_written_together_are_all_delivered(keyboard):
+    devices = LocalDevices()
+    keyboard.write(b"D\n+\n42\n")
+
+    assert [devices.next_event(1) for _ in range(3)] == [("key", "d"), ("key", "+"), ("key", "42")]
+    assert devices.next_event(0.05) == ("timeout", None)
+
+
+def test_menus_read_the_lines_left_by_a_call(keyboard):
+    devices = LocalDevices()
+    keyboard.write(b"d\n2\n771000002\n")
+
+    assert devices.next_event(1) == ("key", "d")
+    assert input() == "2"
+    assert devices.read_line() == "771000002"
+
+
+def test_end_of_input_does_not_block(keyboard):
+    devices = LocalDevices()
+    keyboard.write(b"d\nincomplete")
+    keyboard.close()
+
+    assert devices.next_event(1) == ("key", "d")
+    assert devices.next_event(1) == ("key", "incomplete")
+    assert devices.next_event(0.05) == ("timeout", None)
+    with pytest.raises(EOFError):
+        devices.next_event(None)
+    with pytest.raises(EOFError):
+        input()
+
+
+def test_end_of_capture_wakes_up_a_call_without_keys(keyboard):
+    devices = LocalDevices()
+    keyboard.close()
+    assert devices.next_event(1) == ("key", "")
+
+    # Micro ouvert : la fin de la capture est encore attendue après la fin du clavier
+    devices._capturing = True
+    timer = threading.Timer(0.05, devices._post, (("audio", None),))
+    timer.start()
+    try:
+        assert devices.next_event(None) == ("audio", None)
+    finally:
+        timer.cancel()
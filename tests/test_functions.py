@@ -0,0 +1,37 @@
+"""
+Dates des appels : enregistrements récents (horodatage) et anciens (date en toutes lettres seulement)
+"""
+
+from datetime import datetime
+import pytest
+from Models.Functions import call_timestamp, parse_call_date
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("18 octobre 2026 14:05:09", datetime(2026, 10, 18, 14, 5, 9)),
+    ("01 février 2024 00:00:00", datetime(2024, 2, 1)),
+    ("15 Août 2025 23:59:59", datetime(2025, 8, 15, 23, 59, 59)),
+    ("31 décembre 2023 12:00:00", datetime(2023, 12, 31, 12)),
+    ("18 October 2026 14:05:09", datetime(2026, 10, 18, 14, 5, 9)),  # Écrit sans la locale fr_FR
+])
+def test_parse_call_date(text, expected):
+    assert parse_call_date(text) == expected
+
+
+@pytest.mark.parametrize("text", ["", "18 Oktober 2026 14:05:09", "31 février 2024 10:00:00", "hier", None])
+def test_parse_call_date_rejects_unreadable_dates(text):
+    assert parse_call_date(text) is None
+
+
+def test_call_timestamp_prefers_the_timestamp():
+    assert call_timestamp({"timestamp": 1_700_000_000, "date": "01 janvier 2020 00:00:00"}) == 1_700_000_000
+
+
+def test_call_timestamp_of_a_legacy_record():
+    call = {"direction": "outgoing", "number": "781000001", "date": "12 mars 2024 10:00:00"}
+    assert call_timestamp(call) == datetime(2024, 3, 12, 10).timestamp()
+
+
+@pytest.mark.parametrize("call", [{}, {"date": "inconnue"}, {"timestamp": None, "date": ""}])
+def test_call_timestamp_without_a_usable_date(call):
+    assert call_timestamp(call) is None
@@ -0,0 +1,87 @@
+"""
+Historique des appels en segments par abonné, à part des fiches clients
+"""
+
+import json
+import os
+from Models.History import HistoryStore
+from conftest import new_client, restart
+
+PHONE = "771000001"
+
+
+def call(number: int, **fields) -> dict:
+    return dict({"type": "sortant", "number": f"77100{number:04d}", "status": "répondu"}, **fields)
+
+
+def numbers(calls) -> list:
+    return [int(c["number"][-4:]) for c in calls]
+
+
+def test_calls_are_split_into_segments(workdir):
+    store = HistoryStore("history", segment_size=3)
+    store.extend(PHONE, [call(i) for i in range(7)])
+    assert sorted(os.listdir(store._dir(PHONE))) == ["000000.jsonl", "000001.jsonl", "000002.jsonl"]
+    assert store.count(PHONE) == 7
+    assert numbers(store.read(PHONE)) == [6, 5, 4, 3, 2, 1, 0]
+    store.append(PHONE, call(7))
+    store.append(PHONE, call(8))
+    assert store.count(PHONE) == 9
+    assert numbers(store.read(PHONE, limit=3)) == [8, 7, 6]
+
+
+def test_recent_calls_only_read_the_last_segments(workdir):
+    store = HistoryStore("history", segment_size=3)
+    store.extend(PHONE, [call(i) for i in range(7)])
+    with open(store._segment_path(PHONE, 0), "w") as f:
+        f.write("illisible\n")
+    assert numbers(store.read(PHONE, limit=4)) == [6, 5, 4, 3]
+
+
+def test_truncated_call_is_dropped_before_appending(workdir):
+    store = HistoryStore("history", segment_size=3)
+    store.extend(PHONE, [call(0), call(1)])
+    with open(store._segment_path(PHONE, 0), "ab") as f:
+        f.write(b'{"type": "sort')
+    assert store.count(PHONE) == 2
+    store.append(PHONE, call(2))
+    assert numbers(store.read(PHONE)) == [2, 1, 0]
+
+
+def test_set_status_and_forget_recordings(workdir):
+    store = HistoryStore("history", segment_size=3)
+    store.extend(PHONE, [call(i, audio_file=f"BD/recordings/{i}.wav") for i in range(5)])
+    assert store.set_status(PHONE, 4, "manqué")
+    assert not store.set_status(PHONE, 5, "manqué")
+    assert store.forget_recordings(PHONE, {"BD/recordings/0.wav", "BD/recordings/4.wav"}) == 2
+    calls = store.read(PHONE)
+    assert calls[-1]["status"] == "manqué"
+    assert [c.get("recording") for c in calls] == ["deleted", None, None, None, "deleted"]
+    assert calls[0]["audio_file"] is None and calls[1]["audio_file"] == "BD/recordings/3.wav"
+
+
+def test_backend_history(backend):
+    backend.insert_client(new_client(PHONE))
+    for i in range(3):
+        assert backend.add_call(PHONE, call(i))
+    assert not backend.add_call("779999999", call(9))
+    assert backend.count_calls(PHONE) == 3
+    assert numbers(backend.get_call_history(PHONE)) == [2, 1, 0]
+    assert numbers(backend.get_call_history(PHONE, limit=1)) == [2]
+    assert backend.set_call_status(PHONE, 0, "manqué")
+    assert backend.get_call_history(PHONE)[0]["status"] == "manqué"
+    assert "call_history" not in backend.get_client(PHONE)
+
+
+def test_legacy_histories_are_moved_out_of_the_client_records(workdir):
+    os.makedirs("BD")
+    client = dict(new_client(PHONE, 50), call_history=[call(1), call(0)])
+    with open("BD/clients.txt", "w") as f:
+        json.dump([client], f)
+    backend = restart()
+    assert numbers(backend.get_call_history(PHONE)) == [1, 0]
+    assert backend.get_client(PHONE)["credit"] == 50
+    with open("BD/clients.txt") as f:
+        assert "call_history" not in f.read()
+    # Migration faite une seule fois
+    assert numbers(restart().get_call_history(PHONE)) == [1, 0]
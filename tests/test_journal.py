@@ -0,0 +1,65 @@
+"""
+Journal des mutations du moteur JSON : relecture des opérations en attente et compaction
+"""
+
+import shutil
+from conftest import new_client, restart
+
+
+def test_pending_operations_are_replayed(json_backend):
+    json_backend.insert_client(new_client("771000001", 100))
+    json_backend.update_credit("771000001", 50)
+    json_backend.update_credit("771000001", -30)
+
+    client = json_backend.get_client("771000001")
+    assert client["credit"] == 120
+    assert restart().get_client("771000001")["credit"] == 120
+
+
+def test_sequence_number_is_not_returned(json_backend):
+    json_backend.insert_client(new_client("771000001", 100))
+    json_backend.compact()
+    json_backend.update_credit("771000001", 10)
+
+    assert "_seq" not in json_backend.get_client("771000001")
+    assert all("_seq" not in client for client in json_backend.iter_clients())
+
+
+def test_compaction_empties_the_journal(json_backend):
+    for i in range(5):
+        json_backend.insert_client(new_client(f"77100000{i}", 100))
+    json_backend.update_credit("771000002", 25)
+    json_backend.compact()
+
+    assert json_backend.journal.all_pending() == {}
+    backend = restart()
+    assert backend.get_client("771000002")["credit"] == 125
+    assert sorted(client["phone"] for client in backend.iter_clients()) == [f"77100000{i}" for i in range(5)]
+
+
+def test_replay_after_interrupted_compaction_is_idempotent(json_backend, workdir):
+    json_backend.insert_client(new_client("771000001", 100))
+    json_backend.update_credit("771000001", 50)
+    journal = workdir / "BD" / "clients.journal"
+    saved = workdir / "journal.copy"
+    shutil.copy(journal, saved)
+    json_backend.compact()
+    # Arrêt brutal entre le remplacement du fichier des clients et le vidage du journal
+    shutil.copy(saved, journal)
+
+    backend = restart()
+    assert backend.get_client("771000001")["credit"] == 150
+    backend.update_credit("771000001", 1)
+    backend.compact()
+    assert restart().get_client("771000001")["credit"] == 151
+
+
+def test_truncated_journal_line_is_ignored(json_backend, workdir):
+    json_backend.insert_client(new_client("771000001", 100))
+    with open(workdir / "BD" / "clients.journal", "ab") as f:
+        f.write(b"0000abcd {\"seq\": 2, \"ops\": [")  # Écriture interrompue
+
+    backend = restart()
+    assert backend.get_client("771000001")["credit"] == 100
+    assert backend.update_credit("771000001", 5)
+    assert restart().get_client("771000001")["credit"] == 105
@@ -0,0 +1,74 @@
+"""
+Réserves de numéros des opérateurs sous forme de bitmap d'attribution
+"""
+
+import pytest
+from Models.NumberPool import NumberPool
+from Models.Operateur import OperateurModel
+
+
+def test_allocate_and_release():
+    pool = NumberPool("77", size=20)
+    assert pool.available_count() == 20
+    assert pool.allocate("770000005")
+    assert not pool.allocate("770000005")
+    assert not pool.is_available("770000005")
+    assert pool.available_count() == 19
+    pool.release("770000005")
+    assert pool.is_available("770000005")
+    assert pool.available_count() == 20
+
+
+@pytest.mark.parametrize("phone", ["780000001", "77000001", "770000020", "7700000a1"])
+def test_numbers_outside_the_pool(phone):
+    pool = NumberPool("77", size=20)
+    assert pool.position(phone) is None
+    assert not pool.is_available(phone)
+    assert not pool.allocate(phone)
+
+
+def test_iter_available_skips_allocated_numbers():
+    pool = NumberPool("77", size=20)
+    for position in list(range(8)) + [9, 19]:
+        pool.allocate(pool.number(position))
+    assert list(pool.iter_available()) == [pool.number(position) for position in [8] + list(range(10, 19))]
+
+
+def test_round_trip_and_compact_form():
+    pool = NumberPool("77", size=100000)
+    pool.allocate("770012345")
+    data = pool.to_dict()
+    # 12 500 octets de bitmap presque vide : quelques dizaines une fois compressés
+    assert len(data["bitmap"]) < 200
+    restored = NumberPool.from_dict("77", data)
+    assert not restored.is_available("770012345")
+    assert restored.available_count() == 99999
+
+
+def test_from_available_list():
+    pool = NumberPool.from_available("77", ["770000001", "770000003"], size=5)
+    assert list(pool.iter_available()) == ["770000001", "770000003"]
+
+
+def test_operator_numbers_are_sold_once(workdir):
+    model = OperateurModel()
+    assert model.create_operator("Orange", "77")
+    operator = model._find_operator("Orange")
+    assert len(model.available_numbers(operator, "77")) == 100
+    assert model.assign_number_to_client("770000042", "Orange", "1234")
+    assert not model.is_number_available_for_operator("770000042", "Orange")
+    assert not model.assign_number_to_client("770000042", "Orange", "1234")
+    assert not model.assign_number_to_client("780000001", "Orange", "1234")
+    operator = model._find_operator("Orange")
+    assert "770000042" not in model.available_numbers(operator, "77")
+    assert len(model.available_numbers(operator, "77")) == 99
+
+
+def test_legacy_number_lists_are_converted(workdir):
+    model = OperateurModel()
+    model.backend.save_operators([{"name": "Orange", "indexes": ["77"], "numbers": ["770000001", "770000002"],
+                                   "rates": {"same_operator": 1, "different_operator": 2}}])
+    operator = model._find_operator("Orange")
+    assert "numbers" not in operator
+    assert model.available_numbers(operator, "77") == ["770000001", "770000002"]
+    assert "numbers" not in model.backend.load_operators()[0]
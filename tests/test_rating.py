@@ -0,0 +1,37 @@
+"""
+Chargement des appels à re-tarifer : appels datés, anciens appels et appels sans date
+"""
+
+from datetime import datetime
+from Models.Rating import CallRecords
+from conftest import new_client
+
+MARCH = datetime(2024, 3, 12, 10).timestamp()
+APRIL = datetime(2024, 4, 2, 9).timestamp()
+
+
+def outgoing(**call) -> dict:
+    return {"direction": "outgoing", "number": "781000001", "duration": 10, "cost": 20, **call}
+
+
+def load_history(backend):
+    backend.insert_client(new_client("771000001"))
+    backend.add_call("771000001", outgoing(timestamp=APRIL))
+    backend.add_call("771000001", outgoing(date="12 mars 2024 10:00:00"))  # Ancien enregistrement
+    backend.add_call("771000001", outgoing(date="illisible"))
+    backend.add_call("771000001", {"direction": "incoming", "number": "781000001", "timestamp": APRIL})
+
+
+def test_all_outgoing_calls_without_a_period(backend):
+    load_history(backend)
+    records = CallRecords.load(backend)
+    assert len(records) == 3
+    assert records.undated == 1
+    assert sorted(records.timestamp.tolist()) == [-1, int(MARCH), int(APRIL)]
+
+
+def test_period_uses_legacy_dates_and_skips_undated_calls(backend):
+    load_history(backend)
+    records = CallRecords.load(backend, start=datetime(2024, 3, 1).timestamp(), end=datetime(2024, 4, 1).timestamp())
+    assert records.timestamp.tolist() == [int(MARCH)]
+    assert records.undated == 1
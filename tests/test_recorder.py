@@ -0,0 +1,65 @@
+"""
+Enregistrement des appels écrit sur le disque pendant la conversation
+"""
+
+import json
+import threading
+import numpy as np
+import pytest
+from Models import Codec
+from Models.Codec import RecordingReader
+from Models.Recorder import CallRecorder
+from Models.Recordings import metadata_path
+
+
+def tone(seconds: float, rate: int = 8000) -> np.ndarray:
+    t = np.arange(int(seconds * rate)) / rate
+    return (0.5 * np.sin(2 * np.pi * 440 * t)).astype(np.float32).reshape(-1, 1)
+
+
+def test_blocks_are_written_in_order(workdir):
+    recorder = CallRecorder("call.wav", 8000).start()
+    samples = tone(2)
+    for block in np.split(samples, 50):
+        recorder.write(block)
+        block[:] = 0  # Le tampon du callback est réutilisé : le bloc a été copié
+    assert recorder.close() == len(samples)
+    assert recorder.dropped_frames == 0
+    with RecordingReader("call.wav") as reader:
+        restored = reader.samples().astype(np.float64) / 32767
+    assert np.abs(restored - samples[:, 0]).max() < 0.02
+    with open(metadata_path("call.wav")) as f:
+        assert json.load(f)["codec"] == "mulaw"
+
+
+def test_blocks_are_dropped_rather_than_blocking_the_callback(workdir, monkeypatch):
+    writing, release = threading.Event(), threading.Event()
+    write = Codec.RecordingWriter.write
+
+    def slow_disk(self, block):
+        writing.set()
+        release.wait()
+        write(self, block)
+    monkeypatch.setattr(Codec.RecordingWriter, "write", slow_disk)
+    recorder = CallRecorder("call.wav", 8000, queue_blocks=2).start()
+    blocks = np.split(tone(1), 10)
+    recorder.write(blocks[0])
+    assert writing.wait(5)
+    for block in blocks[1:]:
+        recorder.write(block)
+    release.set()
+    frames = recorder.close()
+    # Un bloc en cours d'écriture et deux en attente : les autres sont abandonnés et comptés
+    assert recorder.dropped_frames == 7 * len(blocks[0])
+    assert frames == 3 * len(blocks[0])
+
+
+def test_write_errors_are_raised_by_close(workdir, monkeypatch):
+    def full_disk(self, block):
+        raise OSError("disque plein")
+    monkeypatch.setattr(Codec.RecordingWriter, "write", full_disk)
+    recorder = CallRecorder("call.wav", 8000).start()
+    for block in np.split(tone(1), 10):
+        recorder.write(block)
+    with pytest.raises(OSError, match="disque plein"):
+        recorder.close()
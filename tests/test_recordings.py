@@ -0,0 +1,92 @@
+"""
+Stockage des enregistrements : quota, archivage, lecture depuis les archives et suppressions reportées
+"""
+
+import builtins
+import os
+import time
+import numpy as np
+import pytest
+from Models.Codec import RecordingReader, RecordingWriter
+from Models.Recordings import RecordingStore, metadata_path, write_metadata
+from Views.Client import display_call_details
+from conftest import new_client
+
+CALLER, CALLEE = "771000001", "781000001"
+DAY = 86400
+
+
+def record(created: float, seconds: float = 1) -> str:
+    """Enregistrement PCM 16 bits (format antérieur) d'un appel, noté dans l'historique des deux abonnés."""
+    os.makedirs("BD/calls", exist_ok=True)
+    path = f"BD/calls/call_{CALLER}_{CALLEE}_{int(created)}.wav"
+    t = np.arange(int(seconds * 8000)) / 8000
+    writer = RecordingWriter(path, 8000, samplerate=8000, codec="pcm", trim=False)
+    writer.write(np.rint(8000 * np.sin(2 * np.pi * 440 * t)).astype(np.int16).reshape(-1, 1))
+    writer.close()
+    write_metadata(path, dict(writer.metadata(), duration=seconds))
+    return path
+
+
+@pytest.fixture
+def backend(backend):
+    for phone in (CALLER, CALLEE):
+        backend.insert_client(new_client(phone))
+    return backend
+
+
+def add_calls(backend, path: str):
+    backend.add_call(CALLER, {"direction": "outgoing", "number": CALLEE, "audio_file": path})
+    backend.add_call(CALLEE, {"direction": "incoming", "number": CALLER, "audio_file": path})
+
+
+def test_old_recordings_are_archived_over_quota_and_still_playable(backend):
+    created = time.time() - 40 * DAY
+    paths = [record(created + i) for i in range(3)]
+    size = sum(os.path.getsize(path) for path in paths)
+    store = RecordingStore(backend=backend, quota=size - 1, archive_after=30)
+    for path in paths:
+        store.register(path, CALLER, CALLEE, created=created)
+    assert store.usage()["archived"] == 3 and store.usage()["deleted"] == 0
+    assert not any(os.path.exists(path) or os.path.exists(metadata_path(path)) for path in paths)
+    with store.open(paths[1]) as reader:
+        # Converti avec perte au format actuel (G.711 sur 8 bits)
+        assert (reader.codec, reader.frames) == ("mulaw", 8000)
+        samples = np.frombuffer(reader.read(reader.frames), dtype="<i2").astype(int)
+    t = np.arange(8000) / 8000
+    assert np.abs(samples - np.rint(8000 * np.sin(2 * np.pi * 440 * t))).max() < 300
+    assert store.metadata(paths[1])["duration"] == 1
+
+
+def test_deleted_recordings_are_marked_in_both_histories(backend):
+    now = time.time()
+    kept, deleted = record(now - 10), record(now - 20)
+    for path in (deleted, kept):
+        add_calls(backend, path)
+    store = RecordingStore(backend=backend, quota=os.path.getsize(kept), archive_after=30)
+    store.register(deleted, CALLER, CALLEE, created=now - 20)
+    store.register(kept, CALLER, CALLEE, created=now - 10)
+    assert store.usage()["deleted"] == 1
+    assert not os.path.exists(deleted) and os.path.exists(kept)
+    for phone in (CALLER, CALLEE):
+        history = backend.get_call_history(phone)
+        assert [call.get("recording") for call in history] == [None, "deleted"]
+        assert [call["audio_file"] for call in history] == [kept, None]
+    with pytest.raises(FileNotFoundError):
+        store.open(deleted)
+    with store.open(kept) as reader:
+        assert reader.frames == 8000
+
+
+@pytest.mark.parametrize("fields, expected", [
+    ({"audio_file": None, "recording": "deleted"}, "Enregistrement : supprimé (quota de stockage)"),
+    ({"audio_file": ""}, "Enregistrement : non enregistré"),
+])
+def test_call_details_tell_deleted_and_missing_recordings_apart(monkeypatch, capsys, fields, expected):
+    call = dict({"direction": "outgoing", "number": CALLEE, "name": "inconnu", "duration": 3, "cost": 6,
+                 "date": "14 mars 2026 10:00:00", "status": "read"}, **fields)
+    monkeypatch.setattr(builtins, "input", lambda prompt="": "")
+    display_call_details(call, new_client(CALLER), 0)
+    output = capsys.readouterr().out
+    assert expected in output
+    assert len([line for line in output.splitlines() if line.startswith("Enregistrement")]) == 1
@@ -0,0 +1,39 @@
+"""
+Index des opérateurs : longueur, chevauchement avec les routes existantes et résolution des numéros
+"""
+
+import pytest
+from Controllers.Functions import validate_index
+from Models.Operateur import OperateurModel
+from Models.Routing import PrefixRouter
+
+OPERATORS = [{"name": "Orange", "indexes": ["77", "780"]}, {"name": "Free", "indexes": ["76", "7812"]}]
+
+
+@pytest.mark.parametrize("phone, operator", [
+    ("771234567", "Orange"), ("780123456", "Orange"), ("781234567", "Free"), ("761234567", "Free"), ("791234567", None),
+])
+def test_resolve_uses_the_longest_prefix(phone, operator):
+    resolved = PrefixRouter(OPERATORS).resolve(phone)
+    assert (resolved and resolved["name"]) == operator
+
+
+@pytest.mark.parametrize("index, conflict", [("77", "77"), ("771", "77"), ("7", "77"), ("78", "780"), ("79", None), ("781", "7812")])
+def test_conflict(index, conflict):
+    assert PrefixRouter(OPERATORS).conflict(index) == conflict
+
+
+@pytest.fixture
+def operators(workdir):
+    OperateurModel().create_operator("Orange", "77")
+
+
+@pytest.mark.parametrize("index", ["7", "77777", "7a", ""])
+def test_validate_index_length(operators, index):
+    assert "chiffres" in validate_index(index)
+
+
+@pytest.mark.parametrize("index, valid", [("78", True), ("7812", True), ("77", False), ("771", False)])
+def test_validate_index_overlap(operators, index, valid):
+    assert (validate_index(index) == "") == valid
+    assert validate_index(index, check_overlap=False) == ""
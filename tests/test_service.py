@@ -0,0 +1,97 @@
+"""
+Service des modèles : requêtes pipelinées, méthodes exécutées par la session et moteur de stockage du démon
+"""
+
+import asyncio
+import threading
+import pytest
+import Models.Backend as Backend
+import Models.Service as Service
+from Models.Backend import default_backend_kind
+from Models.Service import (ModelService, RemoteModel, ServiceError, call_many, connect_service, get_client_model,
+                            get_operator_model)
+from conftest import new_client
+
+ADDRESS = "service.sock"
+
+
+@pytest.fixture
+def start_daemon(workdir, monkeypatch):
+    """Démarre un démon sur le moteur demandé, dans un thread ; la session n'a choisi aucun moteur."""
+    monkeypatch.setattr(Service, "_client", None)
+    running = []
+
+    def start(kind: str) -> ModelService:
+        monkeypatch.setattr(Backend, "_default_kind", kind)
+        service = ModelService(ADDRESS)
+        ready = threading.Event()
+        thread = threading.Thread(target=asyncio.run, args=(service.serve(ready),))
+        thread.start()
+        assert ready.wait(5)
+        running.append((service, thread))
+        # La session est un autre processus : STORAGE_BACKEND par défaut
+        monkeypatch.setattr(Backend, "_default_kind", None)
+        return service
+
+    yield start
+    if Service._client is not None:
+        Service._client.close()
+    for service, thread in running:
+        service.stop()
+        thread.join(5)
+
+
+def test_pipelined_responses_come_back_in_order(start_daemon):
+    start_daemon("json")
+    assert connect_service(ADDRESS)
+    client = Service._client
+
+    results = client.pipeline([("client", "create_client", ("771000001", "1234"), {}),
+                               ("client", "update_credit", ("771000001", 300), {}),
+                               ("client", "get_client_by_phone", ("771000001",), {}),
+                               ("client", "client_exists", ("771000002",), {})])
+
+    assert results[0] is True
+    assert results[2]["credit"] == 300
+    assert results[3] is False
+    assert call_many(get_client_model(), "client_exists", [("771000002",), ("771000001",)]) == [False, True]
+
+
+def test_an_error_is_raised_once_every_response_is_read(start_daemon):
+    start_daemon("json")
+    assert connect_service(ADDRESS)
+    client = Service._client
+
+    with pytest.raises(ServiceError, match="non servie"):
+        client.pipeline([("client", "iter_clients", (), {}), ("client", "create_client", ("771000001", "1234"), {})])
+    # Requête suivant l'erreur exécutée, connexion toujours synchronisée
+    assert client.call("client", "client_exists", "771000001") is True
+
+
+def test_session_adopts_the_daemon_backend(start_daemon):
+    start_daemon("sqlite")
+    assert connect_service(ADDRESS)
+    assert default_backend_kind() == "sqlite"
+
+    # Vente en lot exécutée par la session : écrite dans le stockage servi par le démon
+    operators = get_operator_model()
+    assert isinstance(operators, RemoteModel)
+    assert operators.apply_provisioning([new_client("771000001")], [("771000001", 500)], None, [])
+
+    assert get_client_model().get_client_by_phone("771000001")["credit"] == 500
+    assert [client["phone"] for client in get_client_model().iter_clients()] == ["771000001"]
+
+
+def test_session_with_another_backend_does_not_connect(start_daemon, monkeypatch):
+    start_daemon("sqlite")
+    monkeypatch.setattr(Backend, "_default_kind", "json")
+
+    assert not connect_service(ADDRESS)
+    assert default_backend_kind() == "json"
+    assert not isinstance(get_client_model(), RemoteModel)
+
+
+def test_no_daemon_keeps_local_models(workdir, monkeypatch):
+    monkeypatch.setattr(Service, "_client", None)
+    assert not connect_service(ADDRESS)
+    assert not isinstance(get_operator_model(), RemoteModel)
@@ -0,0 +1,45 @@
+"""
+Moteur SQLite : compteurs de modifications par table, vus depuis une autre connexion
+"""
+
+import pytest
+from Models.SqliteBackend import SqliteBackend
+from conftest import new_client
+
+
+def operator(name: str = "Orange", index: str = "77") -> dict:
+    return {"name": name, "indexes": [index], "pools": {}, "rates": {"same_operator": 1, "different_operator": 2}}
+
+
+@pytest.fixture
+def sessions(workdir):
+    first, second = SqliteBackend("BD/clients.db"), SqliteBackend("BD/clients.db")
+    yield first, second
+    first.close()
+    second.close()
+
+
+def test_client_writes_leave_the_operators_signature_alone(sessions):
+    first, second = sessions
+    clients, operators = first.clients_signature(), first.operators_signature()
+    second.insert_client(new_client("771000001", 100))
+    assert first.clients_signature() != clients
+    assert first.operators_signature() == operators
+    clients = first.clients_signature()
+    second.add_call("771000001", {"type": "sortant", "number": "771000002", "status": "manqué"})
+    assert first.clients_signature() != clients
+
+
+def test_operator_writes_leave_the_clients_signature_alone(sessions):
+    first, second = sessions
+    clients, operators = first.clients_signature(), first.operators_signature()
+    second.insert_operator(operator())
+    assert first.operators_signature() != operators
+    assert first.clients_signature() == clients
+
+
+def test_own_writes_change_the_signature(sessions):
+    first, _ = sessions
+    clients = first.clients_signature()
+    first.insert_client(new_client("771000001"))
+    assert first.clients_signature() != clients
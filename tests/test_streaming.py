@@ -0,0 +1,84 @@
+"""
+Lecture en flux du fichier des clients et parcours qui s'arrêtent tôt
+"""
+
+import json
+import os
+import pytest
+from Models import Index, JsonBackend as json_backend_module
+from conftest import new_client, restart
+
+
+def client(phone: str, **fields) -> dict:
+    return dict(new_client(phone, 100), **fields)
+
+
+def write_clients_file(text: str):
+    os.makedirs("BD", exist_ok=True)
+    with open("BD/clients.txt", "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+@pytest.fixture
+def small_reads(monkeypatch):
+    # Blocs plus petits qu'une fiche : chaque fiche est coupée entre plusieurs lectures
+    monkeypatch.setattr(json_backend_module, "CLIENTS_READ_SIZE", 7)
+
+
+def test_any_json_layout_is_read_one_client_at_a_time(workdir, small_reads):
+    clients = [client(f"77100000{i}", name=f"a, b ] {{c}} \"{i}\"") for i in range(5)]
+    write_clients_file(json.dumps(clients, indent=4))
+    backend = restart()
+    assert list(backend._stream_clients_file()) == clients
+    # Fichier réécrit au format indexable à la première lecture
+    assert backend.get_client("771000003")["name"] == 'a, b ] {c} "3"'
+    assert sorted(backend.iter_phones()) == [c["phone"] for c in clients]
+
+
+@pytest.mark.parametrize("text", ['{"phone": "771000001"}', '[{"phone": "771000001"}, {"pho'])
+def test_unreadable_clients_file(json_backend, small_reads, text):
+    write_clients_file(text)
+    with pytest.raises(ValueError):
+        list(json_backend._stream_clients_file())
+
+
+@pytest.mark.parametrize("text", ["", "  \n", "[]"])
+def test_empty_clients_file(json_backend, small_reads, text):
+    write_clients_file(text)
+    assert list(json_backend._stream_clients_file()) == []
+
+
+def test_iter_phones_merges_the_file_and_pending_creations(json_backend, monkeypatch):
+    monkeypatch.setattr(Index, "_SCAN_BATCH", 2)
+    for i in range(5):
+        json_backend.insert_client(client(f"77100000{i}"))
+    json_backend.compact()
+    for i in range(5, 8):
+        json_backend.insert_client(client(f"77100000{i}"))
+    phones = list(json_backend.iter_phones())
+    assert sorted(phones) == [f"77100000{i}" for i in range(8)]
+    assert len(phones) == len(set(phones))
+
+
+def test_find_client_with_prefix(backend):
+    for phone in ("771000005", "781000001", "781000002"):
+        backend.insert_client(client(phone))
+    assert backend.find_client_with_prefix("78") in ("781000001", "781000002")
+    assert backend.find_client_with_prefix("771") == "771000005"
+    assert backend.find_client_with_prefix("76") is None
+    assert backend.find_client_with_prefix("7710000050") is None
+
+
+def test_prefix_scan_stops_at_the_first_client(json_backend, monkeypatch):
+    for i in range(5):
+        json_backend.insert_client(client(f"77100000{i}"))
+    read = []
+    phones = json_backend.iter_phones
+
+    def counted():
+        for phone in phones():
+            read.append(phone)
+            yield phone
+    monkeypatch.setattr(json_backend, "iter_phones", counted)
+    assert json_backend.find_client_with_prefix("77") is not None
+    assert len(read) == 1
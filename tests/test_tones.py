@@ -0,0 +1,65 @@
+"""
+Sonneries : mixeur ouvert une fois, sons décodés d'avance et arrêtés aussitôt
+"""
+
+import os
+import threading
+import time
+import wave
+import numpy as np
+import pygame
+import pytest
+from Models.Tones import ToneEngine
+
+
+def write_tone(path: str, seconds: float):
+    t = np.arange(int(seconds * 22050)) / 22050
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(22050)
+        f.writeframes((8000 * np.sin(2 * np.pi * 440 * t)).astype("<i2").tobytes())
+
+
+@pytest.fixture
+def engine(workdir, monkeypatch):
+    # Pas de carte son pendant les tests : pilote SDL sans sortie
+    monkeypatch.setenv("SDL_AUDIODRIVER", "dummy")
+    os.makedirs("sounds")
+    write_tone("sounds/ringtone.wav", 2)
+    write_tone("sounds/busy.wav", 0.5)
+    engine = ToneEngine("sounds").start()
+    yield engine
+    engine.close()
+
+
+def test_sounds_are_decoded_once_in_the_background(engine):
+    assert engine.available
+    engine._preload.join()
+    assert {"decode:busy.wav", "decode:ringtone.wav"} <= set(engine.timings)
+    sound = engine._sounds["ringtone.wav"]
+    assert engine.play("ringtone.wav") == pytest.approx(2, abs=0.01)
+    assert engine.play("ringtone.wav") == pytest.approx(2, abs=0.01)
+    assert engine._sounds["ringtone.wav"] is sound
+    assert "start:ringtone.wav" in engine.timings
+
+
+def test_missing_sound_is_not_played(engine):
+    assert engine.play("absent.wav") == 0
+
+
+def test_stop_interrupts_play_and_wait(engine):
+    threading.Timer(0.1, engine.stop).start()
+    started = time.perf_counter()
+    engine.play_and_wait("ringtone.wav")
+    assert time.perf_counter() - started < 1.5
+
+
+def test_without_audio_device_sounds_are_ignored(workdir, monkeypatch):
+    def no_device():
+        raise pygame.error("no audio device")
+    monkeypatch.setattr(pygame.mixer, "init", no_device)
+    engine = ToneEngine("sounds").start()
+    assert not engine.available
+    assert engine.play("ringtone.wav") == 0
+    engine.play_and_wait("ringtone.wav")
@@ -0,0 +1,61 @@
+"""
+Transferts de crédit : le débit de la source et tous les crédits sont enregistrés ensemble, ou rien ne l'est
+"""
+
+import pytest
+from Controllers.Transfer import TransferController
+from Models.Client import ClientModel
+from conftest import new_client
+
+
+@pytest.fixture
+def model(backend):
+    model = ClientModel()
+    model.backend = backend
+    for phone, credit in (("771000001", 1000), ("771000002", 0), ("771000003", 0)):
+        backend.insert_client(new_client(phone, credit))
+    return model
+
+
+def credits(model):
+    return [model.backend.get_client(phone)["credit"] for phone in ("771000001", "771000002", "771000003")]
+
+
+def test_transfer_to_several_beneficiaries(model):
+    ok, _ = model.transfer_credit("771000001", [("771000002", 300), ("771000003", 200), ("771000002", 100)])
+    assert ok
+    assert credits(model) == [400, 400, 200]
+
+
+def test_insufficient_credit_transfers_nothing(model):
+    ok, message = model.transfer_credit("771000001", [("771000002", 600), ("771000003", 600)])
+    assert not ok
+    assert "insuffisant" in message
+    assert credits(model) == [1000, 0, 0]
+
+
+def test_unknown_beneficiary_transfers_nothing(model):
+    ok, message = model.transfer_credit("771000001", [("771000002", 100), ("779999999", 100)])
+    assert not ok
+    assert "779999999" in message
+    assert credits(model) == [1000, 0, 0]
+
+
+def test_invalid_amount_transfers_nothing(model):
+    ok, _ = model.transfer_credit("771000001", [("771000002", 100), ("771000003", 0)])
+    assert not ok
+    assert credits(model) == [1000, 0, 0]
+
+
+def test_strict_file_with_an_invalid_line_transfers_nothing(model, workdir):
+    (workdir / "transfers.csv").write_text("771000002,100\n779999999,100\n")
+    controller = TransferController()
+    controller.model = model
+
+    results = controller.transfer("771000001", "transfers.csv", strict=True)
+
+    assert not any(result["ok"] for result in results)
+    assert credits(model) == [1000, 0, 0]
+    results = controller.transfer("771000001", "transfers.csv")
+    assert [result["ok"] for result in results] == [True, False]
+    assert credits(model) == [900, 100, 0]
@@ -0,0 +1,86 @@
+"""
+Détection de la parole : silences retirés des enregistrements et statistiques de l'appel
+"""
+
+import math
+import random
+import numpy as np
+import pytest
+from Models.Codec import RecordingReader, RecordingWriter
+from Models.Vad import SilenceTrimmer
+
+RATE = 8000
+
+
+def silence(seconds: float) -> np.ndarray:
+    return np.zeros(int(seconds * RATE), dtype=np.int16)
+
+
+def speech(seconds: float, amplitude: int = 8000) -> np.ndarray:
+    t = np.arange(int(seconds * RATE)) / RATE
+    return np.rint(amplitude * np.sin(2 * np.pi * 440 * t)).astype(np.int16)
+
+
+def call_audio() -> np.ndarray:
+    # 2 s de silence, 1 s de parole, 5 s de pause, 1 s de parole, 3 s de silence
+    return np.concatenate((silence(2), speech(1), silence(5), speech(1), silence(3)))
+
+
+def trim(samples: np.ndarray, blocks: int = 1, **options) -> tuple:
+    trimmer = SilenceTrimmer(RATE, hangover=0.3, max_pause=1.5, **options)
+    output = np.concatenate([trimmer.process(block) for block in np.array_split(samples, blocks)])
+    return trimmer, output
+
+
+def test_leading_silence_and_long_pauses_are_cut():
+    trimmer, output = trim(call_audio())
+    # Hangover avant chaque reprise de la parole, pause ramenée à 1,5 s, hangover après la dernière
+    assert trimmer.keep_frames == round((0.3 + 1 + 1.5 + 0.3 + 1 + 0.3) * RATE)
+    assert len(output) >= trimmer.keep_frames
+    assert np.array_equal(output[int(0.3 * RATE):int(1.3 * RATE)], speech(1))
+    metadata = trimmer.metadata()
+    assert metadata["talk_time"] == 2
+    assert metadata["duration"] == 4.4
+    assert metadata["original_duration"] == 12
+    assert metadata["rms_dbfs"] == pytest.approx(20 * math.log10(8000 / math.sqrt(2) / 32768), abs=0.1)
+
+
+def test_output_does_not_depend_on_block_sizes():
+    samples = call_audio()
+    _, whole = trim(samples)
+    rng = random.Random(3)
+    trimmer = SilenceTrimmer(RATE, hangover=0.3, max_pause=1.5)
+    cuts = sorted(rng.sample(range(1, len(samples)), 200))
+    pieces = [trimmer.process(block) for block in np.split(samples, cuts)]
+    assert np.array_equal(np.concatenate(pieces), whole)
+
+
+def test_pauses_are_kept_without_max_pause():
+    trimmer, _ = trim(call_audio())
+    unlimited = SilenceTrimmer(RATE, hangover=0.3, max_pause=None)
+    unlimited.process(call_audio())
+    assert unlimited.keep_frames == trimmer.keep_frames + int(3.2 * RATE)
+
+
+def test_without_trim_only_statistics_are_computed():
+    samples = call_audio()
+    trimmer, output = trim(samples, blocks=7, trim=False)
+    assert np.array_equal(output, samples)
+    assert trimmer.keep_frames == len(samples)
+    assert trimmer.metadata()["talk_time"] == 2
+
+
+def test_silent_call():
+    trimmer, _ = trim(silence(3))
+    assert trimmer.keep_frames == 0
+    assert trimmer.metadata() == {"duration": 0, "talk_time": 0, "rms_dbfs": None, "original_duration": 3}
+
+
+def test_trailing_silence_is_removed_from_the_file(workdir):
+    writer = RecordingWriter("call.wav", RATE, samplerate=RATE, codec="pcm", trim=True)
+    for block in np.array_split(call_audio().reshape(-1, 1), 30):
+        writer.write(block)
+    writer.close()
+    with RecordingReader("call.wav") as reader:
+        assert reader.frames == int(4.4 * RATE)
+    assert writer.metadata()["duration"] == 4.4
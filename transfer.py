@@ -0,0 +1,34 @@
+"""
+Transferts de crédit en masse (campagnes promotionnelles) à partir d'un fichier CSV
+"""
+
+import argparse
+from Controllers.Provisioning import ProvisioningController
+from Controllers.Transfer import TransferController
+from Views.Client import display_transfer_results
+from Models.Service import connect_service
+from Views.Functions import print_message
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transférer du crédit d'un numéro vers les numéros d'un fichier CSV (numéro,montant).")
+    parser.add_argument("source", help="Numéro débité du total des transferts")
+    parser.add_argument("csv_file", help="Fichier CSV des transferts")
+    parser.add_argument("--strict", action="store_true", help="Ne rien enregistrer si une ligne est invalide")
+    parser.add_argument("--dry-run", action="store_true", help="Valider le fichier sans rien enregistrer")
+    parser.add_argument("--report", help="Écrire le résultat de chaque ligne dans ce fichier CSV")
+    args = parser.parse_args()
+
+    # Modèles servis par le démon (python service.py) s'il est démarré
+    connect_service()
+    results = TransferController().transfer(args.source, args.csv_file, strict=args.strict, dry_run=args.dry_run)
+    display_transfer_results(results)
+    if args.dry_run:
+        print_message("Vérification seule : aucun transfert n'a été enregistré.", "INFO")
+    if args.report:
+        ProvisioningController.write_report(results, args.report)
+    return 0 if all(result["ok"] for result in results) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())